@@ -0,0 +1,132 @@
+"""
+Cost of revising a ~3000 word blog post with section edits (EditBlogPost)
+versus sending the whole post again (WriteBlogPost), for scripted revisions.
+
+Reports the output tokens of each tool call, the simulated generation time
+at --tokens-per-second and, for edits streamed through EditStreamer, when
+the first edit reaches the UI. Checks that the edits produce the same post
+as the rewrite would.
+
+    python -m benchmarks.bench_blog_edits --tokens-per-second 60
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+
+from research_canvas.blog import EditStreamer, apply_edits
+from research_canvas.context import estimate_tokens
+
+_SECTIONS = [
+    "Why remote work stuck", "The productivity question", "Hiring without borders",
+    "Tools that matter", "Culture at a distance", "Managing across time zones",
+    "Security and compliance", "The cost equation", "What employees want", "Looking ahead",
+]
+
+
+def _paragraph(section: int, paragraph: int) -> str:
+    return " ".join(
+        f"Sentence {sentence} of paragraph {paragraph} in section {section} explains remote work in detail."
+        for sentence in range(1, 5)
+    )
+
+
+def _post() -> Dict[str, str]:
+    parts = [_paragraph(0, 0)]
+    for i, heading in enumerate(_SECTIONS, 1):
+        parts.append(f"## {heading}\n\n" + "\n\n".join(_paragraph(i, p) for p in range(1, 6)))
+    return {"title": "Remote work in 2025", "content": "\n\n".join(parts)}
+
+
+# (name, edits) pairs, applied cumulatively
+_SCRIPT: List[Any] = [
+    ("fix a typo", [{"op": "replace_text", "find": "Sentence 2 of paragraph 3 in section 4 explains",
+                     "replace": "Sentence 2 of paragraph 3 in section 4 describes"}]),
+    ("rewrite a section", [{"op": "replace_section", "section": "The cost equation",
+                            "content": "## The cost equation\n\n" + _paragraph(8, 9) + "\n\n" + _paragraph(8, 10)}]),
+    ("add a section", [{"op": "insert_after", "section": "Tools that matter",
+                        "content": "## Meetings\n\n" + _paragraph(11, 1)}]),
+    ("drop a section, retitle", [{"op": "delete_section", "section": "Security and compliance"},
+                                 {"op": "set_title", "content": "Remote work, five years on"}]),
+]
+
+
+def _chunks(args: str, size: int = 16):
+    yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+        {"name": "EditBlogPost", "args": "", "id": "call_1", "index": 0}
+    ]))
+    for start in range(0, len(args), size):
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+            {"name": None, "args": args[start:start + size], "id": None, "index": 0}
+        ]))
+
+
+async def _first_update(post, args: str, tokens_per_second: float) -> float:
+    """Simulated seconds until EditStreamer shows the first edit, from the share of the args streamed."""
+    first: List[float] = []
+    streamed = 0
+
+    async def on_update(_post):
+        if not first:
+            first.append(estimate_tokens(args[:streamed]) / tokens_per_second)
+
+    streamer = EditStreamer(post, on_update)
+    for chunk in _chunks(args):
+        streamed += len(chunk.message.tool_call_chunks[0]["args"] or "")
+        await streamer.on_llm_new_token("", chunk=chunk)
+    # the last edit is only known to be complete when the call ends
+    return first[0] if first else estimate_tokens(args) / tokens_per_second
+
+
+async def _run(args):
+    post = _post()
+    words = len(post["content"].split())
+    print(f"post: {words} words, {len(_SECTIONS)} sections, {args.tokens_per_second:.0f} tokens/s\n")
+    print(f"{'revision':<26} {'rewrite tok':>12} {'edit tok':>9} {'saved':>6} "
+          f"{'rewrite s':>10} {'edit s':>7} {'first edit':>11} {'apply':>8}")
+    totals = [0, 0]
+    for name, edits in _SCRIPT:
+        start = time.perf_counter()
+        expected, errors = apply_edits(post, edits)
+        apply_ms = (time.perf_counter() - start) * 1000
+        assert not errors, errors
+
+        rewrite = estimate_tokens(json.dumps({"blog_post": expected}))
+        edit_args = json.dumps({"edits": edits})
+        edit = estimate_tokens(edit_args)
+        first = await _first_update(post, edit_args, args.tokens_per_second)
+        print(
+            f"{name:<26} {rewrite:>12} {edit:>9} {1 - edit / rewrite:>5.0%} "
+            f"{args.latency + rewrite / args.tokens_per_second:>9.1f}s "
+            f"{args.latency + edit / args.tokens_per_second:>6.1f}s "
+            f"{args.latency + first:>10.1f}s {apply_ms:>6.2f}ms"
+        )
+        totals[0] += rewrite
+        totals[1] += edit
+        post = expected
+    # the scripted edits, checked without going through apply_edits
+    headings = [line[3:] for line in post["content"].splitlines() if line.startswith("## ")]
+    expected_headings = [heading for heading in _SECTIONS if heading != "Security and compliance"]
+    expected_headings.insert(expected_headings.index("Tools that matter") + 1, "Meetings")
+    assert headings == expected_headings, headings
+    assert post["title"] == "Remote work, five years on"
+    assert "paragraph 3 in section 4 describes" in post["content"] and _paragraph(8, 9) in post["content"]
+    assert _paragraph(8, 1) not in post["content"] and _paragraph(7, 1) not in post["content"]
+    print(f"\n{'total':<26} {totals[0]:>12} {totals[1]:>9} {1 - totals[1] / totals[0]:>5.0%}")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens-per-second", type=float, default=60.0, help="model output speed")
+    parser.add_argument("--latency", type=float, default=0.5, help="model time to first token")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
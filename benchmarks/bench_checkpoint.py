@@ -0,0 +1,101 @@
+"""
+Checkpoint write/read latency and stored bytes against state size,
+MemorySaver versus SQLiteSaver.
+
+Each step appends a message and returns the unchanged blog post again, the
+way chat_node does, so storage growth shows whether unchanged values are
+stored once or on every step.
+
+    python -m benchmarks.bench_checkpoint --words 0 1000 3000 --steps 30
+"""
+
+import argparse
+import asyncio
+import os
+import pickle
+import statistics
+import tempfile
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, MessagesState, StateGraph
+
+from research_canvas.checkpoint import SQLiteSaver
+
+
+class _State(MessagesState):
+    blog_post: dict
+
+
+def _graph(saver, words: int):
+    content = " ".join(["word"] * words)
+
+    def node(state):
+        return {
+            "messages": [AIMessage("Blog post updated.")],
+            "blog_post": {"title": "Remote work", "content": content},
+        }
+
+    workflow = StateGraph(_State)
+    workflow.add_node("chat_node", node)
+    workflow.set_entry_point("chat_node")
+    workflow.add_edge("chat_node", END)
+    return workflow.compile(checkpointer=saver)
+
+
+def _stored_bytes(saver) -> int:
+    if isinstance(saver, SQLiteSaver):
+        # logical bytes, the file itself grows in pages and keeps a write-ahead log
+        return sum(
+            saver._conn.execute(query).fetchone()[0] or 0 # pylint: disable=protected-access
+            for query in (
+                "SELECT SUM(LENGTH(value)) FROM blobs",
+                "SELECT SUM(LENGTH(checkpoint) + LENGTH(metadata)) FROM checkpoints",
+                "SELECT SUM(LENGTH(blob_hash)) FROM writes",
+            )
+        )
+    return len(pickle.dumps((dict(saver.storage), dict(saver.writes), saver.blobs)))
+
+
+async def _bench(saver, words: int, steps: int):
+    graph = _graph(saver, words)
+    config = {"configurable": {"thread_id": "benchmark"}}
+    writes, reads = [], []
+    for i in range(steps):
+        start = time.perf_counter()
+        await graph.ainvoke({"messages": [HumanMessage(f"Revise paragraph {i}")]}, config)
+        writes.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await graph.aget_state(config)
+        reads.append(time.perf_counter() - start)
+    return statistics.median(writes), statistics.median(reads), _stored_bytes(saver)
+
+
+async def _run(args):
+    directory = tempfile.mkdtemp()
+    print(f"{'saver':>8} {'words':>6} {'step':>9} {'read':>9} {'stored':>10}")
+    for words in args.words:
+        savers = {
+            "memory": MemorySaver(),
+            "sqlite": SQLiteSaver(os.path.join(directory, f"{words}.sqlite3"), keep_last=0),
+        }
+        for name, saver in savers.items():
+            step, read, stored = await _bench(saver, words, args.steps)
+            print(
+                f"{name:>8} {words:>6} {step * 1000:>7.2f}ms {read * 1000:>7.2f}ms "
+                f"{stored / 1024:>8.0f}KB"
+            )
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, nargs="+", default=[0, 1000, 3000])
+    parser.add_argument("--steps", type=int, default=30)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
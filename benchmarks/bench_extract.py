@@ -0,0 +1,87 @@
+"""
+Tokens per page and conversion time with and without main-content
+extraction, on a corpus of pages laid out like common real-world sites
+(news, blog, docs and generated-class "div soup", see fakes.realistic_page).
+
+"article" is the token count of the article text alone, the floor for
+what extraction can reach. "recall" is the share of article paragraphs
+that are found word for word in the extracted content.
+
+    python -m benchmarks.bench_extract --pages 5 --repeat 5
+"""
+
+import argparse
+import html
+import re
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+import html2text
+
+from benchmarks.fakes import PAGE_LAYOUTS, realistic_page
+from research_canvas.context import estimate_tokens
+from research_canvas.extract import extract_main_content
+
+_TAG = re.compile(r"<[^>]+>")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _words(markup: str) -> str:
+    return " ".join(_WORD.findall(html.unescape(_TAG.sub(" ", markup)).lower()))
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def _measure(page: str, article: List[str], repeat: int) -> Dict[str, float]:
+    extracted = extract_main_content(page)
+    text = _words(extracted)
+    return {
+        "kb": len(page) / 1024,
+        "full": estimate_tokens(html2text.html2text(page)),
+        "extracted": estimate_tokens(html2text.html2text(extracted)),
+        "article": estimate_tokens("\n\n".join(article)),
+        "full_ms": _time(lambda: html2text.html2text(page), repeat) * 1000,
+        "extract_ms": _time(lambda: extract_main_content(page), repeat) * 1000,
+        "extracted_ms": _time(lambda: html2text.html2text(extract_main_content(page)), repeat) * 1000,
+        "recall": sum(_words(paragraph) in text for paragraph in article) / len(article),
+    }
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=5, help="pages per layout")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'layout':<8} {'html':>7} {'tokens full':>12} {'extracted':>10} {'article':>8} "
+          f"{'convert':>8} {'extract':>8} {'+convert':>9} {'recall':>7}")
+    rows = []
+    for layout in PAGE_LAYOUTS:
+        results = [
+            _measure(*realistic_page(f"{layout}-{i}", layout, paragraphs=8 + 6 * i), args.repeat)
+            for i in range(args.pages)
+        ]
+        rows.extend(results)
+        r = {key: statistics.mean(result[key] for result in results) for key in results[0]}
+        print(f"{layout:<8} {r['kb']:>5.0f}KB {r['full']:>12.0f} {r['extracted']:>10.0f} {r['article']:>8.0f} "
+              f"{r['full_ms']:>6.1f}ms {r['extract_ms']:>6.1f}ms {r['extracted_ms']:>7.1f}ms "
+              f"{min(result['recall'] for result in results):>7.0%}")
+
+    full = sum(row["full"] for row in rows)
+    extracted = sum(row["extracted"] for row in rows)
+    full_ms = sum(row["full_ms"] for row in rows)
+    extracted_ms = sum(row["extracted_ms"] for row in rows)
+    print(f"\n{len(rows)} pages: {full / extracted:.1f}x fewer tokens, "
+          f"{full_ms / extracted_ms:.1f}x less conversion time, "
+          f"lowest recall {min(row['recall'] for row in rows):.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Tail latency of model calls against two fake providers whose time to first
+token is usually short but sometimes very long, with one provider only,
+with failover, and with hedging (MODEL_FALLBACK plus MODEL_HEDGE), where
+a backup request goes out once the primary misses the p95 deadline.
+
+Calls run through invoke_model under astream_events, so they stream like
+they do when CopilotKit drives the graph.
+
+    python -m benchmarks.bench_hedge --calls 400 --slow-rate 0.05 --slow 4
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from typing import Any, AsyncIterator, Dict, List
+
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+# pylint: disable=wrong-import-position,protected-access
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from research_canvas import hedge, metrics, model
+
+
+class LatencyModel(BaseChatModel):
+    """Streams a short reply after a first-token delay drawn from a two-mode distribution."""
+    fast: float = 0.3
+    slow: float = 4.0
+    slow_rate: float = 0.05
+    tokens: int = 20
+    tokens_per_second: float = 200.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "latency"
+
+    def _first_token(self) -> float:
+        if random.random() < self.slow_rate:
+            return random.uniform(0.5, 1.5) * self.slow
+        return random.lognormvariate(0, 0.25) * self.fast
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        raise NotImplementedError
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._first_token() + self.tokens / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage("word " * self.tokens))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._first_token())
+        for _ in range(self.tokens):
+            yield ChatGenerationChunk(message=AIMessageChunk(content="word "))
+            await asyncio.sleep(1 / self.tokens_per_second)
+
+
+def _install(args):
+    providers = {
+        "fake_primary": LatencyModel(fast=args.fast, slow=args.slow, slow_rate=args.slow_rate),
+        "fake_backup": LatencyModel(fast=args.fast * args.backup_factor, slow=args.slow, slow_rate=args.slow_rate),
+    }
+    for name in providers:
+        model._MODEL_PARAMS[name] = {}
+    model._create_model = lambda provider, params: providers[provider]
+
+
+async def _call(index: int) -> float:
+    async def run(_input, config):
+        return await model.invoke_model({"model": "fake_primary"}, [HumanMessage(f"call {index}")], config)
+
+    start = time.perf_counter()
+    async for _ in RunnableLambda(run).astream_events(None, version="v2"):
+        pass
+    return time.perf_counter() - start
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _run_mode(mode: str, args) -> Dict[str, Any]:
+    model.MODEL_FALLBACK = "" if mode == "single" else "fake_backup"
+    model.MODEL_HEDGE = mode == "hedged"
+    model.LATENCIES.__init__()
+    random.seed(args.seed)
+    before = sum(
+        metrics.get_counter("model_backup_requests_total", reason=reason, node="unknown", provider="fake_primary")
+        for reason in ("hedge", "failover")
+    )
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(index: int) -> float:
+        async with semaphore:
+            return await _call(index)
+
+    latencies = await asyncio.gather(*(one(i) for i in range(args.calls)))
+    backups = sum(
+        metrics.get_counter("model_backup_requests_total", reason=reason, node="unknown", provider="fake_primary")
+        for reason in ("hedge", "failover")
+    ) - before
+    return {
+        "mode": mode,
+        "p50": statistics.median(latencies),
+        "p95": _percentile(latencies, 0.95),
+        "p99": _percentile(latencies, 0.99),
+        "max": max(latencies),
+        "backups": backups / args.calls,
+        "deadline": model.LATENCIES.deadline(("fake_primary", "default", "unknown")),
+    }
+
+
+async def _run(args):
+    _install(args)
+    print(f"{args.calls} calls, first token {args.fast}s typical, "
+          f"{args.slow_rate:.0%} take ~{args.slow}s, {args.concurrency} at a time\n")
+    print(f"{'mode':<8} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7} {'backups':>8} {'deadline':>9}")
+    for mode in ("single", "failover", "hedged"):
+        r = await _run_mode(mode, args)
+        print(f"{r['mode']:<8} {r['p50']:>6.2f}s {r['p95']:>6.2f}s {r['p99']:>6.2f}s {r['max']:>6.2f}s "
+              f"{r['backups']:>7.1%} {r['deadline']:>8.2f}s")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--fast", type=float, default=0.3, help="typical first-token latency")
+    parser.add_argument("--slow", type=float, default=4.0, help="first-token latency of slow requests")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="share of slow requests")
+    parser.add_argument("--backup-factor", type=float, default=1.5, help="how much slower the backup usually is")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    hedge.HEDGE_MIN_SAMPLES = min(hedge.HEDGE_MIN_SAMPLES, args.calls // 10)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
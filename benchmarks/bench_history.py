@@ -0,0 +1,91 @@
+"""
+Tokens sent per turn over a replayed 50-turn blog-editing session,
+full history versus compacted history.
+
+Every turn the user asks for a revision and the model answers with a
+WriteBlogPost call carrying the full post plus the five infographic calls,
+and every fifth turn also runs a search.
+
+    python -m benchmarks.bench_history --turns 50 --budget 8000
+"""
+
+import argparse
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from research_canvas.history import compact_history, message_tokens
+
+_INFOGRAPHICS = [
+    ("GenerateQuoteInfographic", "quote_info"),
+    ("GenerateStepsInfographic", "steps_info"),
+    ("GenerateComparisonInfographic", "comparison_info"),
+    ("GenerateStatisticsInfographic", "stats_info"),
+    ("GenerateBarChartInfographic", "bars_info"),
+]
+
+
+def _tool_call(name, args):
+    return {"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "tool_call"}
+
+
+def _turn(i: int, words: int):
+    messages = [HumanMessage(f"Please revise section {i % 7} to focus more on team communication.")]
+    if i % 5 == 0:
+        search = _tool_call("Search", {"queries": [f"remote work study {i}", f"async communication {i}"]})
+        messages.append(AIMessage("", tool_calls=[search]))
+        results = [{"url": f"https://example.com/{i}/{j}", "title": f"Result {j}", "content": "lorem ipsum " * 60}
+                   for j in range(10)]
+        messages.append(ToolMessage(tool_call_id=search["id"], content=f"Added the following resources: {results}"))
+
+    content = " ".join(f"word{j % 500}" for j in range(words))
+    calls = [_tool_call("WriteBlogPost", {"blog_post": {"title": "Remote work", "content": content}})]
+    calls += [_tool_call(name, {key: {"title": f"{key} {i}", "items": ["point"] * 6}}) for name, key in _INFOGRAPHICS]
+    messages.append(AIMessage("", tool_calls=calls))
+    messages += [ToolMessage(tool_call_id=call["id"], content=f"{call['name']} done.") for call in calls]
+    messages.append(AIMessage("I've updated the post and the infographics."))
+    return messages
+
+
+def _check_pairing(messages):
+    """Every tool call must be answered before the next non-tool message."""
+    pending = set()
+    for message in messages:
+        if isinstance(message, ToolMessage):
+            pending.discard(message.tool_call_id)
+            continue
+        assert not pending, f"unanswered tool calls: {pending}"
+        if isinstance(message, AIMessage):
+            pending = {call["id"] for call in message.tool_calls}
+    assert not pending
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--words", type=int, default=3000)
+    parser.add_argument("--budget", type=int, default=8000)
+    args = parser.parse_args()
+
+    history = []
+    total_full = total_compacted = 0
+    print(f"{'turn':>5} {'full':>9} {'compacted':>10}")
+    for i in range(1, args.turns + 1):
+        # the model is called with everything up to and including the new request
+        turn = _turn(i, args.words)
+        history.append(turn[0])
+        full = sum(message_tokens(message) for message in history)
+        compacted_messages = compact_history(history, args.budget)
+        _check_pairing(compacted_messages)
+        compacted = sum(message_tokens(message) for message in compacted_messages)
+        total_full += full
+        total_compacted += compacted
+        if i == 1 or i % 5 == 0:
+            print(f"{i:>5} {full:>9} {compacted:>10}")
+        history.extend(turn[1:])
+    print(f"{'total':>5} {total_full:>9} {total_compacted:>10}")
+
+
+if __name__ == "__main__":
+    main()
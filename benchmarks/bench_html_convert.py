@@ -0,0 +1,89 @@
+"""
+Event-loop lag while many multi-megabyte pages are converted to markdown,
+inline on the loop versus in a thread pool or a process pool.
+
+    python -m benchmarks.bench_html_convert --pages 8 --size-mb 2
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import html2text
+
+from research_canvas.download import html_to_markdown
+
+
+def _make_page(size: int) -> str:
+    paragraph = (
+        "<p>Remote work has <a href='https://example.com'>changed</a> how teams "
+        "<strong>collaborate</strong>, communicate and measure output.</p>\n"
+    )
+    section = "<h2>Section</h2>\n" + paragraph * 20 + "<ul>" + "<li>item</li>" * 10 + "</ul>\n"
+    body = section * (size // len(section) + 1)
+    return f"<html><head><title>Page</title></head><body>{body[:size]}</body></html>"
+
+
+async def _measure_lag(work, interval: float = 0.01):
+    """Run `work` while a ticker records how late each wake-up is."""
+    lags = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(max(0.0, time.perf_counter() - start - interval))
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    return elapsed, lags
+
+
+async def _run(args):
+    pages = [_make_page(int(args.size_mb * 1024 * 1024)) for _ in range(args.pages)]
+
+    async def inline():
+        for page in pages:
+            html2text.html2text(page)
+            await asyncio.sleep(0)
+
+    def pooled(executor):
+        async def work():
+            await asyncio.gather(*[html_to_markdown(page, executor) for page in pages])
+        return work
+
+    with ThreadPoolExecutor(args.workers) as threads, ProcessPoolExecutor(args.workers) as processes:
+        # warm up the process pool so worker start-up isn't measured
+        await asyncio.gather(*[html_to_markdown("<p>warm</p>", processes) for _ in range(args.workers)])
+
+        print(f"{args.pages} pages of {args.size_mb} MB")
+        print(f"{'mode':>8} {'wall':>8} {'max lag':>9} {'p95 lag':>9} {'mean lag':>9}")
+        for name, work in [("inline", inline), ("thread", pooled(threads)), ("process", pooled(processes))]:
+            elapsed, lags = await _measure_lag(work)
+            lags = sorted(lags) or [0.0]
+            p95 = lags[min(len(lags) - 1, int(len(lags) * 0.95))]
+            print(
+                f"{name:>8} {elapsed:>7.2f}s {max(lags) * 1000:>7.1f}ms "
+                f"{p95 * 1000:>7.1f}ms {statistics.mean(lags) * 1000:>7.1f}ms"
+            )
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--size-mb", type=float, default=2)
+    parser.add_argument("--workers", type=int, default=4)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Load harness: concurrent sessions, each running full research turns
+(search, resource selection, blog post, reply) against fake model, search
+and web backends, so runs are reproducible and cost nothing.
+
+Reports p50/p95/p99 turn latency, throughput, event-loop lag and RSS for
+each concurrency level. By default the compiled graph is driven in-process
+the way CopilotKit drives it (astream_events); with --target http the
+demo server is started with the same fakes and /copilotkit is called over HTTP.
+
+    python -m benchmarks.bench_load --sessions 1 10 50 100 500 --turns 2
+    python -m benchmarks.bench_load --target http --sessions 1 50
+    python -m benchmarks.bench_load --compare HEAD~5 HEAD --sessions 1 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+_STATE_DIR = tempfile.mkdtemp(prefix="bench_load_")
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+os.environ.setdefault("CHECKPOINTER", "sqlite")
+os.environ.setdefault("CHECKPOINT_PATH", os.path.join(_STATE_DIR, "checkpoints.sqlite3"))
+os.environ.setdefault("CACHE_PATH", os.path.join(_STATE_DIR, "cache.sqlite3"))
+
+_ROOT = Path(__file__).resolve().parent.parent
+
+
+def rss_bytes(pid: Optional[int] = None) -> int:
+    """Current resident set size of a process, from /proc."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status", encoding="utf-8") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource # pylint: disable=import-outside-toplevel
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class LagMonitor:
+    """
+    Measures event-loop lag: how late a ticker that sleeps `interval` wakes up.
+    """
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _tick(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    @property
+    def running(self) -> bool:
+        """Whether the ticker has been started."""
+        return self._task is not None
+
+    def start(self):
+        """Start ticking on the running loop."""
+        self._task = asyncio.create_task(self._tick())
+
+    def stop(self):
+        """Stop ticking."""
+        if self._task is not None:
+            self._task.cancel()
+
+    def stats(self, reset: bool = False) -> Dict[str, float]:
+        """p99 and max lag in seconds since the last reset."""
+        lags = sorted(self.lags) or [0.0]
+        if reset:
+            self.lags = []
+        return {"lag_p99": lags[int(0.99 * (len(lags) - 1))], "lag_max": lags[-1]}
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(percentile / 100 * len(ordered)))]
+
+
+class GraphTarget:
+    """Runs turns against the compiled graph in this process."""
+    def __init__(self):
+        # pylint: disable=import-outside-toplevel
+        from langchain_core.messages import HumanMessage
+        from research_canvas.agent import graph
+        self.graph = graph
+        self.message = HumanMessage
+        self.monitor = LagMonitor()
+
+    async def start(self):
+        """Start measuring lag."""
+        self.monitor.start()
+
+    async def turn(self, thread_id: str, text: str):
+        """Run one turn, consuming every event like CopilotKit does."""
+        config = {"configurable": {"thread_id": thread_id}, "recursion_limit": 50}
+        state = {"model": "fake", "messages": [self.message(content=text)]}
+        async for _ in self.graph.astream_events(state, config, version="v2"):
+            pass
+
+    async def stats(self) -> Dict[str, float]:
+        """Lag and RSS since the last call."""
+        return {**self.monitor.stats(reset=True), "rss": rss_bytes()}
+
+    async def stop(self):
+        """Stop measuring lag and release the download pools."""
+        from research_canvas.download import close_session, shutdown_executor # pylint: disable=import-outside-toplevel
+        self.monitor.stop()
+        await close_session()
+        shutdown_executor()
+
+
+class HttpTarget:
+    """Runs turns against the demo server's /copilotkit endpoint."""
+    def __init__(self, args):
+        self.args = args
+        self.url = f"http://127.0.0.1:{args.port}"
+        self.process: Optional[subprocess.Popen] = None
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        """Start the server with fake backends and wait until it is healthy."""
+        self.process = subprocess.Popen([ # pylint: disable=consider-using-with
+            sys.executable, "-m", "benchmarks.load_server", "--port", str(self.args.port),
+            "--latency", str(self.args.latency), "--tokens-per-second", str(self.args.tokens_per_second),
+            "--search-latency", str(self.args.search_latency), "--page-latency", str(self.args.page_latency),
+        ], env={**os.environ, "LOG_LEVEL": "WARNING"})
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=0), timeout=aiohttp.ClientTimeout(total=600)
+        )
+        for _ in range(300):
+            try:
+                async with self.session.get(f"{self.url}/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+        raise RuntimeError("load server did not start")
+
+    async def turn(self, thread_id: str, text: str):
+        """Run one turn and read the streamed response to the end."""
+        assert self.session is not None
+        body = {
+            "name": "research_agent",
+            "threadId": thread_id,
+            "state": {"model": "fake"},
+            "messages": [{"id": uuid.uuid4().hex, "role": "user", "content": text}],
+            "actions": [],
+        }
+        async with self.session.post(f"{self.url}/copilotkit/agents/execute", json=body) as response:
+            response.raise_for_status()
+            async for _ in response.content.iter_any():
+                pass
+
+    async def stats(self) -> Dict[str, float]:
+        """Server-side lag and RSS since the last call."""
+        assert self.session is not None and self.process is not None
+        async with self.session.get(f"{self.url}/bench/stats") as response:
+            stats = await response.json()
+        return {**stats, "rss": rss_bytes(self.process.pid)}
+
+    async def stop(self):
+        """Stop the server."""
+        if self.session is not None:
+            await self.session.close()
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+
+
+async def _run_level(target, sessions: int, turns: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+
+    async def session(index: int):
+        nonlocal errors
+        thread_id = uuid.uuid4().hex
+        for turn in range(turns):
+            start = time.perf_counter()
+            try:
+                await target.turn(thread_id, f"Write a blog post about remote work, part {index}.{turn}")
+                latencies.append(time.perf_counter() - start)
+            except Exception: # pylint: disable=broad-except
+                errors += 1
+                # the first failure of a level, the others are usually the same
+                if errors == 1:
+                    print(f"turn failed at {sessions} sessions:", file=sys.stderr)
+                    traceback.print_exc()
+
+    await target.stats()
+    start = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    stats = await target.stats()
+
+    # no percentiles without a successful turn
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "errors": errors,
+        "p50": statistics.median(latencies) if latencies else None,
+        "p95": _percentile(latencies, 95) if latencies else None,
+        "p99": _percentile(latencies, 99) if latencies else None,
+        "throughput": len(latencies) / elapsed,
+        **stats,
+    }
+
+
+def _seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}s"
+
+
+def _print_results(results: List[Dict[str, Any]]):
+    print(f"{'sessions':>8} {'turns':>6} {'err':>4} {'p50':>7} {'p95':>7} {'p99':>7} "
+          f"{'turns/s':>8} {'lag p99':>8} {'lag max':>8} {'rss MB':>7}")
+    for r in results:
+        print(f"{r['sessions']:>8} {r['turns']:>6} {r['errors']:>4} {_seconds(r['p50']):>7} "
+              f"{_seconds(r['p95']):>7} {_seconds(r['p99']):>7} {r['throughput']:>8.2f} "
+              f"{r['lag_p99'] * 1000:>6.1f}ms {r['lag_max'] * 1000:>6.1f}ms {r['rss'] / 2**20:>7.0f}")
+
+
+async def _run(args) -> List[Dict[str, Any]]:
+    server = None
+    if args.target == "http":
+        target: Any = HttpTarget(args)
+    else:
+        from benchmarks import fakes # pylint: disable=import-outside-toplevel
+        target = GraphTarget()
+        server = fakes.FixtureServer(latency=args.page_latency).start()
+        fakes.install(args.latency, args.tokens_per_second, args.search_latency, server.base_url)
+    await target.start()
+    try:
+        results = []
+        for sessions in args.sessions:
+            results.append(await _run_level(target, sessions, args.turns))
+        return results
+    finally:
+        await target.stop()
+        if server is not None:
+            server.stop()
+
+
+def _compare(args, argv: List[str]):
+    """Run the same load against two commits, using this version of the harness for both."""
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="bench_compare_") as tmp:
+        harness = Path(tmp) / "harness"
+        shutil.copytree(_ROOT / "benchmarks", harness / "benchmarks",
+                        ignore=shutil.ignore_patterns("__pycache__"))
+        # the same arguments without "--compare REV REV"
+        index = argv.index("--compare")
+        passthrough = argv[:index] + argv[index + 3:]
+
+        for rev in args.compare:
+            tree = Path(tmp) / f"tree-{len(runs)}"
+            subprocess.run(["git", "-C", str(_ROOT), "worktree", "add", "--detach", str(tree), rev],
+                           check=True, capture_output=True)
+            output = Path(tmp) / f"results-{len(runs)}.json"
+            try:
+                subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_load", *passthrough, "--json", str(output)],
+                    cwd=harness, env={**os.environ, "PYTHONPATH": os.pathsep.join(
+                        filter(None, [str(tree), os.environ.get("PYTHONPATH")])
+                    )}, check=True,
+                )
+                runs.append((rev, json.loads(output.read_text())))
+            finally:
+                subprocess.run(["git", "-C", str(_ROOT), "worktree", "remove", "--force", str(tree)],
+                               check=False, capture_output=True)
+
+    (rev_a, results_a), (rev_b, results_b) = runs
+    print(f"\n{rev_a} -> {rev_b}")
+    print(f"{'sessions':>8} {'p50':>16} {'p95':>16} {'p99':>16} {'turns/s':>16} {'rss MB':>12}")
+    for a, b in zip(results_a, results_b):
+        cells = [
+            f"{a[key] / 2**20:.0f}->{b[key] / 2**20:.0f}" if key == "rss"
+            else "->".join("-" if r[key] is None else f"{r[key]:.2f}" for r in (a, b))
+            for key in ("p50", "p95", "p99", "throughput", "rss")
+        ]
+        print(f"{a['sessions']:>8} {cells[0]:>16} {cells[1]:>16} {cells[2]:>16} {cells[3]:>16} {cells[4]:>12}")
+
+
+def main():
+    """Run the load harness."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["graph", "http"], default="graph")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50, 100, 250, 500])
+    parser.add_argument("--turns", type=int, default=2, help="turns per session")
+    parser.add_argument("--latency", type=float, default=0.2, help="model time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--page-latency", type=float, default=0.05, help="fixture web page latency")
+    parser.add_argument("--port", type=int, default=8765, help="port of the server with --target http")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--compare", nargs=2, metavar="REV", help="compare two commits")
+    args = parser.parse_args()
+
+    try:
+        if args.compare:
+            _compare(args, sys.argv[1:])
+            return
+        results = asyncio.run(_run(args))
+        _print_results(results)
+        if args.json:
+            Path(args.json).write_text(json.dumps(results, indent=2))
+    finally:
+        shutil.rmtree(_STATE_DIR, ignore_errors=True)
+    failed = [r["sessions"] for r in results if r["errors"] and not r["turns"]]
+    if failed:
+        sys.exit(f"every turn failed at {', '.join(map(str, failed))} sessions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Per-turn overhead of getting the chat model with its seven tools bound,
+constructing a fresh client every turn versus reusing the cached one.
+No requests are sent.
+
+    python -m benchmarks.bench_model_overhead --turns 200 --model openai
+"""
+
+import argparse
+import os
+import time
+
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+# pylint: disable=wrong-import-position
+from research_canvas import model as model_module
+from research_canvas.chat import CHAT_TOOLS
+from research_canvas.model import get_model_with_tools
+
+
+def _uncached(state):
+    """What every turn did before: build a client, then convert the tool schemas."""
+    provider, params, _ = model_module._model_key(state, {}) # pylint: disable=protected-access
+    return model_module._create_model(provider, params).bind_tools(CHAT_TOOLS) # pylint: disable=protected-access
+
+
+def _cached(state):
+    return get_model_with_tools(state, CHAT_TOOLS)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--model", default="openai", choices=["openai", "anthropic", "google_genai"])
+    args = parser.parse_args()
+    state = {"model": args.model}
+
+    print(f"{'mode':>9} {'per turn':>12}")
+    for name, fn in [("uncached", _uncached), ("cached", _cached)]:
+        fn(state)
+        start = time.perf_counter()
+        for _ in range(args.turns):
+            fn(state)
+        per_turn = (time.perf_counter() - start) / args.turns
+        print(f"{name:>9} {per_turn * 1e6:>10.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Time to first draft of a research turn with and without speculative
+prefetch (SEARCH_PREFETCH), against the fake model and search backends and
+a fixture web server whose pages take --page-latency seconds.
+
+The first draft is the first streamed WriteBlogPost token. Without prefetch
+the chosen pages are only downloaded by download_node, after the
+ExtractResources call returns; with prefetch the best results are
+downloaded while that call runs. Every turn starts with empty caches.
+
+    python -m benchmarks.bench_prefetch --turns 10 --page-latency 0.8
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+_STATE_DIR = tempfile.mkdtemp(prefix="bench_prefetch_")
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+os.environ.setdefault("CHECKPOINTER", "memory")
+os.environ.setdefault("CACHE_PATH", os.path.join(_STATE_DIR, "cache.sqlite3"))
+
+# pylint: disable=wrong-import-position,protected-access
+from langchain_core.messages import HumanMessage
+
+from benchmarks import fakes
+from research_canvas import download, metrics, search
+
+
+async def _turn(graph, text: str) -> Dict[str, float]:
+    download._RESOURCE_CACHE.clear()
+    search._SEARCH_CACHE.clear()
+    config = {"configurable": {"thread_id": uuid.uuid4().hex}, "recursion_limit": 50}
+    state = {"model": "fake", "messages": [HumanMessage(content=text)]}
+    start = time.perf_counter()
+    first_draft = None
+    async for event in graph.astream_events(state, config, version="v2"):
+        if first_draft is None and event["event"] == "on_chat_model_stream":
+            chunks = event["data"]["chunk"].tool_call_chunks
+            if any(chunk.get("name") == "WriteBlogPost" for chunk in chunks):
+                first_draft = time.perf_counter() - start
+    return {"first_draft": first_draft or 0.0, "turn": time.perf_counter() - start}
+
+
+async def _run_mode(graph, prefetch: int, args) -> Dict[str, float]:
+    search.SEARCH_PREFETCH = prefetch
+    before = {
+        result: metrics.get_counter("search_prefetch_total", result=result) for result in ("used", "unused")
+    }
+    runs: List[Dict[str, float]] = []
+    for i in range(args.turns):
+        runs.append(await _turn(graph, f"Write about remote work, part {i} {uuid.uuid4().hex[:6]}"))
+    return {
+        "first_draft": statistics.median(run["first_draft"] for run in runs),
+        "turn": statistics.median(run["turn"] for run in runs),
+        **{
+            result: metrics.get_counter("search_prefetch_total", result=result) - count
+            for result, count in before.items()
+        },
+    }
+
+
+async def _run(args):
+    server = fakes.FixtureServer(latency=args.page_latency).start()
+    fakes.install(args.latency, args.tokens_per_second, args.search_latency, server.base_url)
+    from research_canvas.agent import graph # pylint: disable=import-outside-toplevel
+    try:
+        print(f"model first token {args.latency}s, search {args.search_latency}s, "
+              f"pages {args.page_latency}s, {args.turns} turns\n")
+        print(f"{'prefetch':>8} {'first draft':>12} {'turn':>8} {'used':>5} {'unused':>7}")
+        for prefetch in (0, args.prefetch):
+            r = await _run_mode(graph, prefetch, args)
+            print(f"{prefetch:>8} {r['first_draft']:>11.2f}s {r['turn']:>7.2f}s "
+                  f"{r['used']:>5.0f} {r['unused']:>7.0f}")
+    finally:
+        await download.close_session()
+        download.shutdown_executor()
+        server.stop()
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--prefetch", type=int, default=search.SEARCH_PREFETCH or 3)
+    parser.add_argument("--latency", type=float, default=0.5, help="model time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--page-latency", type=float, default=0.8)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
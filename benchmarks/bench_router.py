@@ -0,0 +1,76 @@
+"""
+Static prompt size (instructions plus tool schemas) and model tier of the
+chat turns of a scripted conversation, with routing off versus routed by
+the rules. Turns the rules can't decide count as full turns here; with
+ROUTER_MODE=model they would cost a small-model call instead. No requests
+are sent.
+
+    python -m benchmarks.bench_router
+"""
+
+import json
+import os
+
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+# pylint: disable=wrong-import-position
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from research_canvas import chat
+from research_canvas.context import estimate_tokens
+from research_canvas.router import classify_rules
+
+
+def _call(name: str, call_id: str) -> AIMessage:
+    return AIMessage("", tool_calls=[{"name": name, "args": {}, "id": call_id}])
+
+
+# (description, messages up to the chat turn, whether a post exists)
+_TURNS = [
+    ("ask for a post", [HumanMessage("Write a blog post about remote work")], False),
+    ("post after search", [HumanMessage("Write a blog post about remote work"), _call("Search", "1"),
+                           ToolMessage("Added 2 resources", tool_call_id="1")], False),
+    ("infographics after post", [HumanMessage("Write a blog post about remote work"), _call("WriteBlogPost", "2"),
+                                 ToolMessage("Blog post updated.", tool_call_id="2")], True),
+    ("reply after infographics", [_call("GenerateQuoteInfographic", "3"),
+                                  ToolMessage("Quote infographic has been updated.", tool_call_id="3")], True),
+    ("thanks", [HumanMessage("thanks!")], True),
+    ("search only", [HumanMessage("Find sources on four-day work weeks")], True),
+    ("reply after search", [HumanMessage("Find sources on four-day work weeks"), _call("Search", "4"),
+                            ToolMessage("Added 2 resources", tool_call_id="4")], True),
+    ("fix a typo", [HumanMessage("Fix the typo in the intro")], True),
+    ("new chart", [HumanMessage("Add a bar chart about adoption")], True),
+    ("open question", [HumanMessage("Which angle would work best for managers?")], True),
+]
+
+
+def _prompt_tokens(tools, instructions: str) -> int:
+    schemas = json.dumps([convert_to_openai_tool(tool) for tool in tools])
+    return estimate_tokens(instructions) + estimate_tokens(schemas)
+
+
+def main():
+    """Run the benchmark."""
+    full_tools, full_instructions, _ = chat._worker("full", True) # pylint: disable=protected-access
+    full = _prompt_tokens(full_tools, full_instructions)
+    print(f"{'turn':<26} {'intent':<13} {'tier':<8} {'tools':>5} {'prompt tok':>11} {'full tok':>9}")
+    total = routed_total = small = 0
+    for name, messages, has_post in _TURNS:
+        state = {"messages": messages, "blog_post": {"title": "", "content": "text" if has_post else ""}}
+        intent = classify_rules(state) or "full"
+        tools, instructions, tier = chat._worker(intent, has_post) # pylint: disable=protected-access
+        if intent != "full":
+            history_tools = chat._history_tools(messages) # pylint: disable=protected-access
+            tools = [*tools, *(tool for tool in history_tools if tool not in tools)]
+        tokens = _prompt_tokens(tools, instructions)
+        print(f"{name:<26} {intent:<13} {tier:<8} {len(tools):>5} {tokens:>11} {full:>9}")
+        total += full
+        routed_total += tokens
+        small += tier == "small"
+    print(f"\nstatic prompt tokens: {total} -> {routed_total} ({1 - routed_total / total:.0%} fewer), "
+          f"{small}/{len(_TURNS)} turns on the small model")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Bursts of concurrent calls against a fake provider that allows --limit
+requests per second and answers 429 with Retry-After beyond that, sent
+directly with fixed-delay client retries (like unscheduled calls) versus
+through the admission scheduler with a budget matching the limit.
+
+Reports completed and failed calls, 429s, p50/p99 latency of interactive
+and background calls and rejections by the bounded queue.
+
+    python -m benchmarks.bench_scheduler --calls 200 --limit 20
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+from collections import deque
+from typing import Deque, Dict, List
+
+from research_canvas import scheduler
+
+
+class RateLimited(Exception):
+    """A 429 from the fake provider."""
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__("rate limited")
+        self.response = type("Response", (), {"headers": {"retry-after": f"{retry_after:.3f}"}})()
+
+
+class FakeProvider:
+    """Allows `limit` requests in any one-second window, each taking `latency` seconds."""
+    def __init__(self, limit: int, latency: float):
+        self.limit = limit
+        self.latency = latency
+        self.window: Deque[float] = deque()
+        self.rejected = 0
+
+    async def call(self):
+        """One request."""
+        now = time.monotonic()
+        while self.window and now - self.window[0] >= 1.0:
+            self.window.popleft()
+        if len(self.window) >= self.limit:
+            self.rejected += 1
+            raise RateLimited(1.0 - (now - self.window[0]))
+        self.window.append(now)
+        await asyncio.sleep(self.latency)
+
+
+async def _direct(provider: FakeProvider, retries: int):
+    """What an SDK client does on its own: retry after a short fixed delay."""
+    for attempt in range(retries + 1):
+        try:
+            return await provider.call()
+        except RateLimited:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(0.5)
+
+
+async def _run_mode(mode: str, args) -> Dict[str, float]:
+    provider = FakeProvider(args.limit, args.latency)
+    budget = scheduler.Budget(mode, rpm=args.limit * 60, tpm=0, max_queue=args.max_queue)
+    # start from an empty bucket, like right after an earlier burst
+    budget.requests.level = 0
+    latencies: Dict[int, List[float]] = {scheduler.INTERACTIVE: [], scheduler.BACKGROUND: []}
+    failed = rejected = 0
+
+    async def one(index: int):
+        nonlocal failed, rejected
+        priority = scheduler.BACKGROUND if index % 3 == 0 else scheduler.INTERACTIVE
+        start = time.perf_counter()
+        try:
+            if mode == "direct":
+                await _direct(provider, args.retries)
+            else:
+                await scheduler.run(budget, provider.call, priority=priority)
+            latencies[priority].append(time.perf_counter() - start)
+        except scheduler.SchedulerOverloaded:
+            rejected += 1
+        except RateLimited:
+            failed += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.calls)))
+    elapsed = time.perf_counter() - start
+
+    def pct(values: List[float], q: float) -> float:
+        values = sorted(values) or [0.0]
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    return {
+        "ok": sum(len(values) for values in latencies.values()),
+        "failed": failed,
+        "rejected": rejected,
+        "429s": provider.rejected,
+        "fg_p50": statistics.median(latencies[scheduler.INTERACTIVE] or [0.0]),
+        "fg_p99": pct(latencies[scheduler.INTERACTIVE], 0.99),
+        "bg_p99": pct(latencies[scheduler.BACKGROUND], 0.99),
+        "elapsed": elapsed,
+    }
+
+
+async def _run(args):
+    print(f"{args.calls} calls at once, provider limit {args.limit}/s, {args.latency}s per call\n")
+    print(f"{'mode':<10} {'ok':>5} {'failed':>7} {'rejected':>9} {'429s':>6} "
+          f"{'fg p50':>8} {'fg p99':>8} {'bg p99':>8} {'total':>7}")
+    for mode in ("direct", "scheduled"):
+        r = await _run_mode(mode, args)
+        print(f"{mode:<10} {r['ok']:>5} {r['failed']:>7} {r['rejected']:>9} {r['429s']:>6} "
+              f"{r['fg_p50']:>7.2f}s {r['fg_p99']:>7.2f}s {r['bg_p99']:>7.2f}s {r['elapsed']:>6.2f}s")
+
+
+def main():
+    """Run the benchmark."""
+    logging.getLogger("research_canvas.scheduler").setLevel(logging.ERROR)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20, help="provider requests per second")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per call")
+    parser.add_argument("--retries", type=int, default=int(os.getenv("SCHEDULER_MAX_RETRIES", "3")),
+                        help="client retries in direct mode")
+    parser.add_argument("--max-queue", type=int, default=scheduler.SCHEDULER_MAX_QUEUE)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Wall time of N Tavily-style queries, sequential versus concurrent,
+against a local fake search backend.
+
+    python -m benchmarks.bench_search --queries 1 5 10 --latency 0.3
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+# pylint: disable=wrong-import-position
+from research_canvas.search import search_queries
+from benchmarks.fakes import FakeSearchClient
+
+
+async def _sequential(client: FakeSearchClient, queries):
+    return [client.search(query) for query in queries]
+
+
+async def _concurrent(client: FakeSearchClient, queries, concurrency: int):
+    return await search_queries(queries, client=client, concurrency=concurrency)
+
+
+async def _run(args):
+    client = FakeSearchClient(args.latency)
+    print(f"{'queries':>8} {'sequential':>12} {'concurrent':>12} {'speedup':>8}")
+    for n in args.queries:
+        queries = [f"query {i}" for i in range(n)]
+
+        start = time.perf_counter()
+        await _sequential(client, queries)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await _concurrent(client, queries, args.concurrency)
+        concurrent = time.perf_counter() - start
+
+        print(f"{n:>8} {sequential:>11.3f}s {concurrent:>11.3f}s {sequential / concurrent:>7.1f}x")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per search")
+    parser.add_argument("--concurrency", type=int, default=5)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
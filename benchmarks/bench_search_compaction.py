@@ -0,0 +1,45 @@
+"""
+Size of the ExtractResources tool message for recorded Tavily responses,
+as the raw response repr versus the compacted result list.
+
+    python -m benchmarks.bench_search_compaction --snippet-chars 300
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+# pylint: disable=wrong-import-position
+from research_canvas.context import estimate_tokens
+from research_canvas.search import compact_search_results, format_search_results, select_top_results
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-results", type=int, default=10)
+    parser.add_argument("--snippet-chars", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'fixture':<24} {'results':>8} {'unique':>7} {'raw tok':>8} {'compact tok':>12} {'saved':>6}")
+    for path in sorted(FIXTURES.glob("tavily_*.json")):
+        search_results = json.loads(path.read_text())
+        results = compact_search_results(search_results, args.max_results, args.snippet_chars)
+
+        raw = estimate_tokens(f"Performed search: {search_results}")
+        compact = estimate_tokens(f"Performed search:\n{format_search_results(results)}")
+        total = sum(len(response["results"]) for response in search_results)
+        print(
+            f"{path.stem:<24} {total:>8} {len(results):>7} {raw:>8} {compact:>12} "
+            f"{1 - compact / raw:>5.0%}"
+        )
+        print(f"{'':<24} top-k: {[resource['url'] for resource in select_top_results(results)]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Serialize/deserialize time and bytes of an AgentState against its size,
+LangGraph's default JsonPlusSerializer versus CompactSerializer, and the
+state encoding StateEmitter compares before each emission, json versus orjson.
+
+The state has a 3000-word blog post, five infographics and, per turn, a
+search round trip in the messages, five resources and a log entry. "rewrite"
+is the next checkpoint writing the same values again, as chat_node does with
+an unchanged blog post.
+
+    python -m benchmarks.bench_serde --turns 2 10 30 --repeat 20
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Callable, Dict
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from research_canvas.serde import CompactSerializer, dumps_json
+
+_WORDS = (
+    "remote work teams productivity office hybrid meeting culture async focus "
+    "research study survey managers employees commute schedule trust tools"
+).split()
+
+
+def _text(words: int) -> str:
+    return " ".join(random.choice(_WORDS) for _ in range(words))
+
+
+def _state(turns: int) -> Dict[str, Any]:
+    random.seed(turns)
+    messages, resources, logs = [], [], []
+    for turn in range(turns):
+        urls = [f"https://example{turn}-{i}.com/articles/remote-work-study-{i}" for i in range(5)]
+        messages += [
+            HumanMessage(_text(25)),
+            AIMessage("", tool_calls=[{"name": "Search", "args": {"queries": [_text(6)]}, "id": f"call_{turn}"}]),
+            ToolMessage(
+                json.dumps([{"url": url, "title": _text(8), "content": _text(80)} for url in urls]),
+                tool_call_id=f"call_{turn}",
+            ),
+            AIMessage(_text(40)),
+        ]
+        resources += [{"url": url, "title": _text(8), "description": _text(30)} for url in urls]
+        logs.append({"message": f"Search for {_text(6)}", "done": True})
+    return {
+        "messages": messages,
+        "model": "openai",
+        "blog_post": {"title": _text(6), "content": _text(3000)},
+        "infographics": [
+            {"type": "steps", "title": _text(6), "steps": [_text(12) for _ in range(5)], "description": _text(30)}
+            for _ in range(5)
+        ],
+        "resources": resources,
+        "logs": logs,
+    }
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def _checkpoint(serde, state: Dict[str, Any], repeat: int, fresh: Callable[[], Any]):
+    """Write each channel as its own blob, like the savers do."""
+    def dump():
+        return {key: serde.dumps_typed(value) for key, value in state.items()}
+
+    encoded = dump()
+    # a fresh serializer per write, so nothing is cached
+    first = _time(lambda: {key: fresh().dumps_typed(value) for key, value in state.items()}, repeat)
+    rewrite = _time(dump, repeat)
+    load = _time(lambda: {key: serde.loads_typed(blob) for key, blob in encoded.items()}, repeat)
+    return first, rewrite, load, sum(len(data) for _, data in encoded.values())
+
+
+def _emit(encode: Callable[[Any], Any], state: Dict[str, Any], repeat: int):
+    def dump():
+        return {key: encode(value) for key, value in state.items() if key != "messages"}
+    return _time(dump, repeat), sum(len(value) for value in dump().values())
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, nargs="+", default=[2, 10, 30])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print("checkpoint (all channels)")
+    print(f"{'turns':>5} {'serializer':<10} {'write':>9} {'rewrite':>9} {'read':>9} {'bytes':>9}")
+    for turns in args.turns:
+        state = _state(turns)
+        for name, serde_type in (("jsonplus", JsonPlusSerializer), ("compact", CompactSerializer)):
+            first, rewrite, load, size = _checkpoint(serde_type(), state, args.repeat, serde_type)
+            print(f"{turns:>5} {name:<10} {first * 1000:>7.2f}ms {rewrite * 1000:>7.2f}ms "
+                  f"{load * 1000:>7.2f}ms {size / 1024:>7.1f}KB")
+
+    print("\nemitted state (without messages)")
+    print(f"{'turns':>5} {'encoder':<10} {'encode':>9} {'bytes':>9}")
+    for turns in args.turns:
+        state = _state(turns)
+        for name, encode in (
+            ("json", lambda value: json.dumps(value, default=str, sort_keys=True)),
+            ("orjson", dumps_json),
+        ):
+            seconds, size = _emit(encode, state, args.repeat)
+            print(f"{turns:>5} {name:<10} {seconds * 1000:>7.3f}ms {size / 1024:>7.1f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Cold-start cost of importing a module (the graph by default), measured in
+fresh interpreters with `python -X importtime`: total import time, RSS after
+import and the slowest imports. Exits non-zero when a budget is exceeded,
+so it can run as a regression check.
+
+    python -m benchmarks.bench_startup --runs 5 --budget-ms 1500 --budget-rss-mb 150
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+_PROBE = """
+import {module}
+with open("/proc/self/status", encoding="utf-8") as status:
+    rss = next((int(line.split()[1]) for line in status if line.startswith("VmRSS:")), 0)
+print(rss * 1024)
+"""
+
+
+def _import_once(module: str) -> Tuple[float, int, Dict[str, float]]:
+    """Import `module` in a fresh interpreter, return (seconds, rss bytes, cumulative seconds per module)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module)],
+        capture_output=True, text=True, check=True,
+        env={**os.environ, "TAVILY_API_KEY": os.getenv("TAVILY_API_KEY", "benchmark")},
+    )
+    cumulative: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        cumulative[name] = int(cumulative_us) / 1e6
+    return cumulative.get(module, 0.0), int(result.stdout.strip().splitlines()[-1]), cumulative
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="research_canvas.agent")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="number of slowest top-level imports to list")
+    parser.add_argument("--budget-ms", type=float, help="fail if the median import time is above this")
+    parser.add_argument("--budget-rss-mb", type=float, help="fail if the median RSS is above this")
+    args = parser.parse_args()
+
+    # the first run warms the bytecode cache and is discarded
+    _import_once(args.module)
+    times: List[float] = []
+    rss: List[int] = []
+    modules: Dict[str, List[float]] = defaultdict(list)
+    for _ in range(args.runs):
+        seconds, rss_bytes, cumulative = _import_once(args.module)
+        times.append(seconds)
+        rss.append(rss_bytes)
+        for name, value in cumulative.items():
+            modules[name].append(value)
+
+    import_ms = statistics.median(times) * 1000
+    rss_mb = statistics.median(rss) / 2**20
+    print(f"{args.module}: import {import_ms:.0f}ms (min {min(times) * 1000:.0f}ms), rss {rss_mb:.0f}MB")
+
+    top_level = {name: statistics.median(values) for name, values in modules.items() if "." not in name}
+    print("\nslowest top-level packages (cumulative, overlapping):")
+    for name, seconds in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {seconds * 1000:>7.1f}ms  {name}")
+    loaded = sorted(name for name in modules if name.startswith("research_canvas."))
+    print(f"\nproject modules loaded: {', '.join(loaded)}")
+
+    failed = False
+    if args.budget_ms is not None and import_ms > args.budget_ms:
+        print(f"\nFAIL: import time {import_ms:.0f}ms exceeds the budget of {args.budget_ms:.0f}ms")
+        failed = True
+    if args.budget_rss_mb is not None and rss_mb > args.budget_rss_mb:
+        print(f"\nFAIL: RSS {rss_mb:.0f}MB exceeds the budget of {args.budget_rss_mb:.0f}MB")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+"""
+Deterministic stand-ins for the model providers, Tavily and the web,
+used by the benchmarks and the load harness.
+
+`install()` points the agent at them: the "fake" model provider, a fake
+Tavily client and, optionally, search results that link to a local HTTP
+fixture server started with `FixtureServer`.
+"""
+
+import asyncio
+import json
+import re
+import threading
+import time
+import uuid
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from aiohttp import web
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+_URL = re.compile(r"https?://[^\s'\",)]+")
+_WORDS = (
+    "remote work teams productivity research shows that flexible schedules reduce commuting "
+    "time while collaboration tools help distributed groups share knowledge and measure output"
+).split()
+
+# arguments for tools the model is forced to call, keyed by tool name
+_INFOGRAPHIC_ARGS = {
+    "GenerateQuoteInfographic": {"quote_info": {
+        "type": "quote", "quote": "Work is something you do, not somewhere you go.",
+        "source": "Unknown", "context": "On remote work",
+    }},
+    "GenerateStepsInfographic": {"steps_info": {
+        "type": "steps", "title": "Going remote", "description": "How to start",
+        "steps": ["Set up tools", "Agree on hours", "Review results"],
+    }},
+    "GenerateComparisonInfographic": {"comparison_info": {
+        "type": "comparison", "title": "Office vs remote", "left_side": ["Focus", "Mentoring"],
+        "right_side": ["Flexibility", "No commute"], "left_title": "Office", "right_title": "Remote",
+        "comparison_aspect": "Work style", "description": "Trade-offs", "conclusion": "Hybrid wins",
+    }},
+    "GenerateStatisticsInfographic": {"stats_info": {
+        "title": "Remote work in numbers", "description": "Survey results",
+        "stats": [{"value": "72 min", "label": "saved per day"}, {"value": "13%", "label": "output"},
+                  {"value": "1/3", "label": "less attrition"}],
+    }},
+    "GenerateBarChartInfographic": {"bars_info": {
+        "title": "Preferred setup", "stats": [{"value": 55, "label": "Hybrid"}, {"value": 35, "label": "Remote"}],
+    }},
+}
+
+
+def _text(words: int, seed: str) -> str:
+    offset = zlib.crc32(seed.encode("utf-8"))
+    return " ".join(_WORDS[(offset + i) % len(_WORDS)] for i in range(words))
+
+
+_SENTENCES = [
+    "Remote workers report saving an average of 72 minutes per day, time that would otherwise be spent commuting.",
+    "A two-year study of 16,000 workers found a 13% performance increase among employees who worked from home.",
+    "Managers, however, frequently cite communication overhead and weaker mentoring of junior staff as the main downsides.",
+    "Collaboration networks became more siloed when teams moved to fully remote work, reducing cross-group ties.",
+    "Access to a larger talent pool is one of the most frequently cited benefits for employers hiring remotely.",
+    "Time zone differences, meeting fatigue and unclear ownership are the largest day-to-day challenges for distributed teams.",
+    "Hybrid schedules, with two or three office days a week, cut attrition by a third in one large randomized trial.",
+    "Office occupancy in major cities has stabilized at around half of its pre-pandemic level, according to badge data.",
+    "Companies that document decisions in writing, rather than in meetings, report fewer misunderstandings across sites.",
+    "Younger employees, in particular, say they value in-person time for learning, networking and informal feedback.",
+    "Productivity measures vary widely, so studies that rely on self-reported output should be read with some caution.",
+    "Some firms now pay a location-adjusted salary, while others keep a single pay band regardless of where people live.",
+    "Async tools such as shared documents, recorded updates and issue trackers replace many status meetings.",
+    "Real estate costs fall when desks are shared, but the savings are partly offset by spending on home-office stipends.",
+]
+
+# every layout wraps the article in the boilerplate of a common kind of site
+PAGE_LAYOUTS = ("news", "blog", "docs", "divsoup")
+
+
+def article_paragraphs(seed: str, count: int) -> List[str]:
+    """Deterministic article paragraphs of three to five sentences."""
+    offset = zlib.crc32(seed.encode("utf-8"))
+    paragraphs = []
+    for i in range(count):
+        size = 3 + (offset + i) % 3
+        paragraphs.append(" ".join(_SENTENCES[(offset + i * 5 + j) % len(_SENTENCES)] for j in range(size)))
+    return paragraphs
+
+
+def _links(prefix: str, count: int, seed: str, words: int = 3) -> str:
+    return "".join(
+        f'<li class="{prefix}-item"><a href="/{prefix}/{i}">{_text(words, seed + prefix + str(i)).title()}</a></li>'
+        for i in range(count)
+    )
+
+
+def _scripts(seed: str, kilobytes: int) -> str:
+    items = [{"id": i, "headline": _text(12, f"{seed}{i}")} for i in range(kilobytes * 8)]
+    state = json.dumps({"props": {"items": items}})
+    return (
+        '<script async src="https://www.googletagmanager.com/gtag/js?id=G-XXXX"></script>'
+        "<script>window.dataLayer=window.dataLayer||[];function gtag(){dataLayer.push(arguments);}"
+        "gtag('js',new Date());gtag('config','G-XXXX');</script>"
+        f'<script id="__NEXT_DATA__" type="application/json">{state}</script>'
+        '<script type="application/ld+json">{"@context":"https://schema.org","@type":"NewsArticle"}</script>'
+    )
+
+
+def _style(kilobytes: int) -> str:
+    rules = "".join(f".c{i}{{margin:0 {i % 16}px;color:#{i % 4096:03x};display:flex}}" for i in range(kilobytes * 25))
+    return f"<style>{rules}</style>"
+
+
+def _icon() -> str:
+    path = " ".join(f"L{i % 24} {(i * 7) % 24}" for i in range(40))
+    return f'<svg viewBox="0 0 24 24" width="24" height="24"><path d="M0 0 {path} Z"/></svg>'
+
+
+def _article_body(paragraphs: List[str], seed: str, tag: str = "p", ads: bool = True) -> str:
+    parts = []
+    for i, paragraph in enumerate(paragraphs):
+        if i and i % 4 == 0:
+            parts.append(f"<h2>{_text(5, f'{seed}h{i}').capitalize()}</h2>")
+        words = paragraph.split(" ")
+        # an inline link in some paragraphs, like most articles have
+        if i % 3 == 1:
+            words[4] = f'<a href="https://example.org/study/{i}">{words[4]}</a>'
+        parts.append(f"<{tag}>{' '.join(words)}</{tag}>")
+        if ads and i % 5 == 2:
+            parts.append('<div class="ad-slot ad"><span>Advertisement</span><div id="div-gpt-ad-1"></div></div>')
+        if i == 3:
+            parts.append(f'<figure><img src="/img/{seed}.jpg" alt="Team meeting">'
+                         f"<figcaption>{_text(8, seed + 'cap').capitalize()}</figcaption></figure>")
+    return "".join(parts)
+
+
+def realistic_page(name: str, layout: str = "news", paragraphs: int = 12) -> Tuple[str, List[str]]:
+    """
+    A page shaped like a real one of the given layout: scripts, styles, icons,
+    navigation, a cookie banner, sidebars, related links, comments and a footer
+    around an article. Returns the HTML and the article's paragraphs.
+    """
+    text = article_paragraphs(name, paragraphs)
+    title = f"{_text(6, name).capitalize()}"
+    nav = f'<ul class="menu">{_links("section", 120, name, 2)}</ul>'
+    cookie = (
+        '<div id="onetrust-banner-sdk" class="cookie-banner"><p>We and our partners use cookies, '
+        "device identifiers and similar technologies to store and access information on your device, "
+        "to personalise content and ads, to provide social media features and to analyse our traffic, "
+        'as described in our privacy policy.</p><button>Accept all</button><button>Manage</button></div>'
+    )
+    share = "".join(f"<a href='/share/{i}'>{_icon()}Share</a>" for i in range(5))
+    share = f'<div class="share-buttons">{share}</div>'
+    footer_links = "".join(f"<ul>{_links(f'footer{c}', 12, name, 2)}</ul>" for c in range(4))
+    footer = (
+        f'<footer class="site-footer"><div class="footer-links">{footer_links}</div>'
+        "<p>© 2024 Example Media, Inc. All rights reserved. Use of this site constitutes acceptance "
+        "of our user agreement, privacy policy and cookie statement.</p></footer>"
+    )
+    related = "".join(
+        f'<div class="card"><a href="/story/{i}"><h3>{_text(8, name + "r" + str(i)).capitalize()}</h3></a>'
+        f"<p>{_text(18, f'{name}t{i}').capitalize()}.</p></div>"
+        for i in range(6)
+    )
+    comments = "".join(
+        f'<li class="comment"><div class="comment-author"><a href="/u/{i}">user{i}</a></div>'
+        f'<div class="comment-content"><p>{_SENTENCES[(i * 3) % len(_SENTENCES)]} '
+        f"{_text(20, f'{name}c{i}').capitalize()}, honestly, in my experience.</p></div></li>"
+        for i in range(10)
+    )
+    head = (
+        f"<head><meta charset='utf-8'><title>{title}</title>"
+        + "".join(f'<meta property="og:tag{i}" content="{_text(6, name + "m" + str(i))}">' for i in range(30))
+        + _style(24 if layout != "docs" else 8) + _scripts(name, 40 if layout == "news" else 10) + "</head>"
+    )
+
+    if layout == "news":
+        body = (
+            f"{cookie}<header class='site-header'>{_icon()}<nav>{nav}</nav></header>"
+            f"<main><article><header class='article-header'><h1>{title}</h1>"
+            f"<div class='byline'>By <a href='/staff/jane'>Jane Doe</a>, March 3, 2024</div></header>"
+            f"{share}<div class='article-body'>{_article_body(text, name)}</div>{share}"
+            f"<ul class='tags'>{_links('tag', 6, name, 1)}</ul></article>"
+            f"<aside class='sidebar'><h2>Trending</h2><ol>{_links('trending', 10, name, 8)}</ol>"
+            f"<form class='newsletter'><p>Get the morning briefing in your inbox.</p><input type='email'></form></aside>"
+            f"<section class='related'><h2>More stories</h2>{related}</section></main>{footer}"
+        )
+    elif layout == "blog":
+        body = (
+            f"<div id='page' class='site'>{cookie}<div id='masthead'>{_icon()}{nav}</div>"
+            f"<div id='content' class='site-content'><div id='primary' class='content-area'>"
+            f"<div class='post hentry'><div class='entry-header'><h1 class='entry-title'>{title}</h1>"
+            f"<span class='posted-on'>Posted on March 3, 2024 by <a href='/author/jane'>jane</a></span></div>"
+            f"<div class='entry-content'>{_article_body(text, name, ads=False)}{share}</div></div>"
+            f"<div id='comments' class='comments-area'><h2>10 thoughts on “{title}”</h2><ol>{comments}</ol>"
+            f"<div id='respond'><form><textarea></textarea><button>Post Comment</button></form></div></div></div>"
+            f"<div id='secondary' class='widget-area'><div class='widget'><h2>Recent posts</h2>"
+            f"<ul>{_links('recent', 8, name, 7)}</ul></div><div class='widget'><h2>Archives</h2>"
+            f"<ul>{_links('archive', 24, name, 2)}</ul></div></div></div>{footer}</div>"
+        )
+    elif layout == "docs":
+        sections = "".join(
+            f"<h2 id='s{i}'>{_text(4, f'{name}d{i}').capitalize()}</h2><p>{paragraph}</p>"
+            + (f"<pre><code>curl -X POST https://api.example.com/v1/items -d 'id={i}'</code></pre>" if i % 3 == 0 else "")
+            for i, paragraph in enumerate(text)
+        )
+        body = (
+            f"<div class='navbar'>{_icon()}{nav}</div><div class='container'>"
+            f"<div class='docs-sidebar'><ul>{_links('docs', 80, name, 3)}</ul></div>"
+            f"<div class='docs-content' role='main'><h1>{title}</h1>{sections}"
+            f"<div class='pager'><a href='/prev'>Previous</a><a href='/next'>Next</a></div></div>"
+            f"<div class='toc'><ul>{_links('toc', len(text), name, 4)}</ul></div></div>{footer}"
+        )
+    elif layout == "divsoup":
+        # generated class names and no semantic tags, paragraphs are bare divs
+        block = lambda i: f"css-{zlib.crc32(f'{name}{i}'.encode()) % 10**6:06d}" # pylint: disable=unnecessary-lambda-assignment
+        links = "".join(f"<div class='{block(i)}'><a href='/x/{i}'>{_text(3, f'{name}x{i}')}</a></div>" for i in range(100))
+        paragraphs_html = "".join(f"<div class='{block('p')}'>{paragraph}</div>" for paragraph in text)
+        body = (
+            f"<div class='{block('root')}'><div class='{block('top')}'>{links}</div>"
+            f"<div class='{block('mid')}'><div class='{block('left')}'>{links}</div>"
+            f"<div class='{block('center')}'><div class='{block('title')}'><h1>{title}</h1></div>"
+            f"<div class='{block('text')}'>{paragraphs_html}</div></div>"
+            f"<div class='{block('right')}'>{related}</div></div><div class='{block('bottom')}'>{links}</div></div>"
+        )
+    else:
+        raise ValueError(f"Unknown layout: {layout}")
+    return f"<!DOCTYPE html><html lang='en'>{head}<body>{body}</body></html>", [title, *text]
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Scripted chat model with a fixed time to first token and a token rate.
+
+    A turn plays out like a real one: the user's message triggers a Search,
+    the search results a WriteBlogPost, and the tool result a short reply.
+    Forced tool calls (ExtractResources, the infographic tools) get fitting
+    arguments. Responses are streamed when a streaming callback is attached.
+    """
+    latency: float = 0.2
+    tokens_per_second: float = 100.0
+    blog_words: int = 400
+    tools: List[Dict[str, Any]] = []
+    tool_choice: Optional[str] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs): # pylint: disable=arguments-differ
+        return self.model_copy(update={
+            "tools": [convert_to_openai_tool(tool) for tool in tools],
+            "tool_choice": tool_choice if isinstance(tool_choice, str) else None,
+        })
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        names = {tool["function"]["name"] for tool in self.tools}
+        last = messages[-1]
+        call_id = uuid.uuid4().hex
+        if self.tool_choice == "ExtractResources":
+            urls = _URL.findall(str(last.content))[:2]
+            resources = [{"url": url, "title": url, "description": "Relevant resource"} for url in urls]
+            return AIMessage("", tool_calls=[{"name": "ExtractResources", "args": {"resources": resources}, "id": call_id}])
+        if self.tool_choice in _INFOGRAPHIC_ARGS:
+            return AIMessage("", tool_calls=[{"name": self.tool_choice, "args": _INFOGRAPHIC_ARGS[self.tool_choice], "id": call_id}])
+        if isinstance(last, HumanMessage) and "Search" in names:
+            topic = str(last.content)[:60]
+            queries = [f"{topic} overview", f"{topic} statistics"]
+            return AIMessage("", tool_calls=[{"name": "Search", "args": {"queries": queries}, "id": call_id}])
+        if isinstance(last, ToolMessage) and str(last.content).startswith("Added") and "WriteBlogPost" in names:
+            blog_post = {"title": "Remote work", "content": _text(self.blog_words, str(len(messages)))}
+            return AIMessage("", tool_calls=[{"name": "WriteBlogPost", "args": {"blog_post": blog_post}, "id": call_id}])
+        return AIMessage("I have updated the blog post and infographics.")
+
+    @staticmethod
+    def _usage(messages: List[BaseMessage], message: AIMessage) -> Dict[str, int]:
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        output_tokens = (len(str(message.content)) + len(json.dumps([c["args"] for c in message.tool_calls]))) // 4
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        raise NotImplementedError("FakeChatModel is async only")
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        chunk: Optional[ChatGenerationChunk] = None
+        async for part in self._astream(messages, stop, **kwargs):
+            chunk = part if chunk is None else chunk + part
+        assert chunk is not None
+        message = chunk.message
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(
+            content=message.content,
+            tool_calls=message.tool_calls,
+            usage_metadata=message.usage_metadata,
+        ))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        response = self._respond(messages)
+        await asyncio.sleep(self.latency)
+        delay = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+
+        # a token is about four characters
+        content = str(response.content)
+        for start in range(0, len(content), 4):
+            await asyncio.sleep(delay)
+            text = content[start:start + 4]
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+        for index, tool_call in enumerate(response.tool_calls):
+            args = json.dumps(tool_call["args"])
+            # stream tool arguments in larger pieces so long blog posts don't take forever
+            step = 64
+            for start in range(0, len(args), step):
+                await asyncio.sleep(delay * step / 4)
+                first = start == 0
+                chunk = AIMessageChunk(content="", tool_call_chunks=[{
+                    "name": tool_call["name"] if first else None,
+                    "id": tool_call["id"] if first else None,
+                    "args": args[start:start + step],
+                    "index": index,
+                }])
+                yield ChatGenerationChunk(message=chunk)
+
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="", usage_metadata=self._usage(messages, response) # type: ignore[arg-type]
+        ))
+
+
+class FakeSearchClient:
+    """
+    Blocking search client with a fixed round-trip latency, like TavilyClient.search.
+    With a `base_url`, results link to pages on a `FixtureServer`.
+    """
+    def __init__(self, latency: float, base_url: str = "https://example.com", results: int = 5):
+        self.latency = latency
+        self.base_url = base_url
+        self.results = results
+
+    def search(self, query: str, timeout: float = 60): # pylint: disable=unused-argument
+        """Sleep for the configured latency and return a Tavily-shaped response."""
+        time.sleep(self.latency)
+        key = zlib.crc32(query.encode("utf-8"))
+        return {
+            "query": query,
+            "results": [{
+                "url": f"{self.base_url}/{(key + i) % 1000}",
+                "title": f"{query} ({i + 1})",
+                "content": f"Result for {query}. " + _text(40, f"{query}{i}"),
+                "score": round(0.95 - i * 0.05, 2),
+            } for i in range(self.results)],
+        }
+
+
+class FixtureServer:
+    """
+    Local HTTP server serving generated HTML pages after a fixed latency,
+    run on its own event loop in a background thread.
+    """
+    def __init__(self, latency: float = 0.05, page_bytes: int = 50_000, port: int = 0):
+        self.latency = latency
+        self.page_bytes = page_bytes
+        self.port = port
+        self._loop = asyncio.new_event_loop()
+        self._runner: Optional[web.AppRunner] = None
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        """The URL prefix of the served pages."""
+        return f"http://127.0.0.1:{self.port}/pages"
+
+    async def _page(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.latency)
+        name = request.match_info["name"]
+        paragraph = f"<p>{_text(60, name)}</p>\n"
+        body = f"<h1>Page {name}</h1>\n" + paragraph * (self.page_bytes // len(paragraph) + 1)
+        return web.Response(text=f"<html><body>{body}</body></html>", content_type="text/html")
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get("/pages/{name}", self._page)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1] # type: ignore[union-attr] # pylint: disable=protected-access
+
+    def start(self) -> "FixtureServer":
+        """Start serving in the background."""
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def stop(self):
+        """Stop serving."""
+        if self._runner is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def install(
+    latency: float = 0.2,
+    tokens_per_second: float = 100.0,
+    search_latency: float = 0.3,
+    base_url: str = "https://example.com",
+):
+    """
+    Route model calls to FakeChatModel and searches to FakeSearchClient.
+    The state's model must be "fake" (or MODEL=fake).
+    """
+    # pylint: disable=import-outside-toplevel,protected-access
+    import sys
+    from research_canvas import model, search
+
+    fake = FakeChatModel(latency=latency, tokens_per_second=tokens_per_second)
+    if hasattr(model, "_create_model"):
+        model._MODEL_PARAMS["fake"] = {}
+        create_model = model._create_model
+        model._create_model = lambda provider, params: fake if provider == "fake" else create_model(provider, params)
+    else:
+        # older trees build the model inside get_model, replace it wherever it was imported
+        get_model = model.get_model
+        for module in list(sys.modules.values()):
+            if module is not None and getattr(module, "get_model", None) is get_model:
+                setattr(module, "get_model", lambda state, **kwargs: fake)
+    search.tavily_client = FakeSearchClient(search_latency, base_url)
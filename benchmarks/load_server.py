@@ -0,0 +1,50 @@
+"""
+The demo server wired to the fake model, search and web backends,
+started by `bench_load --target http`.
+
+    python -m benchmarks.load_server --port 8765
+"""
+
+import argparse
+import os
+
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+# pylint: disable=wrong-import-position
+import uvicorn
+
+from benchmarks import fakes
+from benchmarks.bench_load import LagMonitor
+from research_canvas.demo import app
+
+_MONITOR = LagMonitor()
+
+
+@app.get("/bench/stats")
+async def bench_stats():
+    """Event-loop lag since the last call. The first call starts measuring."""
+    if not _MONITOR.running:
+        _MONITOR.start()
+    return _MONITOR.stats(reset=True)
+
+
+def main():
+    """Run the server."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--page-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = fakes.FixtureServer(latency=args.page_latency).start()
+    fakes.install(args.latency, args.tokens_per_second, args.search_latency, server.base_url)
+    try:
+        uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,33 @@
 # pylint: disable=line-too-long, unused-import
 import json
+import importlib
 from typing import cast
 
 from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
 from research_canvas.state import AgentState
-from research_canvas.download import download_node
-from research_canvas.chat import chat_node
-from research_canvas.search import search_node
-from research_canvas.infographics import infographics_node
-from research_canvas.delete import delete_node, perform_delete_node
+from research_canvas.metrics import timed_node
+from research_canvas.checkpoint import get_checkpointer
+
+def lazy_node(module: str, name: str):
+    """
+    A node that imports its module on first use, so importing the graph stays cheap.
+    """
+    async def node(state, config: RunnableConfig):
+        return await getattr(importlib.import_module(module), name)(state, config)
+    node.__name__ = name
+    return timed_node(name, node)
 
 # Define a new graph
 workflow = StateGraph(AgentState)
-workflow.add_node("chat_node", chat_node)
-workflow.add_node("search_node", search_node)
-workflow.add_node("delete_node", delete_node)
-workflow.add_node("perform_delete_node", perform_delete_node)
+workflow.add_node("chat_node", lazy_node("research_canvas.chat", "chat_node"))
+workflow.add_node("search_node", lazy_node("research_canvas.search", "search_node"))
+workflow.add_node("download_node", lazy_node("research_canvas.download", "download_node"))
+workflow.add_node("delete_node", lazy_node("research_canvas.delete", "delete_node"))
+workflow.add_node("perform_delete_node", lazy_node("research_canvas.delete", "perform_delete_node"))
+workflow.add_node("infographic_node", lazy_node("research_canvas.infographics", "infographic_node"))
+workflow.add_node("infographics_join_node", lazy_node("research_canvas.infographics", "infographics_join_node"))
 
 def route(state):
         """Route after the chat node."""
@@ -39,15 +49,22 @@ def route(state):
                 return "delete_node"
                 
         if isinstance(last_message, ToolMessage):
+            # already imported by chat_node, which produced the tool message
+            from research_canvas.infographics import INFOGRAPHICS_MODE, wrote_blog_post, fan_out_infographics # pylint: disable=import-outside-toplevel
+            if INFOGRAPHICS_MODE == "parallel" and wrote_blog_post(state):
+                return fan_out_infographics(state)
             return "chat_node"
 
         return END
 
-memory = MemorySaver()
+memory = get_checkpointer()
 # Change entry point to chat_node
 workflow.set_entry_point("chat_node")
-workflow.add_conditional_edges("chat_node", route, ["search_node", "chat_node", "delete_node", END])
-workflow.add_edge("search_node", "chat_node")
+workflow.add_conditional_edges("chat_node", route, ["search_node", "chat_node", "delete_node", "infographic_node", END])
+workflow.add_edge("search_node", "download_node")
+workflow.add_edge("download_node", "chat_node")
 workflow.add_edge("delete_node", "perform_delete_node")
 workflow.add_edge("perform_delete_node", "chat_node")
+workflow.add_edge("infographic_node", "infographics_join_node")
+workflow.add_edge("infographics_join_node", "chat_node")
 graph = workflow.compile(checkpointer=memory, interrupt_after=["delete_node"])
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""
+Section-addressed edits of the blog post.
+
+Sections start at markdown headings, the text before the first heading is
+the "intro" section. Edits address sections by their heading text, so a
+revision only sends the changed parts instead of the whole post, and
+later edits in a batch stay valid when earlier ones move text around.
+"""
+
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.utils.json import parse_partial_json
+from pydantic import BaseModel, Field
+
+from research_canvas.state import BlogPost
+
+INTRO = "intro"
+
+_HEADING = re.compile(r"^#{1,6}[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+
+
+class BlogEdit(BaseModel):
+    """A single change to the blog post"""
+    op: Literal["replace_section", "insert_after", "delete_section", "replace_text", "set_title"] = Field(
+        description=(
+            "replace_section: replace a section with `content`; "
+            "insert_after: add `content` as a new section after `section`; "
+            "delete_section: remove `section`; "
+            "replace_text: replace the exact text `find` with `replace`; "
+            "set_title: change the title to `content`"
+        )
+    )
+    section: str = Field(default="", description="Heading text of the section, or \"intro\" for the text before the first heading")
+    content: str = Field(default="", description="New markdown for the section, starting with its heading, or the new title")
+    find: str = Field(default="", description="Exact text to replace, must occur once in the post")
+    replace: str = Field(default="", description="Replacement text")
+
+
+def _key(heading: str) -> str:
+    return " ".join(heading.strip().strip("#").lower().split())
+
+
+def split_sections(content: str) -> List[Tuple[str, str]]:
+    """
+    Split markdown into (key, text) sections, where text includes the heading line
+    and the whitespace up to the next heading, so joining the texts gives the content back.
+    """
+    starts = [match.start() for match in _HEADING.finditer(content)]
+    sections = []
+    if not starts or starts[0] > 0:
+        sections.append((INTRO, content[:starts[0] if starts else len(content)]))
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(content)
+        heading = _HEADING.match(content, start)
+        sections.append((_key(heading.group(1)) if heading else "", content[start:end]))
+    return sections
+
+
+def _find(sections: List[Tuple[str, str]], name: str) -> int:
+    key = _key(name)
+    matches = [i for i, (section, _) in enumerate(sections) if section == key]
+    if not matches:
+        # tolerate shortened headings as long as they are unambiguous
+        matches = [i for i, (section, _) in enumerate(sections) if key and key in section]
+    if len(matches) != 1:
+        raise ValueError(f"section {name!r} {'not found' if not matches else 'is ambiguous'}")
+    return matches[0]
+
+
+def _trailing(text: str) -> str:
+    return text[len(text.rstrip()):]
+
+
+def _apply(post: BlogPost, edit: Dict[str, Any]) -> BlogPost:
+    op = edit.get("op")
+    content = post.get("content", "")
+    if op == "set_title":
+        return {**post, "title": edit.get("content", "")}
+    if op == "replace_text":
+        find = edit.get("find", "")
+        count = content.count(find) if find else 0
+        if count != 1:
+            raise ValueError(f"text {find[:40]!r} {'not found' if count == 0 else 'occurs more than once'}")
+        return {**post, "content": content.replace(find, edit.get("replace", ""))}
+
+    sections = split_sections(content)
+    index = _find(sections, edit.get("section", ""))
+    key, text = sections[index]
+    new = edit.get("content", "").strip()
+    if op == "replace_section":
+        if key != INTRO and not new.startswith("#"):
+            # keep the heading when only the body was sent
+            new = text.splitlines()[0] + "\n\n" + new
+        sections[index] = (key, new + _trailing(text))
+    elif op == "insert_after":
+        if _trailing(text).count("\n") < 2:
+            # the new heading needs a blank line before it
+            sections[index] = (key, text.rstrip() + "\n\n")
+        # keyed by its own heading, so later edits in the batch can address it
+        heading = _HEADING.match(new)
+        new_key = _key(heading.group(1)) if heading else key
+        sections.insert(index + 1, (new_key, new + ("\n\n" if index + 1 < len(sections) else "")))
+    elif op == "delete_section":
+        del sections[index]
+    else:
+        raise ValueError(f"unknown edit {op!r}")
+    return {**post, "content": "".join(text for _, text in sections)}
+
+
+def apply_edits(post: BlogPost, edits: Sequence[Dict[str, Any]]) -> Tuple[BlogPost, List[str]]:
+    """
+    Apply edits in order. Edits that can't be applied are skipped and
+    described in the returned list of errors.
+    """
+    errors = []
+    for i, edit in enumerate(edits):
+        try:
+            post = _apply(post, edit)
+        except ValueError as e:
+            errors.append(f"edit {i + 1} ({edit.get('op')}): {e}")
+    return post, errors
+
+
+class EditStreamer(AsyncCallbackHandler):
+    """
+    Applies EditBlogPost edits while the tool call is still streaming. Each time
+    another edit is complete, the post with all complete edits is passed to
+    `on_update`, so the UI shows revisions as they arrive.
+    """
+    def __init__(self, post: BlogPost, on_update: Callable[[BlogPost], Awaitable[None]]):
+        self.post = post
+        self.on_update = on_update
+        self.applied = 0
+        self._index: Optional[int] = None
+        self._args = ""
+
+    async def on_llm_new_token(self, token: str, *, chunk: Any = None, **kwargs: Any) -> None:
+        message = getattr(chunk, "message", None)
+        for tool_chunk in getattr(message, "tool_call_chunks", None) or []:
+            if tool_chunk.get("name") == "EditBlogPost":
+                self._index = tool_chunk.get("index")
+            elif tool_chunk.get("name") or tool_chunk.get("index") != self._index:
+                continue
+            if self._index is None:
+                continue
+            args = tool_chunk.get("args") or ""
+            self._args += args
+            # an edit can only have been completed by a closing brace
+            if "}" in args:
+                await self._update()
+
+    async def _update(self):
+        try:
+            parsed = parse_partial_json(self._args)
+        except ValueError:
+            return
+        edits = parsed.get("edits") if isinstance(parsed, dict) else None
+        if not isinstance(edits, list):
+            return
+        # the last edit may still be incomplete
+        complete = edits[:-1]
+        if len(complete) > self.applied:
+            self.applied = len(complete)
+            post, _ = apply_edits(self.post, complete)
+            await self.on_update(post)
@@ -0,0 +1,248 @@
+"""
+Swappable key/value caches with TTLs.
+
+`get_cache(namespace)` returns the cache configured by the environment:
+
+- CACHE_BACKEND=memory (default): a per-process LRU bounded by bytes.
+- CACHE_BACKEND=sqlite: an LRU in front of an SQLite file at CACHE_PATH,
+  shared by every worker process on the host.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_PATH = os.getenv("CACHE_PATH", "research_canvas_cache.sqlite3")
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_DISK_MAX_BYTES = int(os.getenv("CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+
+class Cache(ABC):
+    """
+    Base interface for string caches. A `ttl` of None means the entry never expires.
+    """
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None if missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Store a value."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove a value."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every value."""
+
+
+def _expires_at(ttl: Optional[float]) -> Optional[float]:
+    return None if ttl is None else time.time() + ttl
+
+
+class MemoryCache(Cache):
+    """
+    In-process LRU cache bounded by the total size of its values.
+    """
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, _expires_at(ttl))
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0].encode("utf-8"))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache(Cache):
+    """
+    Cache stored in an SQLite file, shared by every process that opens the same path.
+    Least recently used entries are evicted once the namespace exceeds `max_bytes`.
+    """
+    _PURGE_EVERY = 100
+
+    def __init__(self, namespace: str, path: str = CACHE_PATH, max_bytes: int = CACHE_DISK_MAX_BYTES):
+        self.namespace = namespace
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, accessed_at)"
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+                )
+                return None
+            self._conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key)
+            )
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, value, size, _expires_at(ttl), time.time())
+            )
+            self._writes += 1
+            if self._writes % self._PURGE_EVERY == 0:
+                self._purge()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+    def _purge(self):
+        """Drop expired entries, then the least recently used ones above the size limit."""
+        self._conn.execute(
+            "DELETE FROM cache WHERE namespace = ? AND expires_at <= ?",
+            (self.namespace, time.time())
+        )
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM cache WHERE namespace = ? ORDER BY accessed_at",
+            (self.namespace,)
+        ).fetchall()
+        evict = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evict.append((self.namespace, key))
+            total -= size
+        self._conn.executemany("DELETE FROM cache WHERE namespace = ? AND key = ?", evict)
+
+
+class TieredCache(Cache):
+    """
+    A fast local cache in front of a slower shared one.
+    """
+    def __init__(self, local: Cache, shared: Cache, local_ttl: float = 60):
+        self.local = local
+        self.shared = shared
+        self.local_ttl = local_ttl
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.local.get(key)
+        if value is None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value, self.local_ttl)
+        return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        self.shared.set(key, value, ttl)
+        local_ttl = self.local_ttl if ttl is None else min(ttl, self.local_ttl)
+        self.local.set(key, value, local_ttl)
+
+    def delete(self, key: str) -> None:
+        self.shared.delete(key)
+        self.local.delete(key)
+
+    def clear(self) -> None:
+        self.shared.clear()
+        self.local.clear()
+
+
+_CACHES: Dict[str, Cache] = {}
+
+def get_cache(namespace: str, max_bytes: int = CACHE_MAX_BYTES, backend: str = CACHE_BACKEND) -> Cache:
+    """
+    Get the process-wide cache for a namespace, creating it on first use.
+    """
+    cache = _CACHES.get(namespace)
+    if cache is None:
+        if backend == "memory":
+            cache = MemoryCache(max_bytes)
+        elif backend == "sqlite":
+            cache = TieredCache(MemoryCache(max_bytes), SQLiteCache(namespace))
+        else:
+            raise ValueError(f"Invalid cache backend specified: {backend}")
+        _CACHES[namespace] = cache
+    return cache
@@ -1,11 +1,28 @@
-from typing import List, Dict, cast, Union
+import asyncio
+import os
+from typing import List, cast
 from langchain_core.runnables import RunnableConfig
-from langchain_core.messages import SystemMessage, AIMessage, ToolMessage
+from langchain_core.runnables.config import merge_configs
+from langchain_core.messages import AIMessage, ToolMessage
 from langchain.tools import tool
 from copilotkit.langchain import copilotkit_customize_config
-from research_canvas.state import AgentState, BlogPost, QuoteInfographic, ComparisonInfographic, StepsInfographic, StatisticsGroup, BarGroup
-from research_canvas.model import get_model
+from research_canvas.state import AgentState, BlogPost
+from research_canvas.blog import BlogEdit, EditStreamer, apply_edits
+from research_canvas.emit import StateEmitter
+from research_canvas.model import invoke_model, get_model_name, cacheable_system_message
+from research_canvas.router import Intent, route_turn
+from research_canvas.history import compact_history
 from research_canvas.download import get_resource
+from research_canvas.context import build_resource_context, conversation_query, get_context_budget
+from research_canvas.infographics import (
+    INFOGRAPHICS,
+    INFOGRAPHICS_MODE,
+    GenerateQuoteInfographic,
+    GenerateStepsInfographic,
+    GenerateComparisonInfographic,
+    GenerateStatisticsInfographic,
+    GenerateBarChartInfographic,
+)
 
 @tool
 def Search(queries: List[str]):
@@ -18,29 +35,239 @@ def WriteBlogPost(blog_post: BlogPost):
     pass
 
 @tool
-def GenerateQuoteInfographic(quote_info: QuoteInfographic):
-    """Generate a quote-based infographic from the blog content."""
+def EditBlogPost(edits: List[BlogEdit]):
+    """Apply section-level edits to the existing blog post."""
     pass
 
-@tool
-def GenerateStepsInfographic(steps_info: StepsInfographic):
-    """Generate a steps-based infographic from the blog content."""
-    pass
+# "patch" lets the model revise an existing post with EditBlogPost instead of
+# sending the whole post again, "rewrite" only offers WriteBlogPost.
+BLOG_EDIT_MODE = os.getenv("BLOG_EDIT_MODE", "patch")
 
-@tool
-def GenerateComparisonInfographic(comparison_info: ComparisonInfographic):
-    """Generate a comparison-based infographic from the blog content."""
-    pass
+_EDIT_INSTRUCTIONS = """
+REVISING AN EXISTING BLOG POST:
+When the blog post already has content and the user asks for changes, call EditBlogPost
+with only the changed parts instead of WriteBlogPost:
+- replace_text: fix a word or sentence, `find` must occur exactly once in the post
+- replace_section: rewrite one section, `section` is its heading text ("intro" for the text before the first heading)
+- insert_after: add a new section, starting with its heading, after `section`
+- delete_section: remove `section`
+- set_title: change the title
+Only use WriteBlogPost for a new post or when most of the post changes.
+"""
 
-@tool
-def GenerateStatisticsInfographic(stats_info: StatisticsGroup):
-    """Generate a statistics-based infographic from the blog content."""
-    pass
+_INSTRUCTIONS = """
+You are an expert blog content creator specializing in creating engaging, informative content with visual elements. 
+Your task is to generate comprehensive blog posts with accompanying infographics.
 
-@tool
-def GenerateBarChartInfographic(bars_info: BarGroup):
-    """Generate a bar chart infographic from the blog content."""
-    pass
+AVAILABLE TOOLS AND THEIR DATA FORMATS:
+
+1. WriteBlogPost
+Format:
+{
+ "blog_post": {
+    "title": "string",
+    "content": "string (exactly 3000 words)"
+}
+}
+
+2. GenerateQuoteInfographic
+Format:
+{
+ "quote_info": {
+    "type": "quote",
+    "quote": "string",
+    "source": "string",
+    "context": "string"
+}
+}
+
+3. GenerateStepsInfographic
+Format:
+{
+"steps_info": {
+    "type": "steps",
+    "title": "string",
+    "steps": ["step1", "step2", "step3", ...],
+    "description": "string"
+}
+}
+
+4. GenerateComparisonInfographic
+Format:
+{
+"comparison_info": {
+    "type": "comparison",
+    "title": "string",
+    "left_side": ["point1", "point2", ...],
+    "right_side": ["point1", "point2", ...],
+    "left_title": "string",
+    "right_title": "string",
+    "comparison_aspect": "string",
+    "description": "string",
+    "conclusion": "string"
+}
+}
+
+5. GenerateStatisticsInfographic
+Format:
+{
+"stats_info": {
+    "title": "string",
+    "description": "string",
+    "stats": [
+        {"value": "string", "label": "string"},
+        {"value": "string", "label": "string"},
+        ...
+    ]
+}
+}
+
+6. GenerateBarChartInfographic
+Format:
+{
+"bars_info": {
+    "title": "string",
+    "stats": [
+        {"value": "number (percentage between 0-100)", "label": "string"},
+        {"value": "number (percentage between 0-100)", "label": "string"},
+        ...
+    ]
+}
+}
+
+WORKFLOW REQUIREMENTS:
+1. First call WriteBlogPost to create the main content of exactly 3000 words
+2. Then call GenerateQuoteInfographic with an impactful quote FROM the blog content
+3. Call GenerateStepsInfographic to create a step-by-step guide based on the blog content
+4. Call GenerateComparisonInfographic to create a comparative analysis from the blog content
+5. Call GenerateStatisticsInfographic to highlight key statistics from the blog content
+6. Finally call GenerateBarChartInfographic to visualize percentage-based data from the blog content (all values must be between 0-100)
+
+STRICT GUIDELINES:
+- Blog post must be exactly 3000 words
+- Each infographic must match its specific format exactly
+- The quote infographic must contain a single quote
+- The steps infographic must contain an array of steps
+- The comparison infographic must have equal numbers of points on both sides
+- The statistics infographic must contain at least 3 statistics with values and labels
+- The bar chart infographic must contain at least 2 bars with percentage values (0-100) and labels
+- All bar chart values must be expressed as percentages out of 100
+- Do not mix up the tools or their data formats
+- Generate exactly one of each type
+
+REQUIRED TOOL CALLING SEQUENCE:
+1. Call WriteBlogPost exactly once to generate a 3000-word blog post
+2. Call GenerateQuoteInfographic exactly once
+3. Call GenerateStepsInfographic exactly once
+4. Call GenerateComparisonInfographic exactly once
+5. Call GenerateStatisticsInfographic exactly once
+6. Call GenerateBarChartInfographic exactly once with percentage values (0-100)
+
+Ensure each tool receives data in the exact format specified above.
+"""
+
+CHAT_TOOLS = [
+    Search,
+    WriteBlogPost,
+    GenerateQuoteInfographic,
+    GenerateStepsInfographic,
+    GenerateComparisonInfographic,
+    GenerateStatisticsInfographic,
+    GenerateBarChartInfographic,
+]
+
+# With INFOGRAPHICS_MODE=parallel the chat model only writes the post,
+# the infographics are generated afterwards by concurrent graph branches.
+_BLOG_INSTRUCTIONS = """
+You are an expert blog content creator specializing in creating engaging, informative content.
+Your task is to generate comprehensive blog posts. Infographics are generated automatically from the finished post.
+
+AVAILABLE TOOLS AND THEIR DATA FORMATS:
+
+1. WriteBlogPost
+Format:
+{
+ "blog_post": {
+    "title": "string",
+    "content": "string (exactly 3000 words)"
+}
+}
+
+STRICT GUIDELINES:
+- Blog post must be exactly 3000 words
+- Call WriteBlogPost exactly once
+- Do not generate infographics yourself
+
+Ensure the tool receives data in the exact format specified above.
+"""
+
+BLOG_TOOLS = [
+    Search,
+    WriteBlogPost,
+]
+
+# Prompt sections of the routed workers, see research_canvas.router
+_SEARCH_INSTRUCTIONS = """
+You are a research assistant for a blog writer.
+Call Search with up to 3 focused queries for what the user asks about. Do not write the blog post.
+"""
+
+_REPLY_INSTRUCTIONS = """
+You are an assistant helping the user write a blog post with infographics.
+Reply briefly to the user's latest message, e.g. summarize what was just found or changed.
+Do not call any tools.
+"""
+
+_EDITOR_INSTRUCTIONS = """
+You are an expert blog editor. Revise the existing blog post as the user asks and keep everything else as it is.
+WriteBlogPost takes {"blog_post": {"title": "string", "content": "string"}}.
+"""
+
+_INFOGRAPHIC_INSTRUCTIONS = """
+You are an expert infographic designer. Create infographics that enhance the message of the blog post,
+calling each of these tools exactly once, with content taken FROM the blog post:
+""" + "".join(
+    f"\n{spec['tool'].name}:{spec['instructions']}" for spec in INFOGRAPHICS.values()
+)
+
+def _worker(intent: Intent, has_post: bool):
+    """
+    The tools, instructions and model tier for a routed intent.
+    """
+    if intent == "search":
+        return [Search], _SEARCH_INSTRUCTIONS, "small"
+    if intent == "reply":
+        return [], _REPLY_INSTRUCTIONS, "small"
+    if intent == "edit" and BLOG_EDIT_MODE == "patch" and has_post:
+        return [EditBlogPost, WriteBlogPost], _EDITOR_INSTRUCTIONS + _EDIT_INSTRUCTIONS, "default"
+    if intent == "edit":
+        return [WriteBlogPost], _EDITOR_INSTRUCTIONS, "default"
+    if intent == "write":
+        return BLOG_TOOLS, _BLOG_INSTRUCTIONS, "default"
+    if intent == "infographics":
+        return [spec["tool"] for spec in INFOGRAPHICS.values()], _INFOGRAPHIC_INSTRUCTIONS, "default"
+
+    if INFOGRAPHICS_MODE == "parallel":
+        tools, instructions = BLOG_TOOLS, _BLOG_INSTRUCTIONS
+    else:
+        tools, instructions = CHAT_TOOLS, _INSTRUCTIONS
+    if BLOG_EDIT_MODE == "patch" and has_post:
+        tools, instructions = [*tools, EditBlogPost], instructions + _EDIT_INSTRUCTIONS
+    return tools, instructions, "default"
+
+_ALL_TOOLS = {tool.name: tool for tool in [*CHAT_TOOLS, EditBlogPost]}
+
+def _history_tools(messages) -> list:
+    """
+    Tools called earlier in the conversation. Providers reject tool calls in the
+    history whose tools aren't bound, so routed workers keep these bound.
+    """
+    names = {
+        tool_call["name"]
+        for message in messages if isinstance(message, AIMessage)
+        for tool_call in message.tool_calls
+    }
+    return [tool for name, tool in _ALL_TOOLS.items() if name in names]
 
 async def chat_node(state: AgentState, config: RunnableConfig):
     """
@@ -118,159 +345,63 @@ async def chat_node(state: AgentState, config: RunnableConfig):
     state["logs"] = state.get("logs", [])
     state["messages"] = state.get("messages", [])
 
-    # Process resources
-    resources = []
-    for resource in state["resources"]:
-        content = get_resource(resource["url"])
-        if content == "ERROR":
-            continue
-        resources.append({
-            **resource,
-            "content": content
-        })
-
-    # Invoke the model with tools
-    response = await get_model(state).bind_tools(
-        [
-            Search,
-            WriteBlogPost,
-            GenerateQuoteInfographic,
-            GenerateStepsInfographic,
-            GenerateComparisonInfographic,
-            GenerateStatisticsInfographic,
-            GenerateBarChartInfographic,
-        ],
-    ).ainvoke([
-        SystemMessage(
-            content=f"""
-            You are an expert blog content creator specializing in creating engaging, informative content with visual elements. 
-            Your task is to generate comprehensive blog posts with accompanying infographics.
-
-            AVAILABLE TOOLS AND THEIR DATA FORMATS:
-
-            1. WriteBlogPost
-            Format:
-            {{
-             "blog_post": {{
-                "title": "string",
-                "content": "string (exactly 3000 words)"
-            }}
-            }}
-
-            2. GenerateQuoteInfographic
-            Format:
-            {{
-             "quote_info": {{
-                "type": "quote",
-                "quote": "string",
-                "source": "string",
-                "context": "string"
-            }}
-            }}
-
-            3. GenerateStepsInfographic
-            Format:
-            {{
-           "steps_info": {{
-                "type": "steps",
-                "title": "string",
-                "steps": ["step1", "step2", "step3", ...],
-                "description": "string"
-            }}
-            }}
-
-            4. GenerateComparisonInfographic
-            Format:
-            {{
-            "comparison_info": {{
-                "type": "comparison",
-                "title": "string",
-                "left_side": ["point1", "point2", ...],
-                "right_side": ["point1", "point2", ...],
-                "left_title": "string",
-                "right_title": "string",
-                "comparison_aspect": "string",
-                "description": "string",
-                "conclusion": "string"
-            }}
-            }}
-
-            5. GenerateStatisticsInfographic
-            Format:
-            {{
-            "stats_info": {{
-                "title": "string",
-                "description": "string",
-                "stats": [
-                    {{"value": "string", "label": "string"}},
-                    {{"value": "string", "label": "string"}},
-                    ...
-                ]
-            }}
-            }}
-
-            6. GenerateBarChartInfographic
-            Format:
-            {{
-            "bars_info": {{
-                "title": "string",
-                "stats": [
-                    {{"value": "number (percentage between 0-100)", "label": "string"}},
-                    {{"value": "number (percentage between 0-100)", "label": "string"}},
-                    ...
-                ]
-            }}
-            }}
-
-            WORKFLOW REQUIREMENTS:
-            1. First call WriteBlogPost to create the main content of exactly 3000 words
-            2. Then call GenerateQuoteInfographic with an impactful quote FROM the blog content
-            3. Call GenerateStepsInfographic to create a step-by-step guide based on the blog content
-            4. Call GenerateComparisonInfographic to create a comparative analysis from the blog content
-            5. Call GenerateStatisticsInfographic to highlight key statistics from the blog content
-            6. Finally call GenerateBarChartInfographic to visualize percentage-based data from the blog content (all values must be between 0-100)
-
-            STRICT GUIDELINES:
-            - Blog post must be exactly 3000 words
-            - Each infographic must match its specific format exactly
-            - The quote infographic must contain a single quote
-            - The steps infographic must contain an array of steps
-            - The comparison infographic must have equal numbers of points on both sides
-            - The statistics infographic must contain at least 3 statistics with values and labels
-            - The bar chart infographic must contain at least 2 bars with percentage values (0-100) and labels
-            - All bar chart values must be expressed as percentages out of 100
-            - Do not mix up the tools or their data formats
-            - Generate exactly one of each type
-
-            Current State:
-            Blog Title: {state["blog_post"].get("title", "")}
-            Blog Content: {state["blog_post"].get("content", "")}
-            Current Quote: {state["quote_info"].get("quote", "")}
-            Current Steps: {state["steps_info"].get("steps", [])}
-            Current Comparison: {state["comparison_info"].get("title", "")}
-            Current Statistics: {state["stats_info"].get("stats", [])}
-            Current Bar Chart: {state["bars_info"].get("stats", [])}
-
-            Available Resources:
-            {resources}
-
-            REQUIRED TOOL CALLING SEQUENCE:
-            1. Call WriteBlogPost exactly once to generate a 3000-word blog post
-            2. Call GenerateQuoteInfographic exactly once
-            3. Call GenerateStepsInfographic exactly once
-            4. Call GenerateComparisonInfographic exactly once
-            5. Call GenerateStatisticsInfographic exactly once
-            6. Call GenerateBarChartInfographic exactly once with percentage values (0-100)
-
-            Ensure each tool receives data in the exact format specified above.
-            """
-        ),
-        *state["messages"],
-    ], config)
+    # Pick the worker for this turn, everything unless routing is on
+    intent = await route_turn(state, config, inline_infographics=INFOGRAPHICS_MODE != "parallel")
+    has_post = bool(state["blog_post"].get("content"))
+    tools, instructions, tier = _worker(intent, has_post)
+    history = compact_history(state["messages"])
+    if intent != "full":
+        tools = [*tools, *(tool for tool in _history_tools(history) if tool not in tools)]
+
+    if intent == "search":
+        # finding sources needs neither the post nor the resources
+        current_state = f"""
+        Current State:
+        Blog Title: {state["blog_post"].get("title", "")}
+        """
+    else:
+        # Process resources
+        resources = []
+        contents = await asyncio.gather(*(get_resource(resource["url"]) for resource in state["resources"]))
+        for resource, content in zip(state["resources"], contents):
+            if content == "ERROR":
+                continue
+            resources.append({
+                **resource,
+                "content": content
+            })
+
+        # Keep only the passages most relevant to the conversation
+        resources = build_resource_context(
+            resources,
+            conversation_query(state["messages"], state["blog_post"].get("title", "")),
+            get_context_budget(get_model_name(state)),
+        )
+        current_state = f"""
+        Current State:
+        Blog Title: {state["blog_post"].get("title", "")}
+        Blog Content: {state["blog_post"].get("content", "")}
+        Current Quote: {state["quote_info"].get("quote", "")}
+        Current Steps: {state["steps_info"].get("steps", [])}
+        Current Comparison: {state["comparison_info"].get("title", "")}
+        Current Statistics: {state["stats_info"].get("stats", [])}
+        Current Bar Chart: {state["bars_info"].get("stats", [])}
+
+        Available Resources:
+        {resources}
+        """
+
+    # Show edits in the UI as soon as each one has streamed in
+    emitter = StateEmitter(config, "chat_node")
+    streamer = EditStreamer(state["blog_post"], lambda post: emitter.emit({**state, "blog_post": post}))
+
+    response = await invoke_model(state, [
+        cacheable_system_message(state, instructions, current_state),
+        *history,
+    ], merge_configs(config, {"callbacks": [streamer]}), tools, tier)
     ai_message = cast(AIMessage, response)
     updated_messages = list(state["messages"])
     updated_messages.append(ai_message)
-    print(ai_message.tool_calls)
     
     # Handle tool calls
     if ai_message.tool_calls:
@@ -287,6 +418,18 @@ async def chat_node(state: AgentState, config: RunnableConfig):
                     "message": f"Updated blog post: {tool_call['args']['blog_post']['title']}",
                     "done": True
                 })
+
+            elif tool_call["name"] == "EditBlogPost":
+                state["blog_post"], errors = apply_edits(state["blog_post"], tool_call["args"].get("edits", []))
+                content = "Blog post updated."
+                if errors:
+                    content += " These edits could not be applied:\n" + "\n".join(errors)
+                    content += "\nRetry them with EditBlogPost or rewrite the post with WriteBlogPost."
+                tool_message = ToolMessage(tool_call_id=tool_call["id"], content=content)
+                state["logs"].append({
+                    "message": f"Edited blog post: {len(tool_call['args'].get('edits', [])) - len(errors)} changes",
+                    "done": True
+                })
             
             elif "quote_info" in tool_call["args"]:
                 state["quote_info"] = tool_call["args"]["quote_info"]
@@ -346,6 +489,9 @@ async def chat_node(state: AgentState, config: RunnableConfig):
             if tool_message:
                 updated_messages.append(tool_message)
 
+    if streamer.applied:
+        await emitter.close({**state, "blog_post": state["blog_post"]})
+
     return {
         "blog_post": state["blog_post"],
         "quote_info": state["quote_info"],
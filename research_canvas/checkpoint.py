@@ -0,0 +1,471 @@
+"""
+Checkpointer configuration for the agent graph.
+
+CHECKPOINTER selects the backend:
+
+- memory (default): the in-process MemorySaver, lost on restart and not shared
+  by workers.
+- sqlite: SQLiteSaver at CHECKPOINT_PATH, which must be set, durable and shared
+  by all workers on the host.
+- module:attribute: any other async backend, e.g. a Postgres saver. The attribute
+  is either a BaseCheckpointSaver or a callable returning one.
+
+The built-in backends store values with research_canvas.serde.CompactSerializer.
+"""
+
+import asyncio
+import hashlib
+import importlib
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.base import SerializerProtocol
+
+from research_canvas.serde import CompactSerializer
+
+CHECKPOINTER = os.getenv("CHECKPOINTER", "memory")
+# no default, importing the graph must not create a database wherever the process runs
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "")
+CHECKPOINT_TTL = float(os.getenv("CHECKPOINT_TTL", str(7 * 24 * 60 * 60)))
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "20"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS threads_updated_at ON threads (updated_at);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS channel_versions (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    blob_hash TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE INDEX IF NOT EXISTS channel_versions_blob ON channel_versions (blob_hash);
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    blob_hash TEXT NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE INDEX IF NOT EXISTS writes_blob ON writes (blob_hash);
+"""
+
+
+class SQLiteSaver(BaseCheckpointSaver[str]):
+    """
+    Checkpoint saver backed by an SQLite file.
+
+    Only channels that changed in a step are written, and channel values and pending
+    writes are stored content-addressed, so an unchanged blog post returned again by
+    a node is stored once no matter how many checkpoints reference it. Threads idle
+    for longer than `ttl` seconds are garbage collected, and only the last
+    `keep_last` checkpoints of each thread are kept (0 keeps all).
+    """
+    _GC_EVERY = 200
+
+    def __init__(
+        self,
+        path: str = CHECKPOINT_PATH,
+        *,
+        serde: Optional[SerializerProtocol] = None,
+        ttl: float = CHECKPOINT_TTL,
+        keep_last: int = CHECKPOINT_KEEP_LAST,
+    ):
+        super().__init__(serde=serde or CompactSerializer())
+        self.path = path
+        self.ttl = ttl
+        self.keep_last = keep_last
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _load_channel_values(
+        self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions
+    ) -> Dict[str, Any]:
+        if not versions:
+            return {}
+        rows = self._conn.execute(
+            f"""
+            SELECT v.channel, b.type, b.value FROM channel_versions v
+            JOIN blobs b ON b.hash = v.blob_hash
+            WHERE v.thread_id = ? AND v.checkpoint_ns = ?
+            AND (v.channel, v.version) IN (VALUES {", ".join(["(?, ?)"] * len(versions))})
+            """,
+            (thread_id, checkpoint_ns, *[str(x) for item in versions.items() for x in item])
+        ).fetchall()
+        return {
+            channel: self.serde.loads_typed((type_, value)) for channel, type_, value in rows
+        }
+
+    def _to_tuple(self, row: Tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, data, meta_type, meta = row
+        checkpoint: Checkpoint = self.serde.loads_typed((type_, data))
+        writes = self._conn.execute(
+            """
+            SELECT w.task_id, w.channel, b.type, b.value FROM writes w
+            JOIN blobs b ON b.hash = w.blob_hash
+            WHERE w.thread_id = ? AND w.checkpoint_ns = ? AND w.checkpoint_id = ?
+            ORDER BY w.task_id, w.idx
+            """,
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_channel_values(
+                    thread_id, checkpoint_ns, checkpoint["channel_versions"]
+                ),
+            },
+            metadata=self.serde.loads_typed((meta_type, meta)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((type_, value)))
+                for task_id, channel, type_, value in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        params: List[Any] = [thread_id, checkpoint_ns]
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+            return self._to_tuple(row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None, # pylint: disable=redefined-builtin
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = "SELECT * FROM checkpoints WHERE 1 = 1"
+        params: List[Any] = []
+        if config:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            with self._lock:
+                item = self._to_tuple(row)
+            if filter and not all(item.metadata.get(key) == value for key, value in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    def _put_blob(self, value: Any) -> str:
+        type_, data = self.serde.dumps_typed(value)
+        digest = hashlib.sha256(type_.encode("utf-8") + b"\0" + data).hexdigest()
+        self._conn.execute(
+            "INSERT OR IGNORE INTO blobs (hash, type, value) VALUES (?, ?, ?)",
+            (digest, type_, data)
+        )
+        return digest
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        values = checkpoint["channel_values"]
+        stored = {key: value for key, value in checkpoint.items() if key != "channel_values"}
+        type_, data = self.serde.dumps_typed(stored)
+        meta_type, meta = self.serde.dumps_typed(metadata)
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for channel, version in new_versions.items():
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO channel_versions VALUES (?, ?, ?, ?, ?)",
+                        (
+                            thread_id, checkpoint_ns, channel, str(version),
+                            self._put_blob(values[channel]) if channel in values else None
+                        )
+                    )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id, checkpoint_ns, checkpoint["id"],
+                        config["configurable"].get("checkpoint_id"),
+                        type_, data, meta_type, meta
+                    )
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, time.time())
+                )
+                if self.keep_last:
+                    self._trim_thread(thread_id, checkpoint_ns)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            self._puts += 1
+            if self._puts % self._GC_EVERY == 0:
+                self._collect_garbage()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # special writes (errors, interrupts) replace earlier ones, regular writes are kept
+        replace = all(WRITES_IDX_MAP.get(channel, 0) < 0 for channel, _ in writes)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            thread_id, checkpoint_ns, checkpoint_id, task_id,
+                            WRITES_IDX_MAP.get(channel, idx), channel, self._put_blob(value), task_path
+                        )
+                        for idx, (channel, value) in enumerate(writes)
+                    ]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._delete_threads([thread_id])
+
+    def _delete_threads(self, thread_ids: List[str]):
+        for table in ("checkpoints", "channel_versions", "writes", "threads"):
+            self._conn.executemany(
+                f"DELETE FROM {table} WHERE thread_id = ?", [(thread_id,) for thread_id in thread_ids]
+            )
+
+    def _trim_thread(self, thread_id: str, checkpoint_ns: str):
+        """Keep only the newest `keep_last` checkpoints and the versions they reference."""
+        old = self._conn.execute(
+            """
+            SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?
+            ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?
+            """,
+            (thread_id, checkpoint_ns, self.keep_last)
+        ).fetchall()
+        if not old:
+            return
+        params = [(thread_id, checkpoint_ns, checkpoint_id) for (checkpoint_id,) in old]
+        self._conn.executemany(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            params
+        )
+        self._conn.executemany(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            params
+        )
+        referenced = set()
+        for (type_, data) in self._conn.execute(
+            "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns)
+        ):
+            for channel, version in self.serde.loads_typed((type_, data))["channel_versions"].items():
+                referenced.add((channel, str(version)))
+        stale = [
+            (thread_id, checkpoint_ns, channel, version)
+            for channel, version in self._conn.execute(
+                "SELECT channel, version FROM channel_versions WHERE thread_id = ? AND checkpoint_ns = ?",
+                (thread_id, checkpoint_ns)
+            )
+            if (channel, version) not in referenced
+        ]
+        self._conn.executemany(
+            """
+            DELETE FROM channel_versions
+            WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?
+            """,
+            stale
+        )
+
+    def _collect_garbage(self):
+        """Delete idle threads, then blobs no thread references any more."""
+        if self.ttl:
+            idle = [
+                thread_id for (thread_id,) in self._conn.execute(
+                    "SELECT thread_id FROM threads WHERE updated_at < ?", (time.time() - self.ttl,)
+                )
+            ]
+            self._delete_threads(idle)
+        self._conn.execute(
+            """
+            DELETE FROM blobs
+            WHERE NOT EXISTS (SELECT 1 FROM channel_versions WHERE blob_hash = blobs.hash)
+            AND NOT EXISTS (SELECT 1 FROM writes WHERE blob_hash = blobs.hash)
+            """
+        )
+
+    def collect_garbage(self):
+        """
+        Delete threads idle for longer than the TTL and unreferenced blobs now,
+        instead of waiting for the next periodic collection.
+        """
+        with self._lock:
+            self._collect_garbage()
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None, # pylint: disable=redefined-builtin
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str: # pylint: disable=unused-argument
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+def get_checkpointer() -> BaseCheckpointSaver:
+    """
+    Create the checkpointer selected by the CHECKPOINTER environment variable.
+    """
+    if CHECKPOINTER == "memory":
+        return MemorySaver(serde=CompactSerializer())
+    if CHECKPOINTER == "sqlite":
+        if not CHECKPOINT_PATH:
+            raise ValueError("CHECKPOINTER=sqlite requires CHECKPOINT_PATH")
+        return SQLiteSaver()
+    if ":" in CHECKPOINTER:
+        module_name, attribute = CHECKPOINTER.split(":", 1)
+        saver = getattr(importlib.import_module(module_name), attribute)
+        return saver if isinstance(saver, BaseCheckpointSaver) else saver()
+    raise ValueError(f"Invalid checkpointer specified: {CHECKPOINTER}")
@@ -0,0 +1,206 @@
+"""
+Builds the resource context for the chat prompt.
+
+Downloaded resources are split into chunks, ranked against the current
+conversation with BM25 and packed into a per-model token budget, so the
+prompt carries the most relevant passages instead of every full page.
+"""
+
+import hashlib
+import os
+import re
+import zlib
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from langchain_core.messages import BaseMessage
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+CONTEXT_CHUNK_TOKENS = int(os.getenv("CONTEXT_CHUNK_TOKENS", "300"))
+CONTEXT_QUERY_MESSAGES = int(os.getenv("CONTEXT_QUERY_MESSAGES", "6"))
+_INDEX_CACHE_SIZE = 256
+
+_BM25_K1 = 1.5
+_BM25_B = 0.75
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this "
+    "to was were will with you your we our i me my not but can do does about".split()
+)
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text, at roughly four characters per token.
+    """
+    return (len(text) + 3) // 4
+
+def get_context_budget(model: str) -> int:
+    """
+    Get the resource token budget for a model, e.g. CONTEXT_TOKEN_BUDGET_ANTHROPIC=20000.
+    """
+    return int(os.getenv(f"CONTEXT_TOKEN_BUDGET_{model.upper()}", str(CONTEXT_TOKEN_BUDGET)))
+
+def _terms(text: str) -> List[int]:
+    return [
+        zlib.crc32(word.encode("utf-8"))
+        for word in _WORD.findall(text.lower())
+        if word not in _STOPWORDS
+    ]
+
+def chunk_text(text: str, chunk_tokens: int = CONTEXT_CHUNK_TOKENS) -> List[str]:
+    """
+    Split text into chunks of about `chunk_tokens`, on paragraph boundaries where possible.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = estimate_tokens(paragraph)
+        if tokens > chunk_tokens:
+            words = paragraph.split()
+            step = max(1, len(words) * chunk_tokens // tokens)
+            pieces = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        else:
+            pieces = [paragraph]
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > chunk_tokens:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+class _ResourceIndex:
+    """
+    Chunks of one resource with their term frequencies as flat arrays.
+    """
+    def __init__(self, content: str):
+        self.chunks = chunk_text(content)
+        self.tokens = np.array([estimate_tokens(chunk) for chunk in self.chunks], dtype=np.int64)
+        rows, terms, counts, lengths = [], [], [], []
+        for i, chunk in enumerate(self.chunks):
+            frequencies = Counter(_terms(chunk))
+            rows.extend([i] * len(frequencies))
+            terms.extend(frequencies.keys())
+            counts.extend(frequencies.values())
+            lengths.append(sum(frequencies.values()))
+        self.rows = np.array(rows, dtype=np.int64)
+        self.terms = np.array(terms, dtype=np.int64)
+        self.counts = np.array(counts, dtype=np.float64)
+        self.lengths = np.array(lengths, dtype=np.float64)
+
+
+_INDEX_CACHE: "OrderedDict[Tuple[str, str], _ResourceIndex]" = OrderedDict()
+
+def _get_index(url: str, content: str) -> _ResourceIndex:
+    """
+    Get the index for a resource, built once per (url, content hash).
+    """
+    key = (url, hashlib.sha1(content.encode("utf-8")).hexdigest())
+    index = _INDEX_CACHE.get(key)
+    if index is None:
+        index = _ResourceIndex(content)
+        _INDEX_CACHE[key] = index
+        if len(_INDEX_CACHE) > _INDEX_CACHE_SIZE:
+            _INDEX_CACHE.popitem(last=False)
+    else:
+        _INDEX_CACHE.move_to_end(key)
+    return index
+
+def _bm25(indexes: Sequence[_ResourceIndex], query: str) -> np.ndarray:
+    """
+    Score every chunk of every index against the query, as one flat array.
+    """
+    offsets = np.cumsum([0] + [len(index.chunks) for index in indexes])
+    n_chunks = int(offsets[-1])
+    if n_chunks == 0:
+        return np.zeros(0)
+
+    rows = np.concatenate([index.rows + offset for index, offset in zip(indexes, offsets)])
+    terms = np.concatenate([index.terms for index in indexes])
+    counts = np.concatenate([index.counts for index in indexes])
+    lengths = np.concatenate([index.lengths for index in indexes])
+
+    # earlier chunks win ties, so pages without any match still lead with their opening
+    position = np.concatenate([np.arange(len(index.chunks)) for index in indexes])
+    scores = 1e-3 / (1.0 + position)
+
+    query_terms = Counter(_terms(query))
+    if not query_terms or len(terms) == 0:
+        return scores
+
+    unique_terms, inverse = np.unique(terms, return_inverse=True)
+    df = np.bincount(inverse)
+    idf = np.log(1.0 + (n_chunks - df + 0.5) / (df + 0.5))
+    weights = np.array([query_terms.get(int(term), 0) for term in unique_terms], dtype=np.float64)
+
+    matched = weights[inverse] > 0
+    if not matched.any():
+        return scores
+
+    avg_length = max(lengths.mean(), 1.0)
+    tf = counts[matched]
+    norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * lengths[rows[matched]] / avg_length)
+    entry_scores = weights[inverse][matched] * idf[inverse][matched] * tf * (_BM25_K1 + 1) / (tf + norm)
+    return scores + np.bincount(rows[matched], weights=entry_scores, minlength=n_chunks)
+
+def conversation_query(messages: Sequence[BaseMessage], blog_title: str = "") -> str:
+    """
+    Build the ranking query from the most recent turns of the conversation.
+    """
+    parts = [blog_title]
+    for message in messages[-CONTEXT_QUERY_MESSAGES:]:
+        if isinstance(message.content, str):
+            parts.append(message.content)
+    return "\n".join(parts)
+
+def build_resource_context(
+    resources: List[Dict[str, Any]],
+    query: str,
+    budget: int = CONTEXT_TOKEN_BUDGET,
+) -> List[Dict[str, Any]]:
+    """
+    Keep only the chunks of each resource's content that rank highest against the query
+    and fit in the token budget. Chunks keep their original order within a resource.
+    Resources that fit in the budget together are kept whole. They are measured by
+    their content, the stored counts may be of an earlier download of a page.
+    """
+    if sum(estimate_tokens(resource["content"]) for resource in resources) <= budget:
+        return resources
+
+    indexes = [_get_index(resource["url"], resource["content"]) for resource in resources]
+    scores = _bm25(indexes, query)
+    owners = np.concatenate(
+        [np.full(len(index.chunks), i) for i, index in enumerate(indexes)] or [np.zeros(0, dtype=np.int64)]
+    ).astype(np.int64)
+    positions = np.concatenate(
+        [np.arange(len(index.chunks)) for index in indexes] or [np.zeros(0, dtype=np.int64)]
+    ).astype(np.int64)
+    tokens = np.concatenate(
+        [index.tokens for index in indexes] or [np.zeros(0, dtype=np.int64)]
+    )
+
+    selected: Dict[int, List[int]] = {i: [] for i in range(len(resources))}
+    remaining = budget
+    for chunk in np.argsort(-scores, kind="stable"):
+        if tokens[chunk] <= remaining:
+            selected[int(owners[chunk])].append(int(positions[chunk]))
+            remaining -= int(tokens[chunk])
+
+    context = []
+    for i, resource in enumerate(resources):
+        chunks = indexes[i].chunks
+        context.append({
+            **resource,
+            "content": "\n\n...\n\n".join(chunks[position] for position in sorted(selected[i]))
+        })
+    return context
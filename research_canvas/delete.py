@@ -8,7 +8,8 @@ async def delete_node(state: AgentState, config: RunnableConfig): # pylint: disa
     """
     Delete Node
     """
-    return state
+    # nothing changes until the user confirms
+    return {}
 
 async def perform_delete_node(state: AgentState, config: RunnableConfig): # pylint: disable=unused-argument
     """
@@ -17,9 +18,6 @@ async def perform_delete_node(state: AgentState, config: RunnableConfig): # pyli
     ai_message = cast(AIMessage, state["messages"][-2])
     tool_message = cast(ToolMessage, state["messages"][-1])
     if tool_message.content == "YES":
-        urls = ai_message.tool_calls[0]["args"]["urls"]
-        state["resources"] = [
-            resource for resource in state["resources"] if resource["url"] not in urls
-        ]
+        return {"resources": {"remove": ai_message.tool_calls[0]["args"]["urls"]}}
 
-    return state
+    return {}
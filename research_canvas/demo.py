@@ -1,17 +1,107 @@
-"""Demo"""
+"""Demo
 
+`main` serves the agent with uvicorn. SERVER_MODE=production runs it
+without reload on HOST with WORKERS processes, uvloop/httptools when
+installed, and drains in-flight requests on shutdown. Each worker checks its
+configuration on startup and reports it on /ready. With several workers,
+/metrics merges the metrics of all of them through METRICS_MULTIPROC_DIR,
+see research_canvas.metrics.
+"""
+
+import asyncio
+import glob
 import os
-from dotenv import load_dotenv 
+import logging
+import tempfile
+from contextlib import asynccontextmanager
+from typing import List
+from dotenv import load_dotenv
 load_dotenv()
 
 # pylint: disable=wrong-import-position
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 from copilotkit.integrations.fastapi import add_fastapi_endpoint
 from copilotkit import CopilotKitSDK, LangGraphAgent
 from research_canvas.agent import graph
+from research_canvas import metrics
+from research_canvas.cache import get_cache
+from research_canvas.checkpoint import CHECKPOINTER
+from research_canvas.download import close_session, shutdown_executor
+from research_canvas.log import configure_logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+SERVER_MODE = os.getenv("SERVER_MODE", "development")
+HOST = os.getenv("HOST", "127.0.0.1" if SERVER_MODE == "development" else "0.0.0.0")
+WORKERS = int(os.getenv("WORKERS", "0")) or (os.cpu_count() or 1)
+KEEP_ALIVE = int(os.getenv("KEEP_ALIVE", "75"))
+LIMIT_CONCURRENCY = int(os.getenv("LIMIT_CONCURRENCY", "0")) or None
+BACKLOG = int(os.getenv("BACKLOG", "2048"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+
+_PROVIDER_KEYS = {
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+    "google_genai": "GOOGLE_API_KEY",
+}
+
+_STATUS = {"ready": False, "problems": []}
+
+async def self_check() -> List[str]:
+    """
+    Check the configuration and the shared stores, returning the problems found.
+    """
+    problems = []
+    model = os.getenv("MODEL")
+    if model and model not in _PROVIDER_KEYS:
+        problems.append(f"MODEL={model} is not a known provider")
+    elif model and not os.getenv(_PROVIDER_KEYS[model]):
+        problems.append(f"{_PROVIDER_KEYS[model]} is not set")
+    elif not any(os.getenv(key) for key in _PROVIDER_KEYS.values()):
+        problems.append(f"none of {', '.join(_PROVIDER_KEYS.values())} is set")
+    if not os.getenv("TAVILY_API_KEY"):
+        problems.append("TAVILY_API_KEY is not set")
+    if SERVER_MODE == "production" and WORKERS > 1 and CHECKPOINTER == "memory":
+        problems.append(
+            "CHECKPOINTER=memory can't be shared by several workers, set CHECKPOINTER=sqlite and CHECKPOINT_PATH"
+        )
 
-app = FastAPI()
+    try:
+        cache = get_cache("self_check")
+        cache.set("ping", "pong", 60)
+        if cache.get("ping") != "pong":
+            problems.append("cache round trip failed")
+    except Exception as e: # pylint: disable=broad-except
+        problems.append(f"cache unavailable: {e}")
+
+    try:
+        await graph.checkpointer.aget_tuple({"configurable": {"thread_id": "__self_check__"}})
+    except Exception as e: # pylint: disable=broad-except
+        problems.append(f"checkpointer unavailable: {e}")
+    return problems
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Check the configuration on startup, release shared clients on shutdown."""
+    _STATUS["problems"] = await self_check()
+    for problem in _STATUS["problems"]:
+        logger.warning("self check: %s", problem)
+    if _STATUS["problems"] and SERVER_MODE == "production":
+        raise RuntimeError("self check failed: " + "; ".join(_STATUS["problems"]))
+    _STATUS["ready"] = True
+    flusher = asyncio.create_task(metrics.flush_periodically()) if metrics.METRICS_MULTIPROC_DIR else None
+    yield
+    # uvicorn has stopped accepting and waited for in-flight requests by now
+    _STATUS["ready"] = False
+    if flusher is not None:
+        flusher.cancel()
+    await close_session()
+    shutdown_executor()
+
+app = FastAPI(lifespan=lifespan)
 sdk = CopilotKitSDK(
     agents=[
         LangGraphAgent(
@@ -30,8 +120,48 @@ def health():
     """Health check."""
     return {"status": "ok"}
 
+@app.get("/ready")
+def ready():
+    """Readiness check, fails until the startup self check has passed."""
+    if not _STATUS["ready"]:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    return {"status": "ready", "problems": _STATUS["problems"]}
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus metrics of this process, or of all workers with METRICS_MULTIPROC_DIR."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 
 def main():
     """Run the uvicorn server."""
     port = int(os.getenv("PORT", "8000"))
-    uvicorn.run("research_canvas.demo:app", host="127.0.0.1", port=port, reload=True)
+    if SERVER_MODE != "production":
+        uvicorn.run("research_canvas.demo:app", host=HOST, port=port, reload=True)
+        return
+
+    if WORKERS > 1:
+        # workers are separate processes, caches must be on disk to be shared
+        os.environ.setdefault("CACHE_BACKEND", "sqlite")
+        os.environ.setdefault("HTML_CONVERT_WORKERS", str(max(1, (os.cpu_count() or 1) // WORKERS)))
+        # a scrape reaches one worker, each writes its metrics here to be merged
+        metrics_dir = os.environ.setdefault(
+            "METRICS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="research_canvas_metrics_")
+        )
+        # counters start from zero with the server, not from a previous run's workers
+        for path in glob.glob(os.path.join(metrics_dir, "*.json")):
+            os.remove(path)
+    uvicorn.run(
+        "research_canvas.demo:app",
+        host=HOST,
+        port=port,
+        workers=WORKERS,
+        loop="auto",
+        http="auto",
+        timeout_keep_alive=KEEP_ALIVE,
+        limit_concurrency=LIMIT_CONCURRENCY,
+        backlog=BACKLOG,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+        proxy_headers=True,
+        access_log=False,
+    )
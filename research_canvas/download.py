@@ -2,43 +2,248 @@
 This module contains the implementation of the download_node function.
 """
 
-import aiohttp
-import html2text
-from copilotkit.langchain import copilotkit_emit_state
+import asyncio
+import functools
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Dict, List, Optional
+
 from langchain_core.runnables import RunnableConfig
 from research_canvas.state import AgentState
+from research_canvas import metrics
+from research_canvas.cache import get_cache
+from research_canvas.context import estimate_tokens
+from research_canvas.emit import StateEmitter
+from research_canvas.extract import EXTRACT_MAIN_CONTENT, extract_main_content
+
+# aiohttp and html2text are imported on first download, not at startup
+if TYPE_CHECKING:
+    import aiohttp
+
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "20"))
+DOWNLOAD_PER_HOST = int(os.getenv("DOWNLOAD_PER_HOST", "4"))
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", "10"))
+RESOURCE_CACHE_TTL = float(os.getenv("RESOURCE_CACHE_TTL", str(24 * 60 * 60)))
+RESOURCE_ERROR_TTL = float(os.getenv("RESOURCE_ERROR_TTL", "300"))
+HTML_MAX_BYTES = int(os.getenv("HTML_MAX_BYTES", str(2 * 1024 * 1024)))
+HTML_CONVERT_EXECUTOR = os.getenv("HTML_CONVERT_EXECUTOR", "process")
+HTML_CONVERT_WORKERS = int(os.getenv("HTML_CONVERT_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+DOWNLOAD_STREAMING = os.getenv("DOWNLOAD_STREAMING", "true").lower() == "true"
+_CHUNK_SIZE = 64 * 1024
 
-_RESOURCE_CACHE = {}
+_RESOURCE_CACHE = get_cache("resources")
 
-def get_resource(url: str):
+async def get_resource(url: str) -> str:
     """
-    Get a resource from the cache.
+    Get a resource from the cache, "ERROR" if downloading it failed recently.
+    The lookup runs in a thread, the cache may be backed by SQLite.
     """
-    return _RESOURCE_CACHE.get(url, "")
+    return await asyncio.to_thread(_RESOURCE_CACHE.get, url) or ""
 
 
 _USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3" # pylint: disable=line-too-long
 
-async def _download_resource(url: str):
+_SESSION: Optional["aiohttp.ClientSession"] = None
+_SESSION_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_INFLIGHT: Dict[str, "asyncio.Task[str]"] = {}
+
+def _get_session() -> "aiohttp.ClientSession":
     """
-    Download a resource from the internet asynchronously.
+    Get the shared, connection-pooled session for the running event loop.
+    """
+    global _SESSION, _SESSION_LOOP # pylint: disable=global-statement
+    import aiohttp # pylint: disable=import-outside-toplevel,redefined-outer-name
+    loop = asyncio.get_running_loop()
+    if _SESSION is None or _SESSION.closed or _SESSION_LOOP is not loop:
+        _SESSION_LOOP = loop
+        _SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=DOWNLOAD_CONCURRENCY,
+                limit_per_host=DOWNLOAD_PER_HOST,
+                ttl_dns_cache=300,
+            ),
+            headers={"User-Agent": _USER_AGENT},
+            timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT),
+        )
+    return _SESSION
+
+async def close_session():
+    """
+    Close the shared session, e.g. on application shutdown.
+    """
+    global _SESSION # pylint: disable=global-statement
+    if _SESSION is not None and not _SESSION.closed:
+        await _SESSION.close()
+    _SESSION = None
+
+_EXECUTOR: Optional[Executor] = None
+
+def _get_executor() -> Executor:
+    """
+    Get the pool that converts HTML to markdown, a process pool unless
+    HTML_CONVERT_EXECUTOR=thread or processes are unavailable. Workers are started
+    by a fork server, or spawned, rather than forked from the server: it has threads
+    by the first download, and a fork copies it whole and can deadlock.
+    """
+    global _EXECUTOR # pylint: disable=global-statement
+    if _EXECUTOR is None:
+        if HTML_CONVERT_EXECUTOR == "process":
+            try:
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _EXECUTOR = ProcessPoolExecutor(
+                    max_workers=HTML_CONVERT_WORKERS, mp_context=multiprocessing.get_context(method)
+                )
+            except (OSError, NotImplementedError, ValueError):
+                _EXECUTOR = None
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=HTML_CONVERT_WORKERS,
+                thread_name_prefix="html2text"
+            )
+    return _EXECUTOR
+
+def shutdown_executor():
+    """
+    Shut down the conversion pool, e.g. on application shutdown.
+    """
+    global _EXECUTOR # pylint: disable=global-statement
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    _EXECUTOR = None
+
+def _convert_html(html_content: str) -> str:
+    import html2text # pylint: disable=import-outside-toplevel
+    if EXTRACT_MAIN_CONTENT:
+        html_content = extract_main_content(html_content)
+    return html2text.html2text(html_content)
+
+async def html_to_markdown(html_content: str, executor: Optional[Executor] = None) -> str:
+    """
+    Convert HTML to markdown in a worker pool so large pages don't stall the event loop,
+    keeping only the main content unless EXTRACT_MAIN_CONTENT=false.
+    Falls back to a thread pool if the process pool breaks.
+    """
+    global _EXECUTOR # pylint: disable=global-statement
+    # only text of more than a quarter of the cap in characters can be over it in bytes
+    if len(html_content) > HTML_MAX_BYTES // 4:
+        html_content = html_content.encode("utf-8")[:HTML_MAX_BYTES].decode("utf-8", errors="ignore")
+    loop = asyncio.get_running_loop()
+    pool = executor or _get_executor()
+    try:
+        return await loop.run_in_executor(pool, _convert_html, html_content)
+    except BrokenProcessPool:
+        if executor is not None:
+            raise
+        # concurrent conversions all see the broken pool, only the first replaces it
+        if _EXECUTOR is pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=HTML_CONVERT_WORKERS,
+                thread_name_prefix="html2text"
+            )
+        return await loop.run_in_executor(_get_executor(), _convert_html, html_content)
+
+async def _read_body(response: "aiohttp.ClientResponse") -> str:
+    """
+    Read at most HTML_MAX_BYTES of the response body, capped before decoding. In
+    streaming mode the body is read in chunks and the connection is released as
+    soon as the cap is reached.
     """
+    if DOWNLOAD_STREAMING:
+        chunks = []
+        size = 0
+        async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= HTML_MAX_BYTES:
+                break
+        body = b"".join(chunks)[:HTML_MAX_BYTES]
+    else:
+        body = (await response.read())[:HTML_MAX_BYTES]
+    try:
+        encoding = response.get_encoding()
+    except RuntimeError:
+        encoding = "utf-8"
+    return body.decode(encoding, errors="replace")
+
+async def _fetch_resource(url: str):
+    start = time.perf_counter()
+    status = "error"
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                url,
-                headers={"User-Agent": _USER_AGENT},
-                timeout=aiohttp.ClientTimeout(total=10)
-            ) as response:
-                response.raise_for_status()
-                html_content = await response.text()
-                markdown_content = html2text.html2text(html_content)
-                _RESOURCE_CACHE[url] = markdown_content
-                return markdown_content
+        async with _get_session().get(url) as response:
+            response.raise_for_status()
+            html_content = await _read_body(response)
+        status = "ok"
+        metrics.observe("download_duration_seconds", time.perf_counter() - start, status=status)
+        with metrics.timer("html_convert_duration_seconds"):
+            markdown_content = await html_to_markdown(html_content)
+        await asyncio.to_thread(_RESOURCE_CACHE.set, url, markdown_content, RESOURCE_CACHE_TTL)
+        metrics.inc("resource_tokens_total", estimate_tokens(markdown_content))
+        return markdown_content
     except Exception as e: # pylint: disable=broad-except
-        _RESOURCE_CACHE[url] = "ERROR"
+        if status == "error":
+            metrics.observe("download_duration_seconds", time.perf_counter() - start, status=status)
+        await asyncio.to_thread(_RESOURCE_CACHE.set, url, "ERROR", RESOURCE_ERROR_TTL)
         return f"Error downloading resource: {e}"
 
+def _forget(url: str, task: "asyncio.Task[str]"):
+    if _INFLIGHT.get(url) is task:
+        del _INFLIGHT[url]
+
+def _start_download(url: str) -> "asyncio.Task[str]":
+    task = _INFLIGHT.get(url)
+    if task is None or task.cancelled():
+        task = asyncio.ensure_future(_fetch_resource(url))
+        _INFLIGHT[url] = task
+        task.add_done_callback(functools.partial(_forget, url))
+    return task
+
+async def _download_resource(url: str):
+    """
+    Download a resource from the internet asynchronously.
+    Concurrent requests for the same URL share a single download.
+    """
+    cached = await get_resource(url)
+    if cached == "ERROR":
+        # failed within RESOURCE_ERROR_TTL, don't hit the URL again
+        return "Error downloading resource: it failed recently"
+    if cached:
+        return cached
+
+    while True:
+        task = _start_download(url)
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # a prefetch we joined was cancelled by the search that started it, download it ourselves
+            current = asyncio.current_task()
+            if task.cancelled() and current is not None and not current.cancelling():
+                continue
+            raise
+
+async def prefetch_resources(urls: List[str]) -> Dict[str, "asyncio.Task[str]"]:
+    """
+    Start downloading `urls` in the background, skipping cached and in-flight ones.
+    Returns the downloads this call started, by URL, so the caller can cancel
+    those it turns out not to need.
+    """
+    cached = dict(zip(urls, await asyncio.gather(*(get_resource(url) for url in urls))))
+    started = {}
+    for url in urls:
+        if url in started or url in _INFLIGHT or cached[url]:
+            continue
+        started[url] = _start_download(url)
+    return started
+
+async def download_resources(urls: List[str]) -> List[str]:
+    """
+    Download several resources in parallel, within the pool's per-host limits.
+    """
+    return await asyncio.gather(*[_download_resource(url) for url in urls])
+
 async def download_node(state: AgentState, config: RunnableConfig):
     """
     Download resources from the internet.
@@ -46,27 +251,46 @@ async def download_node(state: AgentState, config: RunnableConfig):
     state["resources"] = state.get("resources", [])
     state["logs"] = state.get("logs", [])
     resources_to_download = []
-
-    logs_offset = len(state["logs"])
+    download_logs = []
 
     # Find resources that are not downloaded
-    for resource in state["resources"]:
-        if not get_resource(resource["url"]):
+    cached = await asyncio.gather(*(get_resource(resource["url"]) for resource in state["resources"]))
+    for resource, content in zip(state["resources"], cached):
+        if not content:
             resources_to_download.append(resource)
-            state["logs"].append({
+            log = {
                 "message": f"Downloading {resource['url']}",
                 "done": False
-            })
+            }
+            state["logs"].append(log)
+            download_logs.append(log)
 
     # Emit the state to let the UI update
-    await copilotkit_emit_state(config, state)
+    emitter = StateEmitter(config, "download_node")
+    await emitter.flush(state)
 
     # Download the resources
-    for i, resource in enumerate(resources_to_download):
+    async def download(resource, log):
         await _download_resource(resource["url"])
-        state["logs"][logs_offset + i]["done"] = True
+        log["done"] = True
 
         # update UI
-        await copilotkit_emit_state(config, state)
+        await emitter.emit(state)
+
+    await asyncio.gather(*[
+        download(resource, log) for resource, log in zip(resources_to_download, download_logs)
+    ])
+
+    # store the size of each page, and update it when an expired page was downloaded again
+    counted = []
+    contents = await asyncio.gather(*(get_resource(resource["url"]) for resource in state["resources"]))
+    for resource, content in zip(state["resources"], contents):
+        if content and content != "ERROR" and resource.get("tokens") != estimate_tokens(content):
+            counted.append({**resource, "tokens": estimate_tokens(content)})
+
+    state["logs"] = []
+    await emitter.close(state)
 
-    return state
+    if not counted:
+        return {"logs": state["logs"]}
+    return {"logs": state["logs"], "resources": {"add": counted}}
@@ -0,0 +1,105 @@
+"""
+Coalesced state emission for UI updates.
+
+Nodes that report progress item by item would otherwise push the whole
+AgentState (blog post, resources, ...) to the UI after every item.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+from research_canvas import metrics
+from research_canvas.serde import dumps_json
+
+logger = logging.getLogger(__name__)
+
+EMIT_INTERVAL = float(os.getenv("EMIT_INTERVAL", "0.1"))
+# Only enable for frontends that merge partial state; CopilotKit replaces it.
+EMIT_DELTAS = os.getenv("EMIT_DELTAS", "false").lower() == "true"
+
+
+class StateEmitter:
+    """
+    Emits state at most once per `interval` seconds. Updates inside the window are
+    coalesced into a single trailing emission of the latest state, and emissions
+    that wouldn't change what the UI last received are skipped. `flush` must be
+    awaited when the node is done so the final state is always sent.
+
+    Messages are never emitted, CopilotKit strips them before syncing state.
+    """
+    def __init__(self, config: RunnableConfig, node: str, interval: float = EMIT_INTERVAL):
+        self.config = config
+        self.node = node
+        self.interval = interval
+        self.emits = 0
+        self.bytes = 0
+        self._sent: Dict[str, bytes] = {}
+        self._last = 0.0
+        self._state: Optional[Dict[str, Any]] = None
+        self._trailing: Optional[asyncio.Task] = None
+
+    async def emit(self, state: Dict[str, Any]):
+        """
+        Emit the state now, or once the current window has passed.
+        """
+        self._state = state
+        wait = self._last + self.interval - time.monotonic()
+        if wait <= 0:
+            await self._send()
+        elif self._trailing is None:
+            self._trailing = asyncio.create_task(self._send_later(wait))
+
+    async def flush(self, state: Optional[Dict[str, Any]] = None):
+        """
+        Emit the latest state immediately.
+        """
+        if state is not None:
+            self._state = state
+        if self._trailing is not None:
+            self._trailing.cancel()
+            self._trailing = None
+        await self._send()
+
+    async def close(self, state: Optional[Dict[str, Any]] = None):
+        """
+        Flush the final state and record what this node run emitted.
+        """
+        await self.flush(state)
+        metrics.inc("state_emits_total", self.emits, node=self.node)
+        metrics.inc("state_emit_bytes_total", self.bytes, node=self.node)
+        logger.info(
+            "state emitted",
+            extra={"event": "emit", "node": self.node, "emits": self.emits, "bytes": self.bytes},
+        )
+
+    async def _send_later(self, wait: float):
+        await asyncio.sleep(wait)
+        self._trailing = None
+        await self._send()
+
+    async def _send(self):
+        if self._state is None:
+            return
+        encoded = {
+            key: dumps_json(value)
+            for key, value in self._state.items()
+            if key != "messages"
+        }
+        changed = {key: value for key, value in encoded.items() if self._sent.get(key) != value}
+        if not changed and self.emits:
+            return
+
+        payload_keys = changed if EMIT_DELTAS and self.emits else encoded
+        payload = {key: self._state[key] for key in payload_keys}
+        self._sent.update(encoded)
+        self._last = time.monotonic()
+        self.emits += 1
+        self.bytes += sum(len(encoded[key]) + len(key) for key in payload_keys)
+        # copilotkit is slow to import, load it when the first node emits
+        from copilotkit.langchain import copilotkit_emit_state # pylint: disable=import-outside-toplevel
+        await copilotkit_emit_state(self.config, payload)
@@ -0,0 +1,347 @@
+"""
+Main-content extraction for downloaded pages.
+
+html2text converts everything on a page, so navigation, cookie banners,
+share buttons, related links, comments and footers would end up in the
+prompt. Invisible markup (comments, scripts, styles, SVG, ...) is skipped
+while the page is read, and the remaining elements are scored the way
+Readability does:
+each paragraph adds to the score of its parent and, by half, of its
+grandparent, more for longer text with more commas, and class and id names
+hint at content or boilerplate. The best element, and siblings scoring
+close to it, are kept without the link lists and boilerplate inside them.
+Pages where too little text would remain are converted whole.
+"""
+
+import bisect
+import functools
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+EXTRACT_MAIN_CONTENT = os.getenv("EXTRACT_MAIN_CONTENT", "true").lower() == "true"
+# extracted text shorter than this means extraction failed, the whole page is used
+EXTRACT_MIN_CHARS = int(os.getenv("EXTRACT_MIN_CHARS", "250"))
+
+# elements whose content is text up to their end tag, and the end of a comment
+_RAW_TEXT = frozenset("script style noscript iframe textarea xmp noembed noframes".split())
+_CLOSERS = {tag: re.compile(rf"</{tag}\s*>", re.I) for tag in _RAW_TEXT}
+_CLOSERS["!--"] = re.compile(r"-->")
+# elements with markup inside that is never shown as text
+_HIDDEN = frozenset("head template svg math object canvas".split())
+_HEAD = frozenset("head title base link meta style script noscript template".split())
+# a tag (closing, name, attributes), other markup such as a doctype, or text
+_TOKEN = re.compile(r"<(/?)([a-zA-Z][^\s/>]*)([^>]*)>|<[!?/][^>]*>|([^<]+)|<")
+_ATTRIBUTE = re.compile(r"""([^\s=/"']+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+)))?""")
+_VOID = frozenset("area base br col embed hr img input link meta param source track wbr".split())
+_INLINE = frozenset(
+    "a abbr b bdi bdo br cite code data dfn em i img kbd label mark q s samp small span strong sub sup time u var wbr"
+    .split()
+)
+_PARAGRAPHS = frozenset(("p", "pre", "td", "blockquote"))
+_DROP_TAGS = frozenset(
+    "nav footer aside form button select textarea input dialog menu script style noscript iframe".split()
+) | _HIDDEN
+_DROP_ROLES = frozenset(
+    "navigation banner contentinfo complementary search dialog alertdialog menu menubar toolbar".split()
+)
+# containers cleaned out of the kept content when they are mostly links
+_CONDITIONAL = frozenset("div section ul ol dl table header figure".split())
+_TAG_WEIGHTS = {
+    "article": 10, "main": 10, "div": 5, "pre": 3, "td": 3, "blockquote": 3,
+    "address": -3, "ol": -3, "ul": -3, "dl": -3, "dd": -3, "dt": -3, "li": -3,
+    "h1": -5, "h2": -5, "h3": -5, "h4": -5, "h5": -5, "h6": -5, "th": -5,
+}
+_NEGATIVE = re.compile(
+    r"banner|breadcrumb|combx|comment|community|consent|cookie|disqus|footer|gdpr|header|masthead|menu|"
+    r"modal|navbar|newsletter|outbrain|pagination|pager|popup|promo|related|remark|replies|rss|share|"
+    r"sharing|shoutbox|sidebar|skyscraper|social|sponsor|subscribe|taboola|toolbar|widget|"
+    r"(?:^|[\s_-])(?:ad|ads|advert|advertisement|nav|tags?)(?:$|[\s_-])",
+    re.I,
+)
+_POSITIVE = re.compile(r"article|body|content|entry|main|post|story|text|blog", re.I)
+
+
+@functools.lru_cache(maxsize=4096)
+def _hints(hint: str) -> Tuple[bool, bool]:
+    """Whether class and id names suggest content, and whether they suggest boilerplate."""
+    if not hint:
+        return False, False
+    return bool(_POSITIVE.search(hint)), bool(_NEGATIVE.search(hint))
+
+
+class _Node:
+    __slots__ = (
+        "tag", "parent", "children", "start", "end", "hint", "drop",
+        "text", "links", "commas", "score", "scored", "has_block",
+    )
+
+    def __init__(self, tag: str, parent: Optional["_Node"], start: int, hint: str, drop: bool):
+        self.tag = tag
+        self.parent = parent
+        self.children: List[_Node] = []
+        self.start = start
+        self.end = -1
+        self.hint = hint
+        self.drop = drop
+        self.text = 0
+        self.links = 0
+        self.commas = 0
+        self.score = 0.0
+        self.scored = False
+        self.has_block = False
+
+    def link_density(self) -> float:
+        """Share of the text that is link text."""
+        return self.links / self.text if self.text else 0.0
+
+    def weight(self) -> int:
+        """Hint from the class and id names."""
+        positive, negative = _hints(self.hint)
+        return 25 * positive - 25 * negative
+
+    def final_score(self) -> float:
+        """Paragraph score adjusted for tag, class and link density."""
+        return (self.score + _TAG_WEIGHTS.get(self.tag, 0) + self.weight()) * (1 - self.link_density())
+
+
+class _TreeBuilder:
+    """
+    Builds a tree of elements with their source ranges and text statistics, no text
+    is kept. Tags are matched with a regular expression rather than html.parser,
+    which is several times slower and only the ranges are needed.
+    """
+    def __init__(self, html: str):
+        self.html = html
+        self.root = _Node("#root", None, 0, "", False)
+        self.stack = [self.root]
+        # open elements by tag, to ignore end tags that close nothing
+        self.open: Counter = Counter()
+        self.links = 0
+        self.candidates: List[_Node] = []
+        self.h1: Optional[_Node] = None
+        # source ranges of comments, scripts and other invisible markup
+        self.invisible: List[Tuple[int, int]] = []
+        self._found: Dict[str, Tuple[int, int]] = {}
+
+    def build(self) -> "_TreeBuilder":
+        """Read the whole page."""
+        # no tag ends after the last ">", stopping there keeps every match short
+        end = self.html.rfind(">") + 1
+        position = 0
+        while position < end:
+            position = self._scan(position, end)
+        if end < len(self.html):
+            self._data(self.html[end:])
+        while len(self.stack) > 1:
+            self._close(self.stack.pop(), len(self.html))
+        return self
+
+    def _scan(self, position: int, end: int) -> int:
+        """Read tokens up to end, returns early to continue after invisible content."""
+        for match in _TOKEN.finditer(self.html, position, end):
+            tag = match.group(2)
+            if tag is not None:
+                tag = tag.lower()
+                if match.group(1):
+                    self._end(tag, match.start(), match.end())
+                    continue
+                attrs = match.group(3)
+                closed = attrs.endswith("/")
+                if tag in _RAW_TEXT and not closed:
+                    # without an end tag the start tag is ignored rather than hiding the rest of the page
+                    skip = self._find(tag, match.end())
+                    if skip is not None:
+                        self.invisible.append((match.start(), skip))
+                        return skip
+                    continue
+                self._start(tag, attrs, match.start(), match.end())
+                if closed and tag not in _VOID:
+                    self._end(tag, match.end(), match.end())
+            elif match.group(4) is not None:
+                self._data(match.group(4))
+            elif match.group(0).startswith("<!--"):
+                # an unclosed comment ends at the next ">"
+                skip = self._find("!--", match.start() + 4) or match.end()
+                self.invisible.append((match.start(), skip))
+                if skip > match.end():
+                    return skip
+        return end
+
+    def _find(self, closer: str, position: int) -> Optional[int]:
+        """
+        End of the first closer at or after position. Positions only grow, so a
+        closer found further on, or not found at all, is reused without searching
+        again, and each closer scans the page at most once.
+        """
+        found = self._found.get(closer)
+        if found is None or 0 <= found[0] < position:
+            match = _CLOSERS[closer].search(self.html, position)
+            found = self._found[closer] = (match.start(), match.end()) if match else (-1, -1)
+        return found[1] if found[0] >= 0 else None
+
+    def _close(self, node: _Node, end: int):
+        node.end = end
+        parent = node.parent
+        assert parent is not None
+        if node.tag in _HIDDEN:
+            self.invisible.append((node.start, end))
+        if node.tag == "h1" and self.h1 is None and not node.drop:
+            self.h1 = node
+        if node.drop:
+            return
+        parent.text += node.text
+        parent.links += node.links
+        parent.commas += node.commas
+        is_paragraph = node.tag in _PARAGRAPHS or (node.tag == "div" and not node.has_block)
+        if is_paragraph and node.text >= 25:
+            score = 1 + node.commas + min(node.text // 100, 3)
+            for ancestor, share in ((parent, 1.0), (parent.parent, 0.5)):
+                if ancestor is None or ancestor is self.root:
+                    break
+                if not ancestor.scored:
+                    ancestor.scored = True
+                    self.candidates.append(ancestor)
+                ancestor.score += score * share
+
+    def _start(self, tag: str, attrs: str, start: int, end: int):
+        # a head left open ends at the first element that belongs in the body
+        if self.open["head"] and tag not in _HEAD:
+            self._end("head", start, start)
+        elif tag == "head" and self.open["body"]:
+            return
+        parent = self.stack[-1]
+        # an unclosed paragraph ends where the next block starts
+        if parent.tag == "p" and tag not in _INLINE:
+            self.stack.pop()
+            self.open["p"] -= 1
+            self._close(parent, start)
+            parent = self.stack[-1]
+        if tag not in _INLINE:
+            parent.has_block = True
+        if parent.drop:
+            # everything inside boilerplate is dropped with it, its attributes don't matter
+            node = _Node(tag, parent, start, "", True)
+        else:
+            values = {
+                name.lower(): next((value for value in values if value), "")
+                for name, *values in _ATTRIBUTE.findall(attrs)
+            } if attrs.strip(" /") else {}
+            hint = f"{values.get('class', '')} {values.get('id', '')}".strip()
+            node = _Node(tag, parent, start, hint, _boilerplate(tag, values, hint))
+        parent.children.append(node)
+        if tag in _VOID:
+            node.end = end
+            return
+        self.stack.append(node)
+        self.open[tag] += 1
+        if tag == "a":
+            self.links += 1
+
+    def _end(self, tag: str, start: int, end: int):
+        if not self.open[tag]:
+            return
+        while True:
+            node = self.stack.pop()
+            self.open[node.tag] -= 1
+            if node.tag == "a":
+                self.links -= 1
+            self._close(node, end if node.tag == tag else start)
+            if node.tag == tag:
+                break
+
+    def _data(self, data: str):
+        node = self.stack[-1]
+        if node.drop:
+            return
+        length = len(" ".join(data.split()))
+        node.text += length
+        node.commas += data.count(",")
+        if self.links:
+            node.links += length
+
+
+def _boilerplate(tag: str, attrs: Dict[str, str], hint: str) -> bool:
+    if tag in _DROP_TAGS or attrs.get("role") in _DROP_ROLES:
+        return True
+    if "hidden" in attrs or attrs.get("aria-hidden") == "true":
+        return True
+    if "display:none" in attrs.get("style", "").replace(" ", ""):
+        return True
+    positive, negative = _hints(hint)
+    return negative and not positive and tag not in ("html", "body", "article", "main")
+
+
+def _keep_siblings(top: _Node) -> List[_Node]:
+    """The top candidate and the siblings that look like part of the same content."""
+    parent = top.parent
+    if parent is None or parent.tag == "#root":
+        return [top]
+    threshold = max(10.0, top.final_score() * 0.2)
+    kept = []
+    for sibling in parent.children:
+        if sibling is top:
+            kept.append(sibling)
+        elif sibling.drop or sibling.end < 0:
+            continue
+        elif sibling.scored and sibling.final_score() >= threshold:
+            kept.append(sibling)
+        elif sibling.tag == "p" and sibling.link_density() < 0.25 and sibling.text > 80:
+            kept.append(sibling)
+    return kept
+
+
+def _removals(node: _Node, ranges: List[Tuple[int, int]]):
+    """Collect the source ranges of boilerplate inside kept content."""
+    # iterative, pages can nest deeper than the recursion limit
+    stack = [node]
+    while stack:
+        for child in stack.pop().children:
+            if child.end < 0:
+                continue
+            link_heavy = child.tag in _CONDITIONAL and child.text and (
+                child.link_density() > 0.5 or (child.link_density() > 0.25 and child.weight() < 0)
+            )
+            if child.drop or link_heavy:
+                ranges.append((child.start, child.end))
+            else:
+                stack.append(child)
+
+
+def _cut(html: str, start: int, end: int, removals: List[Tuple[int, int]]) -> str:
+    parts = []
+    position = start
+    for remove_start, remove_end in removals[bisect.bisect_left(removals, (start, start)):]:
+        if remove_start >= end:
+            break
+        parts.append(html[position:remove_start])
+        position = max(position, remove_end)
+    parts.append(html[position:end])
+    return "".join(parts)
+
+
+def extract_main_content(html: str, min_chars: int = EXTRACT_MIN_CHARS) -> str:
+    """
+    Reduce a page to its main content, see the module docstring. Returns HTML for
+    html2text, the page without invisible markup when no main content is found.
+    """
+    builder = _TreeBuilder(html).build()
+    removals = sorted(builder.invisible)
+    if not builder.candidates:
+        return _cut(html, 0, len(html), removals)
+
+    top = max(builder.candidates, key=lambda node: node.final_score())
+    kept = _keep_siblings(top)
+    if sum(node.text for node in kept) < min_chars:
+        return _cut(html, 0, len(html), removals)
+
+    for node in kept:
+        _removals(node, removals)
+    removals.sort()
+    parts = [_cut(html, node.start, node.end, removals) for node in kept]
+    # the title is often above the content, in a header that is dropped as boilerplate
+    h1 = builder.h1
+    if h1 is not None and not any(node.start <= h1.start < node.end for node in kept):
+        parts.insert(0, _cut(html, h1.start, h1.end, removals))
+    return "\n".join(parts)
@@ -0,0 +1,129 @@
+"""
+Hedged model requests and provider failover.
+
+With MODEL_FALLBACK set to a second provider, a call whose primary provider
+fails is retried on the fallback. With MODEL_HEDGE=true as well, a backup
+request is sent to the fallback when the primary hasn't produced its first
+token (or its response, when not streaming) within a deadline, the p95 of
+recent calls of the same kind unless HEDGE_DEADLINE fixes it. Whichever
+request starts streaming or finishes first wins and the other is cancelled,
+so only one of them ever streams to the UI.
+"""
+
+import asyncio
+import math
+import os
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Tuple, TypeVar
+
+from research_canvas import metrics
+
+MODEL_FALLBACK = os.getenv("MODEL_FALLBACK", "")
+MODEL_HEDGE = os.getenv("MODEL_HEDGE", "false").lower() == "true"
+# a fixed deadline in seconds, 0 to derive it from recent latencies
+HEDGE_DEADLINE = float(os.getenv("HEDGE_DEADLINE", "0"))
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+# until this many samples exist, HEDGE_INITIAL_DEADLINE is used
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_INITIAL_DEADLINE = float(os.getenv("HEDGE_INITIAL_DEADLINE", "10"))
+
+T = TypeVar("T")
+
+# an attempt gets an event to set when its first token arrives
+Attempt = Callable[[asyncio.Event], Awaitable[T]]
+
+class LatencyTracker:
+    """
+    Recent first-token latencies per kind of call, for the hedging deadline.
+    """
+    def __init__(self, size: int = 200):
+        self._samples: Dict[Hashable, Deque[float]] = defaultdict(lambda: deque(maxlen=size))
+
+    def record(self, key: Hashable, seconds: float):
+        """Add a sample."""
+        self._samples[key].append(seconds)
+
+    def deadline(self, key: Hashable) -> float:
+        """Seconds to wait for the primary before hedging."""
+        if HEDGE_DEADLINE:
+            return HEDGE_DEADLINE
+        samples = sorted(self._samples.get(key, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_INITIAL_DEADLINE
+        return samples[min(len(samples) - 1, math.ceil(HEDGE_PERCENTILE / 100 * len(samples)) - 1)]
+
+LATENCIES = LatencyTracker()
+
+class _Candidate:
+    def __init__(self, name: str, attempt: Attempt):
+        self.name = name
+        self.first_token = asyncio.Event()
+        self.task = asyncio.create_task(attempt(self.first_token))
+        self.started = asyncio.create_task(self.first_token.wait())
+
+    def cancel(self):
+        self.task.cancel()
+        self.started.cancel()
+
+async def _race(candidates: List[_Candidate], timeout: Optional[float] = None) -> Optional[_Candidate]:
+    """
+    Wait for the first candidate to start streaming or succeed, dropping failed ones.
+    Returns None on timeout, raises the last error when every candidate failed.
+    """
+    error: Optional[BaseException] = None
+    loop = asyncio.get_running_loop()
+    end = None if timeout is None else loop.time() + timeout
+    while candidates:
+        waiting = {task for candidate in candidates for task in (candidate.task, candidate.started)}
+        remaining = None if end is None else max(0.0, end - loop.time())
+        done, _ = await asyncio.wait(waiting, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            return None
+        for candidate in list(candidates):
+            if candidate.started in done or (candidate.task in done and candidate.task.exception() is None):
+                return candidate
+            if candidate.task in done:
+                error = candidate.task.exception()
+                candidate.started.cancel()
+                candidates.remove(candidate)
+    assert error is not None
+    raise error
+
+async def hedged(
+    primary: Attempt,
+    backup: Optional[Attempt],
+    deadline: float,
+    hedge: bool = True,
+    **labels: str,
+) -> Tuple[T, str]:
+    """
+    Run `primary`, falling back to `backup` when it fails and, with `hedge`, also
+    when it hasn't started within `deadline` seconds. Returns the result and
+    which attempt produced it: "primary", or "hedge" or "failover" for the backup.
+    `labels` are added to the model_backup_requests_total metric.
+    """
+    candidates = [_Candidate("primary", primary)]
+    try:
+        try:
+            winner = await _race(list(candidates), deadline if hedge and backup is not None else None)
+        except Exception: # pylint: disable=broad-except
+            if backup is None:
+                raise
+            # the primary failed before streaming anything, fail over
+            candidates, winner = [], None
+        if winner is None:
+            assert backup is not None
+            reason = "hedge" if candidates else "failover"
+            metrics.inc("model_backup_requests_total", reason=reason, **labels)
+            candidates.append(_Candidate(reason, backup))
+            winner = await _race(list(candidates))
+    except BaseException:
+        for candidate in candidates:
+            candidate.cancel()
+        raise
+
+    for candidate in candidates:
+        if candidate is not winner:
+            candidate.cancel()
+    winner.started.cancel()
+    return await winner.task, winner.name
@@ -0,0 +1,129 @@
+"""
+Conversation history compaction.
+
+The model only needs the recent turns verbatim: the current blog post and
+infographics are already in the system prompt, so old tool-call payloads and
+search dumps are replaced by short stubs, and turns that don't fit the token
+budget are folded into a summary. Turns are kept or dropped whole, so an
+AIMessage with tool calls always stays next to its ToolMessages.
+"""
+
+import json
+import os
+from typing import Any, List, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from research_canvas.context import estimate_tokens
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "8000"))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "500"))
+_STUB_CHARS = 200
+
+def _stub(value: Any) -> Any:
+    """Shorten long strings anywhere inside a tool-call argument."""
+    if isinstance(value, str) and len(value) > _STUB_CHARS:
+        return f"{value[:_STUB_CHARS]}... [{len(value) - _STUB_CHARS} characters omitted]"
+    if isinstance(value, dict):
+        return {key: _stub(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_stub(item) for item in value]
+    return value
+
+def _text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return " ".join(
+        block.get("text", "") if isinstance(block, dict) else str(block)
+        for block in message.content
+    )
+
+def message_tokens(message: BaseMessage) -> int:
+    """
+    Estimate the tokens a message takes up in the prompt, including tool-call arguments.
+    """
+    tokens = estimate_tokens(_text(message))
+    if isinstance(message, AIMessage):
+        for tool_call in message.tool_calls:
+            tokens += estimate_tokens(json.dumps(tool_call["args"], default=str))
+    return tokens
+
+def compact_message(message: BaseMessage) -> BaseMessage:
+    """
+    Replace large tool-call arguments and tool results with stubs, keeping ids intact.
+    """
+    if isinstance(message, AIMessage) and message.tool_calls:
+        return message.model_copy(update={
+            "tool_calls": [
+                {**tool_call, "args": _stub(tool_call["args"])} for tool_call in message.tool_calls
+            ],
+        })
+    if isinstance(message, ToolMessage) and isinstance(message.content, str):
+        return message.model_copy(update={"content": _stub(message.content)})
+    return message
+
+def _split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if not turns or isinstance(message, HumanMessage):
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+def _summarize(turns: Sequence[Sequence[BaseMessage]]) -> str:
+    """Summarize dropped turns, most recent kept when the summary is over budget."""
+    lines = []
+    for turn in turns:
+        for message in turn:
+            if isinstance(message, HumanMessage):
+                lines.append(f"- User: {_stub(_text(message))}")
+            elif isinstance(message, AIMessage):
+                if message.tool_calls:
+                    names = ", ".join(tool_call["name"] for tool_call in message.tool_calls)
+                    lines.append(f"- Assistant called: {names}")
+                elif _text(message):
+                    lines.append(f"- Assistant: {_stub(_text(message))}")
+
+    kept: List[str] = []
+    tokens = 0
+    for line in reversed(lines):
+        tokens += estimate_tokens(line)
+        if tokens > HISTORY_SUMMARY_TOKENS:
+            break
+        kept.append(line)
+    return "\n".join(reversed(kept))
+
+def compact_history(
+    messages: Sequence[BaseMessage],
+    budget: int = HISTORY_TOKEN_BUDGET,
+) -> List[BaseMessage]:
+    """
+    Fit the conversation into `budget` tokens. The current turn is kept verbatim,
+    earlier turns are compacted, and the oldest ones are replaced by a summary.
+    """
+    turns = _split_turns(messages)
+    if not turns:
+        return []
+
+    current = turns[-1]
+    # leave room for the summary of whatever doesn't fit
+    remaining = budget - HISTORY_SUMMARY_TOKENS - sum(message_tokens(message) for message in current)
+    kept: List[List[BaseMessage]] = [current]
+    index = len(turns) - 1
+    while index > 0:
+        turn = [compact_message(message) for message in turns[index - 1]]
+        tokens = sum(message_tokens(message) for message in turn)
+        if tokens > remaining:
+            break
+        kept.append(turn)
+        remaining -= tokens
+        index -= 1
+
+    compacted = [message for turn in reversed(kept) for message in turn]
+    if index > 0:
+        summary = _summarize(turns[:index])
+        if summary:
+            compacted.insert(0, HumanMessage(
+                content=f"Summary of the earlier conversation:\n{summary}"
+            ))
+    return compacted
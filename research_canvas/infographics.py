@@ -1,112 +1,165 @@
-from typing import Dict, Union, List, cast
+"""
+Infographic generation.
+
+With INFOGRAPHICS_MODE=parallel the chat model only writes the blog post, and
+the five infographics are then generated by concurrent `infographic_node`
+branches, each with a small prompt containing only the blog content. Every
+branch writes its own state key, and `infographics_join_node` runs once all
+of them are done.
+"""
+
+import os
+from typing import List, TypedDict, cast
 from langchain_core.runnables import RunnableConfig
-from langchain_core.messages import SystemMessage, AIMessage, ToolMessage
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
 from langchain.tools import tool
-from copilotkit.langchain import copilotkit_customize_config
-from research_canvas.state import AgentState
-from research_canvas.model import get_model
+from langgraph.types import Send
+from research_canvas.state import AgentState, BlogPost, QuoteInfographic, ComparisonInfographic, StepsInfographic, StatisticsGroup, BarGroup
+from research_canvas.model import invoke_model
+
+INFOGRAPHICS_MODE = os.getenv("INFOGRAPHICS_MODE", "inline")
+
+@tool
+def GenerateQuoteInfographic(quote_info: QuoteInfographic):
+    """Generate a quote-based infographic from the blog content."""
+    pass
+
+@tool
+def GenerateStepsInfographic(steps_info: StepsInfographic):
+    """Generate a steps-based infographic from the blog content."""
+    pass
 
 @tool
-def GenerateInfographic(infographics: Dict[str, Union[str, List[str]]]):
-    """Generate a content-based infographic based on the blog content."""
+def GenerateComparisonInfographic(comparison_info: ComparisonInfographic):
+    """Generate a comparison-based infographic from the blog content."""
     pass
 
-async def infographics_node(state: AgentState, config: RunnableConfig):
+@tool
+def GenerateStatisticsInfographic(stats_info: StatisticsGroup):
+    """Generate a statistics-based infographic from the blog content."""
+    pass
+
+@tool
+def GenerateBarChartInfographic(bars_info: BarGroup):
+    """Generate a bar chart infographic from the blog content."""
+    pass
+
+INFOGRAPHICS = {
+    "quote_info": {
+        "tool": GenerateQuoteInfographic,
+        "name": "quote",
+        "instructions": """
+            Pick a single impactful quote FROM the blog content.
+            Format:
+            {"type": "quote", "quote": "string", "source": "string", "context": "string"}
+        """,
+    },
+    "steps_info": {
+        "tool": GenerateStepsInfographic,
+        "name": "steps",
+        "instructions": """
+            Create a step-by-step guide based on the blog content, as an array of steps.
+            Format:
+            {"type": "steps", "title": "string", "steps": ["step1", "step2", ...], "description": "string"}
+        """,
+    },
+    "comparison_info": {
+        "tool": GenerateComparisonInfographic,
+        "name": "comparison",
+        "instructions": """
+            Create a comparative analysis from the blog content, with equal numbers of points on both sides.
+            Format:
+            {"type": "comparison", "title": "string", "left_side": ["point1", ...], "right_side": ["point1", ...],
+             "left_title": "string", "right_title": "string", "comparison_aspect": "string",
+             "description": "string", "conclusion": "string"}
+        """,
+    },
+    "stats_info": {
+        "tool": GenerateStatisticsInfographic,
+        "name": "statistics",
+        "instructions": """
+            Highlight at least 3 key statistics from the blog content, with values and labels.
+            Format:
+            {"title": "string", "description": "string", "stats": [{"value": "string", "label": "string"}, ...]}
+        """,
+    },
+    "bars_info": {
+        "tool": GenerateBarChartInfographic,
+        "name": "bar chart",
+        "instructions": """
+            Visualize percentage-based data from the blog content with at least 2 bars.
+            All values must be percentages between 0 and 100.
+            Format:
+            {"title": "string", "stats": [{"value": "number (0-100)", "label": "string"}, ...]}
+        """,
+    },
+}
+
+class InfographicTask(TypedDict):
     """
-    Infographics Generator Node
-    
-    Handles the generation of infographics based on blog content:
-    - Analyzes blog content for key points
-    - Creates different types of infographics (quotes, steps, comparisons)
-    - Manages infographics state
+    The input of one infographic branch.
     """
-    # Configure state emission for infographics
-    config = copilotkit_customize_config(
-        config,
-        emit_intermediate_state=[{
-            "state_key": "infographics",
-            "tool": "GenerateInfographic",
-            "tool_argument": "infographics",
-        }]
-    )
+    state_key: str
+    model: str
+    blog_post: BlogPost
 
-    # Initialize or get existing state
-    state["infographics"] = state.get("infographics", [])
-    state["logs"] = state.get("logs", [])
-    state["messages"] = state.get("messages", [])
+def wrote_blog_post(state: AgentState) -> bool:
+    """
+    Whether the latest model response in the conversation wrote or edited the blog post.
+    """
+    for message in reversed(state.get("messages", [])):
+        if isinstance(message, AIMessage):
+            return any(tool_call["name"] in ("WriteBlogPost", "EditBlogPost") for tool_call in message.tool_calls)
+        if not isinstance(message, ToolMessage):
+            return False
+    return False
+
+def fan_out_infographics(state: AgentState) -> List[Send]:
+    """
+    Start one infographic branch per infographic type.
+    """
+    return [
+        Send("infographic_node", {
+            "state_key": state_key,
+            "model": state.get("model", ""),
+            "blog_post": state["blog_post"],
+        })
+        for state_key in INFOGRAPHICS
+    ]
 
-    # Get blog content for analysis
-    blog_post = state.get("blog_post", {"title": "", "content": ""})
-    
-    # Invoke the model with infographic generation tool
-    response = await get_model(state).bind_tools(
-        [GenerateInfographic],
-    ).ainvoke([
+async def infographic_node(task: InfographicTask, config: RunnableConfig):
+    """
+    Generate a single infographic from the blog content.
+    """
+    spec = INFOGRAPHICS[task["state_key"]]
+    response = await invoke_model(cast(AgentState, task), [
         SystemMessage(
             content=f"""
-            You are an expert infographic designer. Your role is to analyze the blog content and create compelling infographics that enhance the message.
-            
-            Create infographics in these formats based on the content:
-            
-            For quotes:
-            {{
-                "type": "quote",
-                "quote": "The quote text",
-                "source": "Quote source",
-                "context": "Context information"
-            }}
-            
-            For steps:
-            {{
-                "type": "steps",
-                "title": "Process title",
-                "steps": ["step1", "step2", ...],
-                "description": "Process description"
-            }}
-            
-            For comparisons:
-            {{
-                "type": "comparison",
-                "title": "Comparison title",
-                "left_side": ["point1", "point2", ...],
-                "right_side": ["point1", "point2", ...],
-                "comparison_aspect": "What's being compared"
-            }}
-
-            Current blog content:
-            Title: {blog_post["title"]}
-            Content: {blog_post["content"]}
-            
-            Existing Infographics: {len(state["infographics"])}
+            You are an expert infographic designer. Create a {spec["name"]} infographic
+            that enhances the message of the following blog post.
+            {spec["instructions"]}
+            Blog Title: {task["blog_post"].get("title", "")}
+            Blog Content: {task["blog_post"].get("content", "")}
             """
         ),
-        *state["messages"],
-    ], config)
+        HumanMessage(content=f"Generate the {spec['name']} infographic."),
+    ], config, [spec["tool"]], tool_choice=spec["tool"].name)
 
     ai_message = cast(AIMessage, response)
-    updated_messages = list(state["messages"])
-    updated_messages.append(ai_message)
+    if not ai_message.tool_calls:
+        return {}
+    return {task["state_key"]: ai_message.tool_calls[0]["args"][task["state_key"]]}
 
-    # Handle infographic generation
-    if ai_message.tool_calls:
-        for tool_call in ai_message.tool_calls:
-            if tool_call["name"] == "GenerateInfographic":
-                new_infographic = tool_call["args"]["infographics"]
-                state["infographics"].append(new_infographic)
-                
-                tool_message = ToolMessage(
-                    tool_call_id=tool_call["id"],
-                    content=f"Generated {new_infographic['type']} infographic successfully."
-                )
-                updated_messages.append(tool_message)
-                
-                state["logs"].append({
-                    "message": f"Generated {new_infographic['type']} infographic: {new_infographic.get('title', '')}",
-                    "done": False
-                })
-
-    return {
-        "infographics": state["infographics"],
-        "logs": state["logs"],
-        "messages": updated_messages
-    }
\ No newline at end of file
+async def infographics_join_node(state: AgentState, config: RunnableConfig): # pylint: disable=unused-argument
+    """
+    Log the generated infographics once every branch has finished.
+    """
+    logs = list(state.get("logs", []))
+    for state_key, spec in INFOGRAPHICS.items():
+        info = state.get(state_key) or {}
+        title = info.get("title") or info.get("quote", "")
+        logs.append({
+            "message": f"Generated {spec['name']} infographic: {title}",
+            "done": True
+        })
+    return {"logs": logs}
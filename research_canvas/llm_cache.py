@@ -0,0 +1,169 @@
+"""
+Exact-match cache for model responses.
+
+Opt in with LLM_CACHE=true. Responses are keyed on the model and its
+parameters, a hash of the bound tool schemas and the normalized messages,
+so a retry or regenerate that sends the same conversation to the same
+temperature-0 model is answered from the cache. Hits are replayed through a
+streaming model, so callbacks such as CopilotKit's intermediate state
+emission see the same token stream as a live response. Replayed responses
+get a new message id and are marked with response_metadata["llm_cache"] =
+"hit", so their usage isn't counted as provider tokens.
+
+LLM_CACHE_BACKEND follows CACHE_BACKEND unless set, so several server
+workers share the cache.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    message_to_dict,
+    messages_from_dict,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from research_canvas import metrics
+from research_canvas.cache import CACHE_BACKEND, get_cache
+
+LLM_CACHE = os.getenv("LLM_CACHE", "false").lower() == "true"
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", CACHE_BACKEND)
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(60 * 60)))
+_REPLAY_CHUNK_CHARS = 16
+
+_TOOL_HASHES: Dict[Tuple[int, ...], Tuple[Tuple[Any, ...], str]] = {}
+
+def _tools_hash(tools: Sequence[Any]) -> str:
+    key = tuple(id(tool) for tool in tools)
+    entry = _TOOL_HASHES.get(key)
+    if entry is None:
+        schemas = json.dumps([convert_to_openai_tool(tool) for tool in tools], sort_keys=True)
+        entry = (tuple(tools), hashlib.sha256(schemas.encode("utf-8")).hexdigest())
+        _TOOL_HASHES[key] = entry
+    return entry[1]
+
+def _normalize(message: BaseMessage) -> Dict[str, Any]:
+    """Keep what the model sees, drop ids, metadata and whitespace differences."""
+    if isinstance(message.content, str):
+        content: Any = " ".join(message.content.split())
+    else:
+        content = message.content
+    normalized: Dict[str, Any] = {"type": message.type, "content": content}
+    if isinstance(message, AIMessage) and message.tool_calls:
+        normalized["tool_calls"] = [
+            {"name": tool_call["name"], "args": tool_call["args"]} for tool_call in message.tool_calls
+        ]
+    return normalized
+
+def cache_key(model: Hashable, tools: Sequence[Any], bind_kwargs: Dict[str, Any], messages: Sequence[BaseMessage]) -> str:
+    """
+    Build the cache key for a model call.
+    """
+    payload = json.dumps(
+        {
+            "model": repr(model),
+            "tools": _tools_hash(tools),
+            "bind": bind_kwargs,
+            "messages": [_normalize(message) for message in messages],
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Chat model that streams back a recorded response.
+    """
+    message: AIMessage
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _replayed(self) -> AIMessage:
+        return self.message.model_copy(
+            update={"response_metadata": {**self.message.response_metadata, "llm_cache": "hit"}}
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._replayed())])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._replayed())])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        content = self.message.content
+        if isinstance(content, str):
+            for start in range(0, len(content), _REPLAY_CHUNK_CHARS):
+                yield ChatGenerationChunk(
+                    message=AIMessageChunk(content=content[start:start + _REPLAY_CHUNK_CHARS])
+                )
+        for index, tool_call in enumerate(self.message.tool_calls):
+            args = json.dumps(tool_call["args"])
+            for start in range(0, max(len(args), 1), _REPLAY_CHUNK_CHARS):
+                first = start == 0
+                yield ChatGenerationChunk(message=AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[{
+                        "name": tool_call["name"] if first else None,
+                        "id": tool_call["id"] if first else None,
+                        "args": args[start:start + _REPLAY_CHUNK_CHARS],
+                        "index": index,
+                    }],
+                ))
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="",
+            usage_metadata=self.message.usage_metadata,
+            response_metadata={**self.message.response_metadata, "llm_cache": "hit"},
+        ))
+
+
+async def cached_ainvoke(
+    runnable: Runnable,
+    model: Hashable,
+    tools: Sequence[Any],
+    bind_kwargs: Dict[str, Any],
+    messages: List[BaseMessage],
+    config: Optional[RunnableConfig] = None,
+    schedule: Optional[Callable[[Callable[[], Awaitable[Any]]], Awaitable[Any]]] = None,
+) -> AIMessage:
+    """
+    Invoke `runnable`, answering from the cache when an identical call was made before.
+    Calls that reach the provider are passed through `schedule` when given.
+    """
+    async def call():
+        if schedule is None:
+            return await runnable.ainvoke(messages, config)
+        return await schedule(lambda: runnable.ainvoke(messages, config))
+
+    if not LLM_CACHE:
+        return await call()
+
+    cache = get_cache("llm", backend=LLM_CACHE_BACKEND)
+    key = cache_key(model, tools, bind_kwargs, messages)
+    cached = await asyncio.to_thread(cache.get, key)
+    if cached is not None:
+        metrics.inc("llm_cache_requests_total", result="hit")
+        message = messages_from_dict([json.loads(cached)])[0]
+        # without an id a new one is assigned, add_messages would replace the original message
+        message = message.model_copy(update={"id": None})
+        return await ReplayChatModel(message=message).ainvoke(messages, config)
+
+    metrics.inc("llm_cache_requests_total", result="miss")
+    response = await call()
+    if isinstance(response, AIMessage) and not response.invalid_tool_calls:
+        await asyncio.to_thread(
+            cache.set, key, json.dumps(message_to_dict(response)), LLM_CACHE_TTL
+        )
+    return response
@@ -0,0 +1,236 @@
+"""
+Process-wide counters, gauges and histograms, rendered in the Prometheus text format.
+
+With several server workers, a scrape only reaches one of them. When
+METRICS_MULTIPROC_DIR is set, each worker writes its metrics to a file of
+its own there every METRICS_FLUSH_INTERVAL seconds, and render() merges the
+files of all workers, like prometheus_client's multiprocess mode: counters
+and histograms are summed, including those of workers that have exited, and
+gauges get a pid label and are only kept for live workers. Other workers'
+values are up to METRICS_FLUSH_INTERVAL old.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+logger = logging.getLogger(__name__)
+
+# histogram buckets, suited to latencies in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+_LOCK = threading.Lock()
+_COUNTERS: Dict[Tuple[str, Labels], float] = defaultdict(float)
+_GAUGES: Dict[Tuple[str, Labels], float] = {}
+_HISTOGRAMS: Dict[Tuple[str, Labels], Dict[str, Any]] = {}
+
+# a directory shared by the server workers, demo.main sets one up when there are several
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def inc(name: str, value: float = 1, **labels: str):
+    """
+    Increment a counter.
+    """
+    with _LOCK:
+        _COUNTERS[(name, _labels(labels))] += value
+
+def set_gauge(name: str, value: float, **labels: str):
+    """
+    Set a gauge to the current value, e.g. a queue depth.
+    """
+    with _LOCK:
+        _GAUGES[(name, _labels(labels))] = value
+
+def observe(name: str, value: float, **labels: str):
+    """
+    Record a value in a histogram, e.g. a latency in seconds.
+    """
+    with _LOCK:
+        histogram = _HISTOGRAMS.setdefault(
+            (name, _labels(labels)),
+            {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(BUCKETS)}
+        )
+        histogram["count"] += 1
+        histogram["sum"] += value
+        histogram["max"] = max(histogram["max"], value)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+
+def get_counter(name: str, **labels: str) -> float:
+    """
+    Get the current value of a counter.
+    """
+    with _LOCK:
+        return _COUNTERS.get((name, _labels(labels)), 0)
+
+@contextmanager
+def timer(name: str, **labels: str) -> Iterator[None]:
+    """
+    Observe the wall time of the block in seconds.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+def timed_node(node: str, func: Callable) -> Callable:
+    """
+    Wrap an async graph node to record its wall time in node_duration_seconds.
+    The signature is kept, so LangGraph still passes the config.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result = await func(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            duration = time.perf_counter() - start
+            observe("node_duration_seconds", duration, node=node, status=status)
+            logger.info(
+                "node finished",
+                extra={"event": "node", "node": node, "status": status, "duration": round(duration, 4)},
+            )
+    return wrapper
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def _snapshot() -> Tuple[list, list, list]:
+    with _LOCK:
+        return (
+            sorted(_COUNTERS.items()),
+            sorted(_GAUGES.items()),
+            sorted(
+                ((key, {**value, "buckets": list(value["buckets"])}) for key, value in _HISTOGRAMS.items()),
+                key=lambda item: item[0],
+            ),
+        )
+
+def flush():
+    """
+    Write the metrics of this process to METRICS_MULTIPROC_DIR.
+    """
+    if not METRICS_MULTIPROC_DIR:
+        return
+    path = os.path.join(METRICS_MULTIPROC_DIR, f"{os.getpid()}.json")
+    # replaced in one step, so readers never see a partial file
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(_snapshot(), file)
+    os.replace(f"{path}.tmp", path)
+
+async def flush_periodically():
+    """
+    Flush every METRICS_FLUSH_INTERVAL seconds until cancelled, then once more.
+    """
+    try:
+        while True:
+            await asyncio.sleep(METRICS_FLUSH_INTERVAL)
+            flush()
+    finally:
+        flush()
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _merged() -> Tuple[list, list, list]:
+    """The metrics of every worker that wrote to METRICS_MULTIPROC_DIR."""
+    flush()
+    counters: Dict[Tuple[str, Labels], float] = defaultdict(float)
+    gauges: Dict[Tuple[str, Labels], float] = {}
+    histograms: Dict[Tuple[str, Labels], Dict[str, Any]] = {}
+    for filename in os.listdir(METRICS_MULTIPROC_DIR):
+        pid, extension = os.path.splitext(filename)
+        if extension != ".json" or not pid.isdigit():
+            continue
+        try:
+            with open(os.path.join(METRICS_MULTIPROC_DIR, filename), encoding="utf-8") as file:
+                worker_counters, worker_gauges, worker_histograms = json.load(file)
+        except (OSError, ValueError):
+            logger.warning("unreadable metrics file %s", filename)
+            continue
+        for (name, labels), value in worker_counters:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        if _alive(int(pid)):
+            for (name, labels), value in worker_gauges:
+                gauges[(name, _labels({**dict(labels), "pid": pid}))] = value
+        for (name, labels), value in worker_histograms:
+            histogram = histograms.setdefault(
+                (name, tuple(map(tuple, labels))),
+                {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(BUCKETS)}
+            )
+            histogram["count"] += value["count"]
+            histogram["sum"] += value["sum"]
+            histogram["max"] = max(histogram["max"], value["max"])
+            histogram["buckets"] = [a + b for a, b in zip(histogram["buckets"], value["buckets"])]
+    return sorted(counters.items()), sorted(gauges.items()), sorted(histograms.items(), key=lambda item: item[0])
+
+def render() -> str:
+    """
+    Render every metric in the Prometheus text exposition format, of all workers
+    when METRICS_MULTIPROC_DIR is set.
+    """
+    counters, gauges, histograms = _merged() if METRICS_MULTIPROC_DIR else _snapshot()
+
+    lines: List[str] = []
+    typed = set()
+    for (name, labels), value in counters:
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    for (name, labels), value in gauges:
+        if name not in typed:
+            lines.append(f"# TYPE {name} gauge")
+            typed.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    for (name, labels), histogram in histograms:
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        for bound, count in zip(BUCKETS, histogram["buckets"]):
+            lines.append(
+                f"{name}_bucket{_format_labels(labels, (('le', _format_value(bound)),))} {count}"
+            )
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+    return "\n".join(lines) + "\n"
@@ -1,40 +1,304 @@
 """
 This module provides a function to get a model based on the configuration.
+
+Models are created once per (provider, params) and reused, so their HTTP
+connection pools survive across turns. Tool bindings are cached per tool set.
 """
+import asyncio
 import os
-from typing import cast, Any
+import logging
+import threading
+import time
+from typing import cast, Any, Dict, Hashable, List, Optional, Sequence, Tuple
+from langchain_core.callbacks import AsyncCallbackHandler
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage
+from langchain_core.runnables import Runnable, RunnableConfig, ensure_config
+from langchain_core.runnables.config import merge_configs
+from research_canvas import metrics, scheduler
+from research_canvas.hedge import LATENCIES, MODEL_FALLBACK, MODEL_HEDGE, hedged
+from research_canvas.history import message_tokens
 from research_canvas.state import AgentState
+from research_canvas.llm_cache import cached_ainvoke
 
-def get_model(state: AgentState) -> BaseChatModel:
-    """
-    Get a model based on the environment variable.
-    """
+logger = logging.getLogger(__name__)
+
+# Retries are left to the scheduler, which spreads them out and honors Retry-After
+_MODEL_PARAMS: Dict[str, Dict[str, Any]] = {
+    "openai": {
+        "temperature": 0,
+        "model": "gpt-4o-mini",
+        "max_retries": 0,
+    },
+    "anthropic": {
+        "temperature": 0,
+        "model_name": "claude-3-5-sonnet-20240620",
+        "timeout": None,
+        "stop": None,
+        "max_retries": 0,
+    },
+    "google_genai": {
+        "temperature": 0,
+        "model": "gemini-1.5-pro",
+        "max_retries": 0,
+    },
+}
+
+# seconds before a model request is abandoned, 0 to wait as long as the provider takes
+MODEL_TIMEOUT = float(os.getenv("MODEL_TIMEOUT", "0"))
+
+# nodes whose model calls wait behind interactive turns
+BACKGROUND_NODES = {"infographic_node"}
+# tokens budgeted for a response until its real usage is known
+_OUTPUT_TOKENS_ESTIMATE = 1000
 
-    state_model = state.get("model")
-    model = os.getenv("MODEL", state_model)
+# Parameters of the smaller tiers, on top of the provider's defaults. The model
+# name of a tier can be overridden with MODEL_NAME_<TIER>, e.g. MODEL_NAME_SMALL.
+_TIER_PARAMS: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "small": {
+        "openai": {"model": "gpt-4o-mini"},
+        "anthropic": {"model_name": "claude-3-5-haiku-20241022"},
+        "google_genai": {"model": "gemini-1.5-flash"},
+    },
+}
 
-    print(f"Using model: {model}")
+_MODELS: Dict[Hashable, BaseChatModel] = {}
+_BOUND_MODELS: Dict[Hashable, Tuple[Tuple[Any, ...], Runnable]] = {}
+_LOCK = threading.RLock()
 
-    if model == "openai":
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _create_model(provider: str, params: Dict[str, Any]) -> BaseChatModel:
+    if provider == "openai":
         from langchain_openai import ChatOpenAI
-        return ChatOpenAI(temperature=0, model="gpt-4o-mini")
-                # return ChatOpenAI(temperature=0, model="gpt-3.5-turbo-0125")
+        return ChatOpenAI(**params)
 
-    if model == "anthropic":
+    if provider == "anthropic":
         from langchain_anthropic import ChatAnthropic
-        return ChatAnthropic(
-            temperature=0,
-            model_name="claude-3-5-sonnet-20240620",
-            timeout=None,
-            stop=None
-        )
-    if model == "google_genai":
+        return ChatAnthropic(**params)
+
+    if provider == "google_genai":
         from langchain_google_genai import ChatGoogleGenerativeAI
         return ChatGoogleGenerativeAI(
-            temperature=0,
-            model="gemini-1.5-pro",
+            **params,
             api_key=cast(Any, os.getenv("GOOGLE_API_KEY")) or None
         )
 
     raise ValueError("Invalid model specified")
+
+def get_model_name(state: AgentState) -> str:
+    """
+    Get the configured model provider, the environment variable takes precedence.
+    """
+    return cast(str, os.getenv("MODEL", state.get("model")))
+
+def _tier_params(provider: str, tier: str) -> Dict[str, Any]:
+    params = {**_MODEL_PARAMS[provider], **_TIER_PARAMS.get(tier, {}).get(provider, {})}
+    if MODEL_TIMEOUT:
+        params["timeout"] = MODEL_TIMEOUT
+    name = os.getenv(f"MODEL_NAME_{tier.upper()}")
+    if name:
+        params["model_name" if "model_name" in params else "model"] = name
+    return params
+
+def _model_key(
+    state: AgentState, params: Dict[str, Any], tier: str = "default", provider: Optional[str] = None
+) -> Tuple[str, Dict[str, Any], Hashable]:
+    provider = provider or get_model_name(state)
+    if provider not in _MODEL_PARAMS:
+        raise ValueError("Invalid model specified")
+    params = {**_tier_params(provider, tier), **params}
+    return provider, params, (provider, _freeze(params))
+
+def get_model(
+    state: AgentState, tier: str = "default", provider: Optional[str] = None, **params: Any
+) -> BaseChatModel:
+    """
+    Get a model based on the environment variable, or of `provider` when given.
+    `tier` picks the model size: "default", or "small" for routing and trivial turns.
+    Keyword arguments override the provider's default parameters.
+    """
+    provider, params, key = _model_key(state, params, tier, provider)
+    model = _MODELS.get(key)
+    if model is None:
+        with _LOCK:
+            model = _MODELS.get(key)
+            if model is None:
+                logger.info("Creating model client: %s %s", provider, params)
+                model = _create_model(provider, params)
+                _MODELS[key] = model
+    return model
+
+def get_model_with_tools(
+    state: AgentState, tools: Sequence[Any], tier: str = "default", provider: Optional[str] = None, **kwargs: Any
+) -> Runnable:
+    """
+    Get the model of `tier` with `tools` bound, converting the tool schemas once per tool set.
+    Keyword arguments are passed to `bind_tools`, e.g. `tool_choice`.
+    """
+    _, _, model_key = _model_key(state, {}, tier, provider)
+    # the cache entry keeps the tools alive, so their ids can't be reused
+    key = (model_key, tuple(id(tool) for tool in tools), _freeze(kwargs))
+    entry = _BOUND_MODELS.get(key)
+    if entry is None:
+        with _LOCK:
+            entry = _BOUND_MODELS.get(key)
+            if entry is None:
+                entry = (tuple(tools), get_model(state, tier, provider).bind_tools(list(tools), **kwargs))
+                _BOUND_MODELS[key] = entry
+    return entry[1]
+
+class _FirstTokenTimer(AsyncCallbackHandler):
+    """
+    Records when the first streamed token of a model call arrives, and sets `event`.
+    """
+    def __init__(self, event: Optional[asyncio.Event] = None):
+        self.first_token: Optional[float] = None
+        self.event = event
+
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+            if self.event is not None:
+                self.event.set()
+
+def _for_provider(messages: List[BaseMessage], provider: str) -> List[BaseMessage]:
+    """
+    Adapt messages built for the primary provider, i.e. drop Anthropic cache breakpoints for others.
+    """
+    if provider == "anthropic":
+        return messages
+    return [
+        SystemMessage(content="".join(block.get("text", "") for block in message.content))
+        if isinstance(message, SystemMessage) and isinstance(message.content, list) else message
+        for message in messages
+    ]
+
+async def invoke_model(
+    state: AgentState,
+    messages: List[BaseMessage],
+    config: Optional[RunnableConfig] = None,
+    tools: Sequence[Any] = (),
+    tier: str = "default",
+    **kwargs: Any,
+) -> AIMessage:
+    """
+    Call the configured model of `tier`, with `tools` bound if given. All model calls go
+    through here so they share the response cache (LLM_CACHE), the rate-limit budgets
+    of research_canvas.scheduler, failover and hedging (MODEL_FALLBACK, MODEL_HEDGE)
+    and instrumentation.
+    """
+    primary = get_model_name(state)
+    config = ensure_config(config)
+    node = config.get("metadata", {}).get("langgraph_node", "unknown")
+    estimate = sum(message_tokens(message) for message in messages) + _OUTPUT_TOKENS_ESTIMATE
+    priority = scheduler.BACKGROUND if node in BACKGROUND_NODES else scheduler.INTERACTIVE
+    timers: Dict[str, _FirstTokenTimer] = {}
+
+    def attempt(provider: str):
+        async def run(first_token: asyncio.Event) -> AIMessage:
+            _, params, model_key = _model_key(state, {}, tier, provider)
+            runnable = (
+                get_model_with_tools(state, tools, tier, provider, **kwargs) if tools
+                else get_model(state, tier, provider)
+            )
+            budget = scheduler.get_budget(provider, params.get("model") or params.get("model_name", ""))
+            timers[provider] = _FirstTokenTimer(first_token)
+
+            def schedule(call):
+                # once tokens reached the UI, a retry would show them twice
+                return scheduler.run(budget, call, estimate, priority, usage=_total_tokens, streamed=first_token)
+
+            return cast(AIMessage, await cached_ainvoke(
+                runnable, model_key, tools, kwargs, _for_provider(messages, provider),
+                merge_configs(config, {"callbacks": [timers[provider]]}), schedule,
+            ))
+        return run
+
+    fallback = MODEL_FALLBACK if MODEL_FALLBACK and MODEL_FALLBACK != primary else None
+    latency_key = (primary, tier, node)
+    start = time.perf_counter()
+    status = "error"
+    provider = primary
+    try:
+        response, winner = await hedged(
+            attempt(primary), attempt(fallback) if fallback else None,
+            LATENCIES.deadline(latency_key), hedge=MODEL_HEDGE, node=node, provider=primary,
+        )
+        status = "ok"
+        if winner != "primary":
+            provider = cast(str, fallback)
+            metrics.inc("model_backup_wins_total", node=node, provider=primary, fallback=provider)
+    finally:
+        duration = time.perf_counter() - start
+        metrics.observe(
+            "model_call_duration_seconds", duration, node=node, provider=provider, tier=tier, status=status
+        )
+
+    # only streamed calls have a first token, e.g. when CopilotKit forwards the stream
+    timer = timers.get(provider)
+    ttft = None if timer is None or timer.first_token is None else timer.first_token - start
+    if ttft is not None:
+        metrics.observe("model_time_to_first_token_seconds", ttft, node=node, provider=provider)
+    # a hedge won because the primary took at least this long, leaving it out would shrink the deadline
+    if winner in ("primary", "hedge"):
+        LATENCIES.record(latency_key, duration if ttft is None else ttft)
+    log_usage(node, response, provider=provider, tier=tier, duration=round(duration, 4),
+              ttft=None if ttft is None else round(ttft, 4))
+    return response
+
+def cacheable_system_message(state: AgentState, static: str, dynamic: str) -> SystemMessage:
+    """
+    Build a system message from a byte-stable prefix and a per-turn suffix.
+    Providers with automatic prefix caching (OpenAI) only need the static part first;
+    for Anthropic the end of the prefix is marked as a cache breakpoint, which also
+    covers the tool definitions sent before the system prompt.
+    """
+    if get_model_name(state) == "anthropic":
+        return SystemMessage(content=[
+            {"type": "text", "text": static, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": dynamic},
+        ])
+    return SystemMessage(content=static + dynamic)
+
+def get_usage(message: AIMessage) -> Dict[str, int]:
+    """
+    Get the input, output and cache-read token counts reported for a response.
+    """
+    usage = cast(Dict[str, Any], message.usage_metadata or {})
+    details = usage.get("input_token_details") or {}
+    cached = details.get("cache_read")
+    if cached is None:
+        metadata = message.response_metadata or {}
+        anthropic_usage = metadata.get("usage") or {}
+        openai_usage = (metadata.get("token_usage") or {}).get("prompt_tokens_details") or {}
+        cached = anthropic_usage.get("cache_read_input_tokens") or openai_usage.get("cached_tokens")
+    return {
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "cached_tokens": cached or 0,
+    }
+
+def _total_tokens(message: AIMessage) -> int:
+    usage = get_usage(message)
+    return usage["input_tokens"] + usage["output_tokens"]
+
+def log_usage(node: str, message: AIMessage, **fields: Any):
+    """
+    Count and log the token usage of a model call, including prompt-cache hits.
+    Responses replayed from the response cache cost nothing, their usage is counted
+    in llm_cache_saved_tokens_total instead. Extra `fields` are added to the log record.
+    """
+    usage = get_usage(message)
+    replayed = (message.response_metadata or {}).get("llm_cache") == "hit"
+    for kind, tokens in usage.items():
+        metrics.inc(
+            "llm_cache_saved_tokens_total" if replayed else "model_tokens_total",
+            tokens, node=node, kind=kind.removesuffix("_tokens"),
+        )
+    logger.info("model call", extra={"event": "model", "node": node, **usage, **fields, "llm_cache_hit": replayed})
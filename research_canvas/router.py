@@ -0,0 +1,180 @@
+"""
+Turn routing for chat_node.
+
+With ROUTER_MODE=rules or ROUTER_MODE=model, each chat turn is first
+classified into an intent, and chat_node only binds the tools and prompt
+section of that intent, on the model tier that fits it. Rules look at the
+last message: tool results and short, unambiguous requests are routed
+without a model call. With ROUTER_MODE=model the turns the rules can't
+decide are classified by the small model, otherwise they get the full
+prompt with every tool, like with ROUTER_MODE=off.
+"""
+
+import os
+import re
+from typing import List, Literal, Optional, cast
+
+from langchain.tools import tool
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from copilotkit.langchain import copilotkit_customize_config
+
+from research_canvas import metrics
+from research_canvas.state import AgentState
+from research_canvas.model import invoke_model
+from research_canvas.history import compact_history
+
+ROUTER_MODE = os.getenv("ROUTER_MODE", "off")
+# how many recent messages the router model sees, and how much of each
+ROUTER_MESSAGES = int(os.getenv("ROUTER_MESSAGES", "4"))
+_ROUTER_MESSAGE_CHARS = 500
+
+Intent = Literal["search", "write", "edit", "infographics", "reply", "full"]
+
+_INTENTS = ("search", "write", "edit", "infographics", "reply")
+
+# a short acknowledgement, at most two words after it, is a reply when nothing is asked of the assistant
+_REPLY = re.compile(
+    r"^\W*(hi|hello|hey|thanks|thank you|thx|ok|okay|great|cool|nice|yes|no|sure|got it|perfect)(\W+\w+){0,2}\W*$",
+    re.IGNORECASE,
+)
+_SEARCH = re.compile(
+    r"^\W*(please\s+)?(search|look up|find|research)\b|\bsearch (for|the web)\b|\b(sources|references)\b",
+    re.IGNORECASE,
+)
+# words that ask the assistant to act, e.g. confirming what it proposed: "ok go ahead", "yes search more"
+_ACTION = re.compile(
+    r"\b(go|do|proceed|continue|start|write|draft|create|generate|make|search|find|look|research|edit|"
+    r"change|fix|add|remove|update|more|again|please)\b",
+    re.IGNORECASE,
+)
+# the assistant asked a question or offered to do something, so a "yes" or "sure" may confirm it
+_PROPOSAL = re.compile(
+    r"\?|\b(shall i|should i|would you like|do you want|want me to|let me know|i can|i could|i'll|i will)\b",
+    re.IGNORECASE,
+)
+_INFOGRAPHICS = re.compile(r"\b(infographics?|chart|graph|visuali[sz]e|statistics|stats)\b", re.IGNORECASE)
+_WRITE = re.compile(r"\b(write|draft|create|generate|start)\b.*\b(post|blog|article)\b", re.IGNORECASE)
+_EDIT = re.compile(
+    r"\b(fix|change|edit|revise|rename|retitle|shorten|expand|rephrase|reword|add|remove|delete|replace|"
+    r"update|typo|title|section|paragraph|intro|conclusion)\b",
+    re.IGNORECASE,
+)
+
+@tool
+def RouteTurn(intent: Literal["search", "write", "edit", "infographics", "reply"]):
+    """Choose what the assistant has to do next."""
+    pass
+
+_ROUTER_INSTRUCTIONS = """
+You route the turns of a blog writing assistant. Pick the intent of the user's latest request:
+- search: find sources or references, without writing yet
+- write: write a new blog post, or rewrite most of it
+- edit: change parts of the existing blog post
+- infographics: create or change infographics (quote, steps, comparison, statistics, bar chart)
+- reply: answer a question or chat, no changes to the post
+"""
+
+def _text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else str(message.content)
+
+def _last_tool_calls(messages: List[BaseMessage]) -> List[str]:
+    for message in reversed(messages):
+        if isinstance(message, AIMessage):
+            return [tool_call["name"] for tool_call in message.tool_calls]
+    return []
+
+def _last_human(messages: List[BaseMessage]) -> Optional[HumanMessage]:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return message
+    return None
+
+def _previous_ai(messages: List[BaseMessage]) -> Optional[str]:
+    """The text of the assistant message the last user message answers."""
+    seen_human = False
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            seen_human = True
+        elif seen_human and isinstance(message, AIMessage):
+            return _text(message)
+    return None
+
+def classify_rules(state: AgentState, inline_infographics: bool = True) -> Optional[Intent]:
+    """
+    Classify the turn from the last message, or return None when the rules can't tell.
+    """
+    messages = state.get("messages", [])
+    if not messages:
+        return None
+    last = messages[-1]
+    has_post = bool((state.get("blog_post") or {}).get("content"))
+
+    if isinstance(last, ToolMessage):
+        tools = _last_tool_calls(messages)
+        if "WriteBlogPost" in tools:
+            # inline, the infographics are made by the next chat turn
+            return "infographics" if inline_infographics else "reply"
+        if "Search" in tools:
+            # carry on with what the user asked for, only searching needs no further tools
+            human = _last_human(messages)
+            intent = classify_text(_text(human), has_post, _previous_ai(messages)) if human is not None else None
+            return "reply" if intent == "search" else intent
+        return "reply"
+
+    if isinstance(last, HumanMessage):
+        return classify_text(_text(last), has_post, _previous_ai(messages))
+    return None
+
+def classify_text(text: str, has_post: bool, previous: Optional[str] = None) -> Optional[Intent]:
+    """
+    Classify a user request by keywords, None when it is ambiguous. previous is the
+    assistant message it answers: an acknowledgement of a question or proposal may
+    confirm it, and is left to the full path rather than the reply worker, which
+    can't call tools.
+    """
+    text = text.strip()
+    if _WRITE.search(text):
+        return "write"
+    if _SEARCH.search(text):
+        return "search"
+    if has_post and _INFOGRAPHICS.search(text):
+        return "infographics"
+    if has_post and _EDIT.search(text):
+        return "edit"
+    if _REPLY.match(text) and not _ACTION.search(text) and not (previous and _PROPOSAL.search(previous)):
+        return "reply"
+    return None
+
+async def route_turn(state: AgentState, config: RunnableConfig, inline_infographics: bool = True) -> Intent:
+    """
+    The intent of this chat turn, "full" when routing is off or undecided.
+    """
+    if ROUTER_MODE not in ("rules", "model"):
+        return "full"
+    intent = classify_rules(state, inline_infographics)
+    source = "rules"
+    if intent is None and ROUTER_MODE == "model":
+        intent = await _classify_model(state, config)
+        source = "model"
+    intent = intent or "full"
+    metrics.inc("router_decisions_total", intent=intent, source=source)
+    return intent
+
+async def _classify_model(state: AgentState, config: RunnableConfig) -> Optional[Intent]:
+    # the routing call is internal, don't stream it to the UI
+    config = copilotkit_customize_config(config, emit_messages=False, emit_tool_calls=False)
+    # a transcript, so the slice can't separate tool results from their tool calls
+    transcript = "\n".join(
+        f"{message.type}: {_text(message)[:_ROUTER_MESSAGE_CHARS]}"
+        + "".join(f" [called {name}]" for name in _last_tool_calls([message]))
+        for message in compact_history(state.get("messages", []))[-ROUTER_MESSAGES:]
+    )
+    response = await invoke_model(state, [
+        SystemMessage(content=_ROUTER_INSTRUCTIONS),
+        HumanMessage(content=f"Conversation:\n{transcript}"),
+    ], config, [RouteTurn], tier="small", tool_choice="RouteTurn")
+    for tool_call in cast(AIMessage, response).tool_calls:
+        if tool_call["args"].get("intent") in _INTENTS:
+            return tool_call["args"]["intent"]
+    return None
@@ -0,0 +1,263 @@
+"""
+Admission scheduler for model and search calls.
+
+Every provider call goes through `run`, which admits it against token-bucket
+budgets per provider and model (requests and estimated tokens per minute,
+RATE_LIMIT_RPM_<PROVIDER> and RATE_LIMIT_TPM_<PROVIDER>, unlimited when unset).
+Calls that have to wait queue by priority, so interactive chat turns go ahead
+of background infographic generation, and a full queue rejects new calls
+right away instead of letting latency grow without bound. Rate-limit and
+transient errors are retried with jittered backoff that respects Retry-After,
+and a rate limit pauses the whole budget so waiting calls don't pile on.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from research_canvas import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "200"))
+SCHEDULER_MAX_RETRIES = int(os.getenv("SCHEDULER_MAX_RETRIES", "3"))
+SCHEDULER_RETRY_BASE = float(os.getenv("SCHEDULER_RETRY_BASE", "0.5"))
+SCHEDULER_RETRY_MAX = float(os.getenv("SCHEDULER_RETRY_MAX", "30"))
+# providers enforce per-minute limits over shorter windows, so only allow bursts this long
+SCHEDULER_BURST_SECONDS = float(os.getenv("SCHEDULER_BURST_SECONDS", "1"))
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+_RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+class SchedulerOverloaded(RuntimeError):
+    """
+    Raised when a budget's queue is full and a call is rejected.
+    """
+
+def get_rate_limits(provider: str) -> Tuple[float, float]:
+    """
+    Requests and tokens per minute allowed for `provider`, 0 for unlimited.
+    """
+    name = provider.upper()
+    return (
+        float(os.getenv(f"RATE_LIMIT_RPM_{name}", "0")),
+        float(os.getenv(f"RATE_LIMIT_TPM_{name}", "0")),
+    )
+
+class TokenBucket:
+    """
+    Allows `per_minute` units per minute, with bursts of up to `burst` seconds' worth.
+    """
+    def __init__(self, per_minute: float, burst: float = SCHEDULER_BURST_SECONDS):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst) if per_minute else 0.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available, 0 when unlimited."""
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        # a single call larger than the budget still gets through once the bucket is full
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float):
+        """Use `amount` units, the level may go negative when correcting estimates."""
+        if self.capacity:
+            self._refill()
+            self.level -= amount
+
+class Budget:
+    """
+    The request and token buckets of one provider and model, with the calls waiting for them.
+    """
+    def __init__(self, key: str, rpm: float, tpm: float, max_queue: int = SCHEDULER_MAX_QUEUE):
+        self.key = key
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_queue = max_queue
+        self.paused_until = 0.0
+        self._queue: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        """Number of calls waiting."""
+        return sum(1 for _, _, _, future in self._queue if not future.done())
+
+    def _wait_time(self, tokens: float) -> float:
+        return max(
+            self.paused_until - time.monotonic(),
+            self.requests.wait_time(1),
+            self.tokens.wait_time(tokens),
+        )
+
+    def _take(self, tokens: float):
+        self.requests.take(1)
+        self.tokens.take(tokens)
+
+    async def acquire(self, tokens: float, priority: int = INTERACTIVE):
+        """
+        Wait until the call fits the budget, raise SchedulerOverloaded when the queue is full.
+        """
+        if not self._queue and self._wait_time(tokens) <= 0:
+            self._take(tokens)
+            return
+        if self.depth >= self.max_queue:
+            metrics.inc("scheduler_rejected_total", key=self.key, priority=_PRIORITY_NAMES[priority])
+            raise SchedulerOverloaded(f"{self.key}: {self.depth} calls already waiting")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._order), tokens, future))
+        metrics.set_gauge("scheduler_queue_depth", self.depth, key=self.key)
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._admit())
+        # a cancelled waiter leaves a done future behind, which the pump skips
+        await future
+
+    def settle(self, estimated: float, actual: float):
+        """Correct the token bucket once the real usage of a call is known."""
+        self.tokens.take(actual - estimated)
+
+    def pause(self, seconds: float):
+        """Hold back every call of this budget, e.g. after a rate limit."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def _admit(self):
+        while self._queue:
+            _, _, tokens, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            wait = self._wait_time(tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            heapq.heappop(self._queue)
+            self._take(tokens)
+            future.set_result(None)
+            metrics.set_gauge("scheduler_queue_depth", self.depth, key=self.key)
+
+_BUDGETS: Dict[str, Budget] = {}
+
+def get_budget(provider: str, model: str = "") -> Budget:
+    """
+    The budget shared by all calls to `provider` and `model` in this process.
+    """
+    key = f"{provider}:{model}" if model else provider
+    budget = _BUDGETS.get(key)
+    if budget is None:
+        budget = _BUDGETS[key] = Budget(key, *get_rate_limits(provider))
+    return budget
+
+def _status(error: BaseException) -> Optional[int]:
+    for value in (
+        getattr(error, "status_code", None),
+        getattr(error, "code", None),
+        getattr(getattr(error, "response", None), "status_code", None),
+    ):
+        if isinstance(value, int):
+            return value
+    return None
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether the provider rejected the call for exceeding a limit."""
+    name = type(error).__name__
+    return _status(error) == 429 or "RateLimit" in name or "ResourceExhausted" in name or "UsageLimit" in name
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether retrying the call may succeed: rate limits, overload, timeouts and connection errors."""
+    name = type(error).__name__
+    return (
+        is_rate_limited(error)
+        or _status(error) in _RETRY_STATUS
+        or "Timeout" in name
+        or "Connection" in name
+    )
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """The delay the provider asked for, from the Retry-After headers of the error's response."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        # an HTTP date, fall back to backoff
+        pass
+    return None
+
+def backoff(attempt: int, requested: Optional[float] = None) -> float:
+    """
+    Seconds to wait before retry `attempt` (from 0): at least what the provider asked for,
+    otherwise exponential, with jitter so the retries of concurrent calls spread out.
+    """
+    delay = min(SCHEDULER_RETRY_MAX, SCHEDULER_RETRY_BASE * 2 ** attempt)
+    if requested is not None:
+        return requested + random.uniform(0, delay)
+    return random.uniform(delay / 2, delay)
+
+async def run(
+    budget: Budget,
+    call: Callable[[], Awaitable[T]],
+    tokens: float = 0,
+    priority: int = INTERACTIVE,
+    usage: Optional[Callable[[Any], float]] = None,
+    streamed: Optional[asyncio.Event] = None,
+) -> T:
+    """
+    Run `call` once admitted by `budget`, retrying retryable errors.
+    `tokens` is the estimated token cost; with `usage` the bucket is corrected
+    with the actual cost read from the result. `streamed` is set once the call
+    has streamed output, e.g. tokens forwarded to the UI; failures after that
+    aren't retried, a retry would replay the call and stream the output again.
+    """
+    labels = {"key": budget.key, "priority": _PRIORITY_NAMES[priority]}
+    attempt = 0
+    while True:
+        start = time.perf_counter()
+        await budget.acquire(tokens, priority)
+        metrics.observe("scheduler_wait_seconds", time.perf_counter() - start, **labels)
+        try:
+            result = await call()
+        except Exception as e: # pylint: disable=broad-except
+            if attempt >= SCHEDULER_MAX_RETRIES or not is_retryable(e):
+                raise
+            if streamed is not None and streamed.is_set():
+                metrics.inc("scheduler_retries_skipped_total", reason="streamed", **labels)
+                raise
+            requested = retry_after(e)
+            delay = backoff(attempt, requested)
+            if is_rate_limited(e):
+                budget.pause(requested if requested is not None else delay)
+            metrics.inc("scheduler_retries_total", reason=type(e).__name__, **labels)
+            logger.warning(
+                "retrying provider call",
+                extra={"event": "retry", **labels, "attempt": attempt + 1, "delay": round(delay, 3),
+                       "error": str(e)[:200]},
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        if usage is not None:
+            budget.settle(tokens, usage(result))
+        return result
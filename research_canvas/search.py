@@ -3,15 +3,25 @@ The search node is responsible for searching the internet for information.
 """
 
 import os
-from typing import cast, List
+import json
+import time
+import asyncio
+import functools
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import cast, Any, Awaitable, Callable, Dict, List, Optional
 from pydantic import BaseModel, Field
 from langchain_core.runnables import RunnableConfig
 from langchain_core.messages import AIMessage, ToolMessage, SystemMessage
 from langchain.tools import tool
-from tavily import TavilyClient
-from copilotkit.langchain import copilotkit_emit_state, copilotkit_customize_config
-from research_canvas.state import AgentState
-from research_canvas.model import get_model
+from copilotkit.langchain import copilotkit_customize_config
+from research_canvas.state import AgentState, normalize_url
+from research_canvas import metrics, scheduler
+from research_canvas.cache import CACHE_BACKEND, Cache, get_cache
+from research_canvas.download import prefetch_resources
+from research_canvas.emit import StateEmitter
+from research_canvas.model import invoke_model
+from research_canvas.history import compact_history
 
 class ResourceInput(BaseModel):
     """A resource with a short description"""
@@ -23,7 +33,195 @@ class ResourceInput(BaseModel):
 def ExtractResources(resources: List[ResourceInput]): # pylint: disable=invalid-name,unused-argument
     """Extract the 1-2 most relevant resources from a search result."""
 
-tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+# created on first search, so importing the graph needs neither tavily nor an API key
+tavily_client: Any = None
+
+def get_tavily_client() -> Any:
+    """
+    Get the process-wide Tavily client.
+    """
+    global tavily_client # pylint: disable=global-statement
+    if tavily_client is None:
+        from tavily import TavilyClient # pylint: disable=import-outside-toplevel
+        tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+    return tavily_client
+
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "5"))
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "15"))
+# threads for blocking Tavily calls across all turns, a call that timed out holds
+# its thread until the client's own request timeout, SEARCH_TIMEOUT, ends it
+SEARCH_THREADS = int(os.getenv("SEARCH_THREADS", "16"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(6 * 60 * 60)))
+# like CACHE_BACKEND by default, which demo.main sets to sqlite with several workers
+# so they share results, popular topics repeat across users
+SEARCH_CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", CACHE_BACKEND)
+
+_SEARCH_CACHE = get_cache("search", backend=SEARCH_CACHE_BACKEND)
+
+# "llm" lets the model pick the resources, "topk" takes the best scored results
+SEARCH_SELECTION = os.getenv("SEARCH_SELECTION", "llm")
+SEARCH_TOP_K = int(os.getenv("SEARCH_TOP_K", "2"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "10"))
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "300"))
+# best results downloaded while the model picks the resources, 0 to wait for its choice
+SEARCH_PREFETCH = int(os.getenv("SEARCH_PREFETCH", "3"))
+# "cancel" stops prefetches of results that weren't picked, "keep" lets them warm the resource cache
+SEARCH_PREFETCH_UNCHOSEN = os.getenv("SEARCH_PREFETCH_UNCHOSEN", "cancel")
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for caching and deduplication.
+    """
+    return " ".join(query.lower().split())
+
+def _truncate(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + "…"
+
+def compact_search_results(
+    search_results: List[Dict[str, Any]],
+    max_results: int = SEARCH_MAX_RESULTS,
+    snippet_chars: int = SEARCH_SNIPPET_CHARS,
+) -> List[Dict[str, Any]]:
+    """
+    Merge the results of all queries into one list ranked by score, keeping each URL
+    once with only its url, title and a truncated snippet.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for response in search_results:
+        for result in response.get("results", []):
+            url = result.get("url")
+            if not url:
+                continue
+            key = normalize_url(url)
+            score = float(result.get("score") or 0)
+            if key in merged and merged[key]["score"] >= score:
+                continue
+            merged[key] = {
+                "url": url,
+                "title": result.get("title", ""),
+                "snippet": _truncate(result.get("content", ""), snippet_chars),
+                "score": score,
+            }
+    ranked = sorted(merged.values(), key=lambda result: result["score"], reverse=True)
+    return ranked[:max_results]
+
+def format_search_results(results: List[Dict[str, Any]]) -> str:
+    """
+    Render compacted results as a numbered list for the model.
+    """
+    return "\n".join(
+        f"{i}. {result['title']}\n   {result['url']}\n   {result['snippet']}"
+        for i, result in enumerate(results, 1)
+    )
+
+def select_top_results(results: List[Dict[str, Any]], k: int = SEARCH_TOP_K) -> List[Dict[str, Any]]:
+    """
+    Pick the `k` best scored results as resources, without a model call.
+    """
+    return [
+        {"url": result["url"], "title": result["title"], "description": result["snippet"]}
+        for result in results[:k]
+    ]
+
+_SEARCH_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+def _get_search_executor() -> ThreadPoolExecutor:
+    global _SEARCH_EXECUTOR # pylint: disable=global-statement
+    if _SEARCH_EXECUTOR is None:
+        _SEARCH_EXECUTOR = ThreadPoolExecutor(max_workers=SEARCH_THREADS, thread_name_prefix="search")
+    return _SEARCH_EXECUTOR
+
+async def _search(client: Any, query: str, timeout: float) -> Dict[str, Any]:
+    """
+    Run a single blocking search in a worker thread once the tavily budget
+    admits it, bounded by a timeout that includes waiting and retries.
+    The timeout only stops waiting, so the request itself is given the same
+    timeout, and the threads come from a pool of SEARCH_THREADS rather than
+    the default executor.
+    """
+    call = functools.partial(client.search, query, timeout=math.ceil(timeout))
+    try:
+        return await asyncio.wait_for(
+            scheduler.run(
+                scheduler.get_budget("tavily"),
+                lambda: asyncio.get_running_loop().run_in_executor(_get_search_executor(), call),
+            ),
+            timeout,
+        )
+    except asyncio.TimeoutError:
+        return {"query": query, "results": [], "error": f"Search timed out after {timeout}s"}
+    except Exception as e: # pylint: disable=broad-except
+        return {"query": query, "results": [], "error": f"Search failed: {e}"}
+
+async def search_queries(
+    queries: List[str],
+    client: Any = None,
+    concurrency: int = SEARCH_CONCURRENCY,
+    timeout: float = SEARCH_TIMEOUT,
+    on_done: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None,
+    cache: Optional[Cache] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run the queries concurrently, at most `concurrency` at a time.
+    Results are returned in query order; `on_done` is awaited as each query finishes.
+    Queries that normalize to the same text are searched once, and with a `cache`
+    successful responses are reused for SEARCH_CACHE_TTL seconds.
+    """
+    client = client or get_tavily_client()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results: List[Dict[str, Any]] = [{} for _ in queries]
+
+    indexes: Dict[str, List[int]] = {}
+    for index, query in enumerate(queries):
+        indexes.setdefault(normalize_query(query), []).append(index)
+    metrics.inc("search_queries_deduplicated_total", len(queries) - len(indexes))
+
+    async def run(key: str, query: str):
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                entry = json.loads(cached)
+                metrics.inc("search_cache_requests_total", result="hit")
+                metrics.inc("search_cache_saved_seconds_total", entry["latency"])
+                return key, entry["response"]
+            metrics.inc("search_cache_requests_total", result="miss")
+
+        async with semaphore:
+            start = time.monotonic()
+            response = await _search(client, query, timeout)
+            latency = time.monotonic() - start
+        metrics.observe("search_latency_seconds", latency)
+
+        if cache is not None and "error" not in response:
+            await asyncio.to_thread(
+                cache.set, key, json.dumps({"response": response, "latency": latency}), SEARCH_CACHE_TTL
+            )
+        return key, response
+
+    for finished in asyncio.as_completed([run(key, queries[same[0]]) for key, same in indexes.items()]):
+        key, response = await finished
+        for index in indexes[key]:
+            results[index] = response
+            if on_done:
+                await on_done(index, response)
+
+    return results
+
+def _settle_prefetches(prefetched: Dict[str, "asyncio.Task[str]"], resources: Optional[List[Dict[str, Any]]]):
+    """
+    Count which prefetched results were picked and handle the rest per SEARCH_PREFETCH_UNCHOSEN.
+    resources is None when no resources were picked because the model call failed,
+    then every prefetch is cancelled.
+    """
+    chosen = {normalize_url(resource["url"]) for resource in resources or []}
+    for url, task in prefetched.items():
+        used = normalize_url(url) in chosen
+        metrics.inc("search_prefetch_total", result="used" if used else "unused")
+        if not used and (resources is None or SEARCH_PREFETCH_UNCHOSEN == "cancel"):
+            task.cancel()
 
 async def search_node(state: AgentState, config: RunnableConfig):
     """
@@ -35,59 +233,71 @@ async def search_node(state: AgentState, config: RunnableConfig):
     state["logs"] = state.get("logs", [])
     queries = ai_message.tool_calls[0]["args"]["queries"]
 
+    # keep references to our own log entries, earlier logs may already exist
+    query_logs = []
     for query in queries:
-        state["logs"].append({
+        log = {
             "message": f"Search for {query}",
             "done": False
-        })
-
-    await copilotkit_emit_state(config, state)
+        }
+        state["logs"].append(log)
+        query_logs.append(log)
 
-    search_results = []
+    emitter = StateEmitter(config, "search_node")
+    await emitter.flush(state)
 
-    for i, query in enumerate(queries):
-        response = tavily_client.search(query)
-        search_results.append(response)
-        state["logs"][i]["done"] = True
-        await copilotkit_emit_state(config, state)
+    async def mark_done(index: int, _response: Dict[str, Any]):
+        query_logs[index]["done"] = True
+        await emitter.emit(state)
 
-    config = copilotkit_customize_config(
-        config,
-        emit_intermediate_state=[{
-            "state_key": "resources",
-            "tool": "ExtractResources",
-            "tool_argument": "resources",
-        }],
-    )
+    search_results = await search_queries(queries, on_done=mark_done, cache=_SEARCH_CACHE)
+    await emitter.flush(state)
 
-    # figure out which resources to use
-    response = await get_model(state).bind_tools(
-        [ExtractResources],
-        tool_choice="ExtractResources"
-    ).ainvoke([
-        SystemMessage(
-            content="""
-            You need to extract the 1-2 most relevant resources from the following search results.
-            """
-        ),
-        *state["messages"],
-        ToolMessage(
-        tool_call_id=ai_message.tool_calls[0]["id"],
-        content=f"Performed search: {search_results}"
-    )
-    ], config)
+    results = compact_search_results(search_results)
 
-    state["logs"] = []
-    await copilotkit_emit_state(config, state)
+    if SEARCH_SELECTION == "topk" or not results:
+        resources = select_top_results(results)
+    else:
+        config = copilotkit_customize_config(
+            config,
+            emit_intermediate_state=[{
+                "state_key": "resources",
+                "tool": "ExtractResources",
+                "tool_argument": "resources",
+            }],
+        )
 
-    ai_message_response = cast(AIMessage, response)
-    resources = ai_message_response.tool_calls[0]["args"]["resources"]
+        # figure out which resources to use
+        messages = [
+            SystemMessage(
+                content="""
+                You need to extract the 1-2 most relevant resources from the following search results.
+                """
+            ),
+            *compact_history(state["messages"]),
+            ToolMessage(
+                tool_call_id=ai_message.tool_calls[0]["id"],
+                content=f"Performed search:\n{format_search_results(results)}"
+            )
+        ]
+        # the best results are likely picked, download them while the model decides
+        prefetched = await prefetch_resources([result["url"] for result in results[:SEARCH_PREFETCH]])
+        resources = None
+        try:
+            response = await invoke_model(state, messages, config, [ExtractResources], tool_choice="ExtractResources")
+            resources = cast(AIMessage, response).tool_calls[0]["args"]["resources"]
+        finally:
+            # also when the model call fails or the turn is cancelled, nobody would wait for them
+            _settle_prefetches(prefetched, resources)
 
-    state["resources"].extend(resources)
-
-    state["messages"].append(ToolMessage(
-        tool_call_id=ai_message.tool_calls[0]["id"],
-        content=f"Added the following resources: {resources}"
-    ))
+    state["logs"] = []
+    await emitter.close(state)
 
-    return state
+    return {
+        "resources": {"add": resources},
+        "logs": state["logs"],
+        "messages": [ToolMessage(
+            tool_call_id=ai_message.tool_calls[0]["id"],
+            content=f"Added the following resources: {resources}"
+        )],
+    }
@@ -0,0 +1,112 @@
+"""
+Compact serialization for checkpoints and emitted state.
+
+Checkpoints are msgpack, as with LangGraph's default serializer, and values
+whose encoding exceeds SERDE_COMPRESS_MIN bytes are compressed with zstd when
+the zstandard package is installed. Its window also removes strings repeated
+within a value, e.g. the resource URLs in search results and tool calls.
+Compressed encodings are cached by content, so an unchanged blog post or
+message history written again by the next step isn't compressed again.
+Checkpoints written without compression still load.
+
+Emitted state is encoded with orjson.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Tuple
+
+import orjson
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    import zstandard
+except ImportError: # pragma: no cover - compression is optional
+    zstandard = None
+
+# "zstd" or "none"
+SERDE_COMPRESSION = os.getenv("SERDE_COMPRESSION", "zstd" if zstandard else "none")
+SERDE_COMPRESS_MIN = int(os.getenv("SERDE_COMPRESS_MIN", "1024"))
+SERDE_ZSTD_LEVEL = int(os.getenv("SERDE_ZSTD_LEVEL", "3"))
+# compressed encodings kept for values written again unchanged
+SERDE_CACHE_SIZE = int(os.getenv("SERDE_CACHE_SIZE", "256"))
+
+_ZSTD_SUFFIX = "+zstd"
+
+
+class CompactSerializer(JsonPlusSerializer):
+    """
+    JsonPlusSerializer that zstd-compresses large values, see the module docstring.
+    """
+    def __init__(
+        self,
+        compression: str = SERDE_COMPRESSION,
+        compress_min: int = SERDE_COMPRESS_MIN,
+        level: int = SERDE_ZSTD_LEVEL,
+        cache_size: int = SERDE_CACHE_SIZE,
+    ):
+        super().__init__()
+        if compression not in ("zstd", "none"):
+            raise ValueError(f"Invalid serde compression specified: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("SERDE_COMPRESSION=zstd requires the zstandard package")
+        self.compression = compression
+        self.compress_min = compress_min
+        self.level = level
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        # zstd contexts must not be shared between threads
+        self._local = threading.local()
+
+    def _compressor(self) -> Any:
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level)
+        return compressor
+
+    def _decompressor(self) -> Any:
+        if zstandard is None:
+            raise ValueError("Checkpoint is zstd-compressed but zstandard isn't installed")
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = zstandard.ZstdDecompressor()
+        return decompressor
+
+    def _compress(self, data: bytes) -> bytes:
+        digest = hashlib.sha256(data).digest()
+        with self._lock:
+            compressed = self._cache.get(digest)
+            if compressed is not None:
+                self._cache.move_to_end(digest)
+                return compressed
+        compressed = self._compressor().compress(data)
+        if self.cache_size:
+            with self._lock:
+                self._cache[digest] = compressed
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return compressed
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = super().dumps_typed(obj)
+        if self.compression == "none" or len(data) < self.compress_min or type_ in ("bytes", "bytearray"):
+            return type_, data
+        return type_ + _ZSTD_SUFFIX, self._compress(data)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith(_ZSTD_SUFFIX):
+            type_ = type_.removesuffix(_ZSTD_SUFFIX)
+            # the content size is always written by compress(), so no max_output_size is needed
+            payload = self._decompressor().decompress(payload)
+        return super().loads_typed((type_, payload))
+
+
+def dumps_json(value: Any) -> bytes:
+    """
+    Encode a state value as JSON with sorted keys, so equal values encode equally.
+    """
+    return orjson.dumps(value, default=str, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
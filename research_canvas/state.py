@@ -3,7 +3,8 @@ This is the state definition for the Blog Generator AI.
 It defines the state of the agent and the state of the conversation.
 """
 
-from typing import List, TypedDict, Dict , Literal
+from typing import Annotated, List, NotRequired, TypedDict, Dict , Literal, Union
+from urllib.parse import urlsplit, urlunsplit
 from langgraph.graph import MessagesState
 
 class Resource(TypedDict):
@@ -13,6 +14,38 @@ class Resource(TypedDict):
     url: str
     title: str
     description: str
+    tokens: NotRequired[int]  # of the last downloaded content, set by download_node
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL for deduplication: lowercase scheme and host, no fragment or trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    return urlunsplit((
+        parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, ""
+    ))
+
+ResourcesUpdate = Union[List[Resource], Dict[str, list]]
+
+def merge_resources(current: List[Resource], update: ResourcesUpdate) -> List[Resource]:
+    """
+    Reducer for `resources`: one resource per normalized URL, in insertion order.
+
+    A list replaces the resources, e.g. when the frontend syncs its state.
+    A dict applies operations, so nodes only send what changed:
+    {"remove": [urls]} deletes, then {"add": [resources]} appends new URLs
+    and updates existing ones in place.
+    """
+    if isinstance(update, list):
+        store = {normalize_url(resource["url"]): resource for resource in update}
+        return list(store.values())
+
+    store = {normalize_url(resource["url"]): resource for resource in current or []}
+    for url in update.get("remove", []):
+        store.pop(normalize_url(url), None)
+    for resource in update.get("add", []):
+        store[normalize_url(resource["url"])] = resource
+    return list(store.values())
 
 class Log(TypedDict):
     """
@@ -98,5 +131,5 @@ class AgentState(MessagesState):
     comparison_info:ComparisonInfographic
     stats_info:StatisticsGroup
     bars_info:BarGroup
-    resources: List[Resource]  # Reference materials
+    resources: Annotated[List[Resource], merge_resources]  # Reference materials
     logs: List[Log] 
\ No newline at end of file
@@ -0,0 +1,31 @@
+import pytest
+
+from research_canvas.blog import apply_edits, split_sections
+
+POST = {"title": "Remote work", "content": "Intro text.\n\n## Benefits\n\nFewer commutes.\n\n## Risks\n\nIsolation.\n"}
+
+
+@pytest.mark.parametrize("after", ["intro", "Benefits", "Risks"])
+def test_insert_then_edit_in_one_batch(after):
+    post, errors = apply_edits(POST, [
+        {"op": "insert_after", "section": after, "content": "## Tools\n\nChat and video."},
+        {"op": "replace_section", "section": "Tools", "content": "Shared documents."},
+        {"op": "insert_after", "section": "Tools", "content": "## Summary\n\nIt depends."},
+    ])
+    assert errors == []
+    keys = [key for key, _ in split_sections(post["content"])]
+    assert keys[keys.index("tools") + 1] == "summary"
+    assert "## Tools\n\nShared documents.\n\n## Summary\n\nIt depends." in post["content"]
+    assert "Chat and video" not in post["content"]
+
+
+def test_insert_after_last_section_starts_a_new_paragraph():
+    post, errors = apply_edits(POST, [{"op": "insert_after", "section": "Risks", "content": "## Tools\n\nChat."}])
+    assert errors == []
+    assert post["content"].endswith("Isolation.\n\n## Tools\n\nChat.")
+
+
+def test_unknown_section_is_reported():
+    post, errors = apply_edits(POST, [{"op": "delete_section", "section": "Costs"}])
+    assert post == POST
+    assert errors == ["edit 1 (delete_section): section 'Costs' not found"]
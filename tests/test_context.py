@@ -0,0 +1,18 @@
+from research_canvas.context import build_resource_context, estimate_tokens
+
+
+def _resource(url: str, paragraphs: int, tokens: int):
+    content = "\n\n".join(f"Paragraph {i} about remote work and office schedules." for i in range(paragraphs))
+    return {"url": url, "title": url, "description": "", "content": content, "tokens": tokens}
+
+
+def test_resources_that_fit_are_kept_whole():
+    resources = [_resource("https://a.example", 5, 70), _resource("https://b.example", 5, 70)]
+    assert build_resource_context(resources, "remote work", budget=1000) == resources
+
+
+def test_stale_token_counts_dont_skip_ranking():
+    # counted when the page was small, it grew when downloaded again
+    resources = [_resource("https://a.example", 400, 70)]
+    context = build_resource_context(resources, "remote work", budget=500)
+    assert estimate_tokens(context[0]["content"]) <= 500 < estimate_tokens(resources[0]["content"])
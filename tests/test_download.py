@@ -0,0 +1,28 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from research_canvas import download
+
+
+def test_broken_process_pool_falls_back_to_threads(monkeypatch):
+    monkeypatch.setattr(download, "HTML_CONVERT_EXECUTOR", "process")
+    download.shutdown_executor()
+
+    async def run():
+        assert "hello" in await download.html_to_markdown("<p>hello</p>")
+        pool = download._EXECUTOR # pylint: disable=protected-access
+        assert isinstance(pool, ProcessPoolExecutor)
+        for process in list(pool._processes.values()): # pylint: disable=protected-access
+            process.kill()
+        time.sleep(0.5)
+        results = await asyncio.gather(*(download.html_to_markdown("<p>again</p>") for _ in range(3)))
+        return pool, results
+
+    try:
+        pool, results = asyncio.run(run())
+        assert all("again" in result for result in results)
+        assert isinstance(download._EXECUTOR, ThreadPoolExecutor) # pylint: disable=protected-access
+        assert pool._shutdown_thread # pylint: disable=protected-access
+    finally:
+        download.shutdown_executor()
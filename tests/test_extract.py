@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from benchmarks.fakes import PAGE_LAYOUTS, realistic_page
+from research_canvas.extract import extract_main_content
+
+ARTICLE = "<article>" + "".join(
+    f"<p>Paragraph {i} of the article, with commas, numbers and enough words to be scored as content.</p>"
+    for i in range(8)
+) + "</article>"
+
+# markup as found on real pages: conditional comments, JSON-LD, inline icons,
+# unclosed paragraphs, a share bar and comments inside the article
+HANDWRITTEN = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>Remote work</title>
+<!--[if lt IE 9]><script src="html5shiv.js"></script><![endif]-->
+<script type="application/ld+json">{"@type": "NewsArticle", "headline": "<p>not text</p>"}</script>
+<body>
+<header class="site-header"><nav><a href="/">Home</a><a href="/world">World</a></nav></header>
+<main id="main">
+<h1>Remote work is here to stay</h1>
+<div class="share-bar"><a href="/s/1"><svg viewBox="0 0 24 24"><path d="M0 0h24v24H0z"/></svg>Share</a></div>
+<div class="article-body">
+<p>Surveys of thousands of workers show that most would rather keep working from home, at least part of the week.
+<p>Managers, on the other hand, worry about mentoring, culture and how to measure output without seeing people.
+<img src="chart.png" alt="chart"/><svg class="icon" aria-hidden="true"/>
+<p>Companies that adopted hybrid schedules report lower attrition, and many have reduced their office space.</p>
+<blockquote>Work is something you do, not somewhere you go, as one executive put it in an interview.</blockquote>
+<p>Commuting time saved averages over an hour a day, which workers split between work, family and rest.</p>
+</div>
+<section id="comments" class="comments"><p>First! Great article, thanks for sharing it with us.</p></section>
+</main>
+<footer><p>Copyright 2024 Example News, all rights reserved.</p></footer>
+</body></html>"""
+
+
+@pytest.mark.parametrize("markup", [
+    "<script>", "<style>", "<iframe src='/ad'>", "<!--", "<!-- unclosed <b>", "<head><title>Title</title>",
+])
+def test_unclosed_invisible_markup_keeps_article(markup):
+    content = extract_main_content(f"<html><body>{markup}{ARTICLE}</body></html>")
+    assert "Paragraph 0" in content and "Paragraph 7" in content
+
+
+@pytest.mark.parametrize("markup", [
+    '<svg class="icon"/>', '<script src="app.js"/>', "<iframe src='/ad' />", "<canvas />", "<template/>",
+])
+def test_self_closing_invisible_markup_keeps_article(markup):
+    content = extract_main_content(f"<html><body>{markup}{ARTICLE}<svg></svg><script></script></body></html>")
+    assert "Paragraph 0" in content and "Paragraph 7" in content
+
+
+def test_invisible_markup_is_removed():
+    content = extract_main_content(
+        f"<html><body><article><!-- hidden --><script>var a = '<p>script</p>';</script>"
+        f"<style>p {{ color: red }}</style>{ARTICLE}<svg><text>icon</text></svg></article></body></html>"
+    )
+    for hidden in ("hidden", "script", "color", "icon"):
+        assert hidden not in content
+
+
+def test_handwritten_page():
+    content = extract_main_content(HANDWRITTEN)
+    for text in ("Remote work is here to stay", "Surveys of thousands", "Managers, on the other hand",
+                 "lower attrition", "something you do", "Commuting time saved"):
+        assert text in content
+    for boilerplate in ("World", "Share", "First!", "Copyright", "NewsArticle", "html5shiv"):
+        assert boilerplate not in content
+
+
+@pytest.mark.parametrize("layout", PAGE_LAYOUTS)
+def test_generated_pages_keep_article(layout):
+    page, article = realistic_page(layout, layout)
+    content = extract_main_content(page)
+    for paragraph in article:
+        assert paragraph[:60] in content
+
+
+@pytest.mark.parametrize("page", [
+    "<script>x" * 250_000,
+    "<style>" * 250_000,
+    "<!--x" * 400_000,
+    "<svg>x" * 300_000,
+    "<div>" * 200_000,
+    "<a" * 1_000_000,
+    "<!" * 1_000_000,
+    "<p>" + "text, more text " * 125_000,
+], ids=["script", "style", "comment", "svg", "nesting", "tag", "markup", "text"])
+def test_pathological_pages_are_linear(page):
+    start = time.perf_counter()
+    extract_main_content(page + ARTICLE)
+    assert time.perf_counter() - start < 5
@@ -0,0 +1,43 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from research_canvas.router import classify_rules, classify_text
+
+
+@pytest.mark.parametrize("text", ["thanks!", "ok", "great, thank you", "no thanks"])
+def test_acknowledgement_is_reply(text):
+    assert classify_text(text, has_post=True) == "reply"
+    assert classify_text(text, has_post=True, previous="Here is the post.") == "reply"
+
+
+@pytest.mark.parametrize("text", ["yes", "ok", "sure", "yes please"])
+@pytest.mark.parametrize("has_post", [False, True])
+def test_confirming_a_proposal_takes_the_full_path(text, has_post):
+    assert classify_text(text, has_post, previous="Shall I write the blog post now?") is None
+    assert classify_text(text, has_post, previous="I can search for more sources.") is None
+
+
+@pytest.mark.parametrize("text", ["ok go ahead", "sure do it", "ok write it", "sure, write it", "yes search more"])
+@pytest.mark.parametrize("has_post", [False, True])
+def test_confirmation_with_action_is_not_reply(text, has_post):
+    assert classify_text(text, has_post) != "reply"
+    assert classify_text(text, has_post, previous="Here is the post.") != "reply"
+
+
+def test_actions_are_matched_before_reply():
+    assert classify_text("ok, write a blog post about remote work", has_post=False) == "write"
+    assert classify_text("yes, search for more sources", has_post=True) == "search"
+    assert classify_text("sure, fix the typo in the intro", has_post=True) == "edit"
+
+
+def test_rules_look_at_the_previous_assistant_message():
+    proposal = [
+        HumanMessage("Find sources on remote work"),
+        AIMessage("", tool_calls=[{"name": "Search", "args": {}, "id": "1"}]),
+        ToolMessage("Added 2 resources", tool_call_id="1"),
+        AIMessage("I found two sources. Shall I write the post?"),
+        HumanMessage("yes"),
+    ]
+    assert classify_rules({"messages": proposal, "blog_post": None}) is None
+    done = [*proposal[:-2], AIMessage("I found two sources."), HumanMessage("thanks")]
+    assert classify_rules({"messages": done, "blog_post": None}) == "reply"